@@ -7,7 +7,8 @@ from time import process_time
 from changeto_testlocation import change_to_test_location, locate_exe, get_language
 
 from get_id import get_id
-from lab_grade import get_ref_number, check_for_correctness
+from lab_grade import get_ref_number, check_for_correctness, check_error_lines
+from make_timing_blocks import read_ladder
 import operator
 
 #
@@ -40,16 +41,48 @@ SCALE_SCORE = 15
 blocks_dir = "auto_grade/blocks/"
 timing_dir = "auto_time/timing_blocks/"
 
-def run_timing_block(block_name,block_num,check):
+# Extended scaling ladder: blocks past T128k written by make_timing_blocks.py
+# into extended_dir, whose ladder.txt gives their line and operation counts.
+# When EXTENDED is True they are timed after the SLOCs blocks and reported in
+# timer-extended.txt. They do not change the points above.
+
+EXTENDED     = False
+extended_dir = "auto_time/timing_blocks/extended/"
+EXT_TRIALS   = 1
+EXT_TIMEOUT  = 600
+
+# When PROFILE_RUNS is True, the checking run of each block samples the
+# submission's stack if it honors ILOC_PROFILE (our 412fe does), leaving
+# <netid>-<block>.stacks in the results directory, for a flame graph of
+# a run that timed out. The budget ends the run just before timeout does.
+
+PROFILE_RUNS = False
+
+# When METRICS is True, every run appends a JSON line of counts and phase
+# rates to results/timer-metrics.jsonl if the submission honors
+# ILOC_METRICS, as ours do. lab2/metrics.py aggregates the file.
+
+METRICS = False
+
+def run_timing_block(block_name,block_num,check,directory=timing_dir,limit=60):
     global l1r_numbers
     
-    path = base_name + timing_dir
+    path = base_name + directory
+    limit = str(limit)+".0s"
 
     if check == False:
-        command_line = "timeout 60.0s ./412fe -p "+path+block_name+" >&/dev/null"
+        command_line = "timeout "+limit+" ./412fe -p "+path+block_name+" >&/dev/null"
     else:
         tmpname = "./"+current_id+"-"+block_name+".out"
-        command_line = "timeout 60.0s ./412fe -p "+path+block_name+" >&"+tmpname
+        command_line = "timeout "+limit+" ./412fe -p "+path+block_name+" >&"+tmpname
+        if PROFILE_RUNS:
+            stacks = base_name+"results/"+current_id+"-"+block_name[:-2]+".stacks"
+            budget = str(float(limit[:-1]) - 1)
+            command_line = ("ILOC_PROFILE=sample,budget="+budget+",stacks="+stacks
+                            +",/dev/null "+command_line)
+
+    if METRICS:
+        command_line = "ILOC_METRICS="+base_name+"results/timer-metrics.jsonl "+command_line
         
     start_tic = time.perf_counter()
     os.system(command_line)
@@ -57,7 +90,12 @@ def run_timing_block(block_name,block_num,check):
     elapsed = stop_tic - start_tic 
 
     if check:
-        result = check_for_correctness(block_name,tmpname,l1r_numbers[block_num])
+        if directory == timing_dir:
+            result = check_for_correctness(block_name,tmpname,l1r_numbers[block_num])
+        elif len(ext_errs[block_num]) > 0:
+            result = check_error_lines(block_name,tmpname,ext_errs[block_num])
+        else:
+            result = check_for_correctness(block_name,tmpname,ext_numbers[block_num])
         os.system("rm "+tmpname)
 
         if result == False:  # pass failure signal back up chain of calls
@@ -69,6 +107,7 @@ def run_test(submission):
     global scaling
     global t_names
     global t_sizes
+    global t_times
 
     # have already found and built the executable
     #record name and netid in result file
@@ -213,6 +252,64 @@ def run_test(submission):
     return 0
 
 
+def run_extended(submission):
+    # Times the extended ladder, largest block first as in run_test, and
+    # reports how the time grows from each rung to the next. T128k is the
+    # first rung below the ladder.
+    n_blocks = len(ext_names)
+    e_times  = [1000000] * n_blocks
+    timeout  = [False] * n_blocks
+
+    print("Testing extended ladder:\t(minimum time of "+str(EXT_TRIALS)+" runs)\n")
+
+    for i in range(0,EXT_TRIALS):
+        n = n_blocks - 1
+        while n > -1:
+            if timeout[n] == False:
+                seconds = run_timing_block(ext_names[n],n,i == 0,extended_dir,EXT_TIMEOUT)
+            else:
+                seconds = EXT_TIMEOUT
+
+            if seconds == -1: # failed correctness check
+                e_times[n] = EXT_TIMEOUT
+                timeout[n] = True
+
+            elif seconds < e_times[n]:
+                e_times[n] = seconds
+
+            elif seconds > EXT_TIMEOUT - 1 and timeout[n] == False:
+                timeout[n] = True
+                print("\n\tTimed out on block "+ext_names[n])
+
+            n = n - 1
+
+    ext_file.write(current_id + '\t' + current_name)
+
+    last_time = t_times[7]
+    last_size = t_sizes[7] * 1000
+    for i in range(0,n_blocks):
+        size_ratio = ext_sizes[i] / last_size
+        if timeout[i] or last_time >= 60:
+            growth = "timed-out"
+        elif e_times[i] / last_time < 1.15 * size_ratio:
+            growth = "linear"
+        elif e_times[i] / last_time > 0.9 * size_ratio * size_ratio:
+            growth = "quadratic"
+        else:
+            growth = "superlinear"
+
+        print("\t"+ext_names[i]+":  \t"+str(e_times[i])[0:6]+" seconds\t"+growth)
+        ext_file.write("\t"+str(e_times[i])[0:6]+"\t"+growth)
+
+        last_time = e_times[i]
+        last_size = ext_sizes[i]
+
+    ext_file.write("\n")
+    print(" ")  # pretty up the output
+
+    return 0
+
+
 def main():
     global root
     global tests
@@ -224,6 +321,7 @@ def main():
     global failed_file
     global scaling
     global t_names, t_times, l1r_numbers
+    global ext_file, ext_names, ext_sizes, ext_numbers, ext_errs
     
 
     root = os.getcwd()
@@ -266,6 +364,26 @@ def main():
     for i in range(0,len(l1r_numbers)):
         l1r_numbers[i] = get_ref_number(base_name+timing_dir,t_names[i])
 
+    # the extended ladder carries its own operation counts and error lines
+    if EXTENDED:
+        ladder = read_ladder(base_name + extended_dir)
+        ext_names = sorted(ladder, key=lambda name: ladder[name][0])
+        ext_sizes = [ladder[name][0] for name in ext_names]
+        ext_numbers = [ladder[name][1] for name in ext_names]
+        ext_errs = []
+        for name in ext_names:
+            errs_file = open(base_name + extended_dir + name[:-2] + ".errs",'r')
+            ext_errs.append([int(x) for x in errs_file.read().split()])
+            errs_file.close()
+
+        if len(ext_names) == 0:
+            print("No extended ladder in "+base_name+extended_dir)
+            print("Run auto_time/make_timing_blocks.py to write one.")
+            exit(-1)
+
+        ext_file = open(result_path + "timer-extended.txt",'w')
+        ext_file.write('NetId\tName\t' + '\t\t'.join(name[:-2] for name in ext_names) + '\n')
+
     print('\n=======================================================================')
         
     for submission in sorted(os.listdir('./')):
@@ -289,6 +407,8 @@ def main():
 
             if not locate_exe(submission) == -1:
                 dummy = run_test(submission)
+                if EXTENDED:
+                    dummy = run_extended(submission)
             else:
                 print('submission failed to build correctly')
                 print('likely a problem with tar file, make file, or script')
@@ -310,6 +430,8 @@ def main():
     # close the grading files
     result_file.close()
     failed_file.close()
+    if EXTENDED:
+        ext_file.close()
 
     print('\nTiming run complete.\n')
     exit(0)
@@ -90,3 +90,38 @@ def check_for_correctness(block,output,l1r_num):
     return result
 
 
+
+def check_error_lines(block,output,err_lines):
+
+    # err_lines lists the malformed lines of the block, as its .errs file does.
+    # The submission passes if the lines it reports errors on are exactly those.
+    try:
+        test_file = open(output,'r')
+    except:
+        print("***\tNo output file for test block",block)
+        return False
+
+    reported = set()
+    line = test_file.readline()
+    while line != "":
+        if line.lower().find("error") != -1:
+            digits = ""
+            for ch in line:
+                if ch.isdigit():
+                    digits += ch
+                elif digits != "":
+                    break
+            if digits != "":
+                reported.add(int(digits))
+        line = test_file.readline()
+    test_file.close()
+
+    if reported == set(err_lines):
+        return True
+
+    missed = sorted(set(err_lines) - reported)
+    extra  = sorted(reported - set(err_lines))
+    print("-->\tFailed error check on block",block)
+    print("\tMissed "+str(len(missed))+" malformed lines "+str(missed[0:5]))
+    print("\tReported "+str(len(extra))+" correct lines "+str(extra[0:5]))
+    return False
@@ -0,0 +1,201 @@
+#!/usr/bin/python3
+"""
+make_timing_blocks.py - SLOCs-style Scalability Blocks of Any Size
+
+Writes blocks shaped like T1k.i ... T128k.i at sizes past T128k, with
+knobs for comment density, whitespace style, line endings and a share
+of malformed lines. Each block gets an .errs file listing its malformed
+lines, as the test blocks in auto_grade/blocks do, and an entry in the
+ladder file giving its line and operation counts for auto_time.py.
+"""
+
+import sys
+import os
+import random
+
+EXTENDED_DIR = "timing_blocks/extended"
+LADDER_FILE = "ladder.txt"
+DEFAULT_SIZES = ("256k", "1M", "4M")
+STYLES = ("tabs", "spaces", "tight", "mixed")
+
+COUNTERS = 19      # r0 .. r18 count; r19 holds the increment, r20 zero
+PROLOGUE = 2 + COUNTERS
+EPILOGUE = COUNTERS + 3
+ADDRESS = 1024
+
+# Malformed operations, each giving the parser one error on its line
+MALFORMED = (
+    "add\tr19, r{0}\t\tr{0}",         # missing =>
+    "add\tr19 r{0}\t\t=>r{0}",        # missing comma
+    "addd\tr19, r{0}\t\t=>r{0}",      # unknown opcode
+    "add\tr19, {0}\t\t=>r{0}",        # constant for a register
+    "loadI\tr{0}\t\t=>r{0}",          # register for a constant
+    "store\tr19\t\t=>",               # missing register
+)
+
+
+def parse_size(text):
+    """Turn 256k, 1M or 4000 into a line count; k is 1000 and M 1000000"""
+    scale = {"k": 1000, "K": 1000, "m": 1000000, "M": 1000000}.get(text[-1:], 1)
+    lines = int(text[:-1] if scale > 1 else text) * scale
+    if lines < PROLOGUE + EPILOGUE:
+        raise ValueError(f"a block needs at least {PROLOGUE + EPILOGUE} lines")
+    return lines
+
+
+def size_label(lines):
+    if lines % 1000000 == 0:
+        return f"{lines // 1000000}M"
+    if lines % 1000 == 0:
+        return f"{lines // 1000}k"
+    return str(lines)
+
+
+def formatter(style, rng):
+    """Return a function laying out (opcode, operands, target) as a line"""
+    if style == "tabs":
+        return lambda opcode, operands, target: f"\t{opcode}\t{operands}\t\t=>{target}"
+    if style == "spaces":
+        return lambda opcode, operands, target: f"    {opcode} {operands} => {target}"
+    if style == "tight":
+        return lambda opcode, operands, target: f"{opcode} {operands.replace(' ', '')}=>{target}"
+    if style == "mixed":
+        runs = (" ", "\t", "  ", " \t", "\t ", "\t\t")
+        arrows = ("=>", "=> ", "=>\t")
+        
+        def mixed(opcode, operands, target):
+            pick = rng.choice
+            return (f"{pick(runs)}{opcode}{pick(runs)}{operands.replace(' ', pick(runs))}"
+                    f"{pick(runs)}{pick(arrows)}{target}")
+        return mixed
+    raise ValueError(f"bad whitespace style '{style}'")
+
+
+def make_block(lines, comments=0.0, style="tabs", crlf=False, errors=0.0, seed=0):
+    """Generate a scalability block of lines lines after its header
+    
+    Like the SLOCs blocks it initializes 19 counters, increments them in
+    turn, and stores and prints their sum. comments is the share of body
+    lines that are comments, and of operations that carry one; errors is
+    the share of body lines that are malformed. Returns (text, number of
+    valid operations, line numbers of the malformed lines).
+    """
+    rng = random.Random(seed)
+    layout = formatter(style, rng)
+    
+    def operation(opcode, operands, target):
+        line = layout(opcode, operands, target)
+        if comments and rng.random() < comments:
+            line += "\t// " + rng.choice(("Increment", "Count", "Next value"))
+        return line
+    
+    body = [layout("loadI", "0", "r20") + "\t// Initial value",
+            layout("loadI", "1", "r19") + "\t// Increment amount"]
+    body.extend(layout("add", "r20, r19", f"r{i}") + "\t// Initialize counter"
+                for i in range(COUNTERS))
+    
+    bad = []
+    increments = 0
+    first_line = 4 + PROLOGUE   # three header lines, then the prologue
+    for n in range(lines - PROLOGUE - EPILOGUE):
+        roll = rng.random()
+        counter = n % COUNTERS
+        if roll < comments:
+            body.append(rng.choice(("//", "// Scalability block", f"// Counter r{counter}")))
+        elif roll < comments + errors:
+            body.append("\t" + rng.choice(MALFORMED).format(counter))
+            bad.append(first_line + n)
+        else:
+            body.append(operation("add", f"r19, r{counter}", f"r{counter}"))
+            increments += 1
+    
+    body.extend(layout("add", f"r19, r{i}", "r19") + "\t// Summation" for i in range(COUNTERS))
+    body.append(layout("loadI", str(ADDRESS), "r20") + "\t// Address")
+    body.append(layout("store", "r19", "r20"))
+    body.append(f"\toutput\t{ADDRESS}")
+    
+    # r19 starts at 1 and sums counters that start at 1
+    total = 1 + COUNTERS + increments
+    header = [f"//Basic SLOCs Scalability Block - {size_label(lines)} lines",
+              "//SIM INPUT:",
+              f"//OUTPUT:  {total}" if not bad else f"//{len(bad)} malformed lines"]
+    newline = "\r\n" if crlf else "\n"
+    text = newline.join(header + body) + newline
+    return text, PROLOGUE + increments + EPILOGUE, bad
+
+
+def read_ladder(directory):
+    """Return the ladder file's entries as {block: (lines, operations)}"""
+    entries = {}
+    try:
+        with open(os.path.join(directory, LADDER_FILE)) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) == 3 and not line.startswith("#"):
+                    entries[fields[0]] = (int(fields[1]), int(fields[2]))
+    except IOError:
+        pass
+    return entries
+
+
+def write_ladder(directory, entries):
+    with open(os.path.join(directory, LADDER_FILE), "w") as f:
+        f.write("# block lines operations\n")
+        for name, (lines, ops) in sorted(entries.items(), key=lambda entry: entry[1][0]):
+            f.write(f"{name} {lines} {ops}\n")
+
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ["-h"]:
+        print("Usage: make_timing_blocks.py [-d dir] [--comments f] [--style style]")
+        print("                             [--crlf] [--errors f] [--seed s] [size...]")
+        print("  Writes T<size>.i and T<size>.errs for each size (default 256k 1M 4M)")
+        print("  and records them in dir/ladder.txt (default timing_blocks/extended).")
+        print(f"  style is one of {', '.join(STYLES)}; tabs matches the SLOCs blocks.")
+        sys.exit(0)
+    
+    directory = None
+    options = {}
+    sizes = []
+    try:
+        while args:
+            flag = args.pop(0)
+            if flag == "-d":
+                directory = args.pop(0)
+            elif flag in ("--comments", "--errors"):
+                options[flag[2:]] = float(args.pop(0))
+            elif flag == "--style":
+                options["style"] = args.pop(0)
+                if options["style"] not in STYLES:
+                    raise ValueError(options["style"])
+            elif flag == "--seed":
+                options["seed"] = int(args.pop(0))
+            elif flag == "--crlf":
+                options["crlf"] = True
+            else:
+                sizes.append(parse_size(flag))
+    except (IndexError, ValueError):
+        sys.exit(1)
+    if directory is None:
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), EXTENDED_DIR)
+        os.makedirs(directory, exist_ok=True)
+    if not os.path.isdir(directory):
+        print(f"make_timing_blocks.py: no directory '{directory}'", file=sys.stderr)
+        sys.exit(1)
+    
+    entries = read_ladder(directory)
+    for lines in sizes or [parse_size(size) for size in DEFAULT_SIZES]:
+        name = f"T{size_label(lines)}"
+        text, ops, bad = make_block(lines, **options)
+        with open(os.path.join(directory, name + ".i"), "w", newline="") as f:
+            f.write(text)
+        with open(os.path.join(directory, name + ".errs"), "w") as f:
+            f.write(" ".join(str(line) for line in bad) + "\n")
+        entries[name + ".i"] = (lines, ops)
+        print(f"{name}.i: {lines} lines, {ops} operations, {len(bad)} malformed")
+    write_ladder(directory, entries)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ Main controller class that coordinates scanner and parser
 import sys
 from scanner import Scanner, TokenType, EOF, ENDLINE
 from parser import Parser
+from profiler import phase
+import metrics
 
 class ILOCFrontEnd:
     """Main front end controller class"""
@@ -21,40 +23,50 @@ class ILOCFrontEnd:
         Mode -s: Print all tokens
         Scans the input and prints tokens to stdout
         """
-        scanner = Scanner(self.filename)
-        token = scanner.next_token()
-        
-        while token.type != TokenType.EOF:
-            if token.type != TokenType.ENDLINE:
-                type_str = scanner.get_token_type_string(token)
-                print(f"{token.line}: {type_str} \"{token.lexeme}\"")
+        with phase("read"):
+            scanner = Scanner(self.filename)
+        with phase("scan and print"):
             token = scanner.next_token()
+            
+            while token.type != TokenType.EOF:
+                if token.type != TokenType.ENDLINE:
+                    type_str = scanner.get_token_type_string(token)
+                    print(f"{token.line}: {type_str} \"{token.lexeme}\"")
+                token = scanner.next_token()
+        metrics.scanned(self.filename, scanner)
     
     def parse_only(self):
         """
         Mode -p: Parse and report success or errors
         Parses the input and reports whether it's valid ILOC
         """
-        scanner = Scanner(self.filename)
+        with phase("read"):
+            scanner = Scanner(self.filename)
         parser = Parser(scanner)
-        success = parser.parse()
+        with phase("parse"):
+            success = parser.parse()
+        self.record_metrics(scanner, parser)
         
-        if success:
-            operation_count = parser.get_ir().get_operation_count()
-            print(f"Parse succeeded. Processed {operation_count} operations.")
-        else:
-            print("Parse found errors.", file=sys.stderr)
-            for error in parser.get_errors():
-                print(error, file=sys.stderr)
+        with phase("report"):
+            if success:
+                operation_count = parser.get_ir().get_operation_count()
+                print(f"Parse succeeded. Processed {operation_count} operations.")
+            else:
+                print("Parse found errors.", file=sys.stderr)
+                for error in parser.get_errors():
+                    print(error, file=sys.stderr)
     
     def print_ir(self):
         """
         Mode -r: Parse and print intermediate representation
         Parses the input and prints the IR in human-readable format
         """
-        scanner = Scanner(self.filename)
+        with phase("read"):
+            scanner = Scanner(self.filename)
         parser = Parser(scanner)
-        success = parser.parse()
+        with phase("parse"):
+            success = parser.parse()
+        self.record_metrics(scanner, parser)
         
         if not success:
             for error in parser.get_errors():
@@ -62,7 +74,21 @@ class ILOCFrontEnd:
             return
         
         # Print the IR
-        parser.get_ir().print_ir()
+        with phase("print"):
+            parser.get_ir().print_ir()
+    
+    def record_metrics(self, scanner, parser):
+        """Record the front end's counts and the SRs used, for --metrics"""
+        if metrics.record is None:
+            return
+        ir_list = parser.get_ir()
+        metrics.scanned(self.filename, scanner, parser, ir_list.get_operation_count())
+        srs = set()
+        for op in ir_list.iterate_forward():
+            if op.opcode != "output":
+                srs.update((op.sr1, op.sr2, op.sr3) if op.opcode != "loadI" else (op.sr3,))
+        srs.discard(-1)
+        metrics.add(srs=len(srs))
     
     @staticmethod
     def print_help():
@@ -75,4 +101,12 @@ class ILOCFrontEnd:
         print("  412fe -r <file>    : Parse and print intermediate representation")
         print("")
         print("If no flag is specified, -p is assumed.")
+        print("--profile[=functions,memory,report.json] writes phase times, and")
+        print("optionally hot functions and peak memory, as JSON to report.json")
+        print("(default 412fe.profile.json); so does the ILOC_PROFILE variable.")
+        print("--profile=sample[=ms],budget=s,stacks=path also samples the stack")
+        print("into collapsed stacks for a flame graph, written on exit, on SIGTERM")
+        print("or after s seconds.")
+        print("--metrics[=fd|file] appends a JSON line of counts and per-phase rates")
+        print("to fd or file (default stderr); so does ILOC_METRICS.")
         print("Flags are mutually exclusive with priority: -h > -r > -p > -s")
\ No newline at end of file
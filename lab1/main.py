@@ -6,6 +6,8 @@ Handles command-line argument parsing and mode selection
 
 import sys
 import os
+import profiler
+import metrics
 from frontend import ILOCFrontEnd
 
 def parse_arguments():
@@ -96,4 +98,10 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    profiler.start("412fe", sys.argv)
+    metrics.start("412fe", sys.argv)
+    try:
+        main()
+    finally:
+        metrics.finish()
+        profiler.finish()
\ No newline at end of file
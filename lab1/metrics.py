@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+metrics.py - Machine-Readable Run Metrics
+
+Enabled by --metrics[=target] on the command line or by the ILOC_METRICS
+environment variable. At exit the tool writes one JSON line to target: a
+file descriptor number, e.g. 3 for a harness running it with 3>>file,
+or a file to append to; stderr by default. The record holds the counts
+the front end and allocator keep anyway, such as the scanner's token
+count, and the time of each phase, with tokens/sec for the phases that
+scan the whole block and ops/sec for those that analyze or allocate it.
+
+Run as a script, aggregates records from JSON-lines files.
+"""
+
+import os
+import sys
+import json
+import statistics
+import profiler
+
+ENVIRONMENT = "ILOC_METRICS"
+# Rate -> (the count it divides, the phases that process all of it)
+RATES = {"tokens_per_sec": ("tokens", ("scan and print", "parse")),
+         "ops_per_sec": ("operations", ("analyze", "allocate"))}
+
+record = None    # The run's metrics while enabled
+_target = None
+_owns_profile = False   # Whether phases are timed only for the metrics
+
+
+def start(tool, args):
+    """Start collecting if args or the environment ask for it
+    
+    Removes a --metrics option from args. Phases are timed through the
+    profiler, started without a report of its own if it is not running.
+    """
+    global record, _target, _owns_profile
+    target = os.environ.get(ENVIRONMENT)
+    for arg in args[1:]:
+        if arg == "--metrics" or arg.startswith("--metrics="):
+            target = arg.partition("=")[2]
+            args.remove(arg)
+            break
+    if target is None or target == "0":
+        return
+    _target = target or "2"
+    record = {"tool": tool, "argv": args[1:]}
+    if profiler.active is None:
+        profiler.active = profiler.Profile(tool)
+        _owns_profile = True
+
+
+def add(**values):
+    """Record values, if metrics are enabled"""
+    if record is not None:
+        record.update(values)
+
+
+def scanned(filename, scanner, parser=None, operations=None):
+    """Record what the front end counted while reading a block"""
+    if record is None:
+        return
+    if filename is not None and os.path.isfile(filename):
+        record["bytes"] = os.path.getsize(filename)
+    record["lines"] = scanner.line_count()
+    record["tokens"] = scanner.tokens
+    if parser is not None:
+        record["errors"] = len(parser.errors)
+    if operations is not None:
+        record["operations"] = operations
+
+
+def finish():
+    """Write the record as a JSON line, if metrics are enabled"""
+    global record, _owns_profile
+    if record is None:
+        return
+    profile = profiler.active
+    if _owns_profile:
+        profiler.active = None
+        _owns_profile = False
+    phases = []
+    for phase in profile.phases:
+        seconds = phase["seconds"]
+        entry = {"name": phase["name"], "seconds": seconds}
+        for rate, (count, names) in RATES.items():
+            if phase["name"] in names and count in record and seconds > 0:
+                entry[rate] = record[count] / seconds
+        phases.append(entry)
+    record["phases"] = phases
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    record = None
+    try:
+        if _target.isdigit():
+            os.write(int(_target), line.encode())
+        else:
+            with open(_target, "a") as f:
+                f.write(line)
+    except (OSError, IOError) as e:
+        print(f"ERROR: Cannot write metrics: {e}", file=sys.stderr)
+
+
+def read_records(filenames):
+    """Read metrics records from JSON-lines files, skipping bad lines"""
+    records = []
+    for filename in filenames:
+        with open(filename) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def aggregate(records):
+    """Summarize records by tool and phase
+    
+    Returns {(tool, phase): (runs, total seconds, median ops/sec,
+    median tokens/sec)}, a rate being None if no run recorded it.
+    """
+    groups = {}
+    for record in records:
+        for phase in record.get("phases", []):
+            groups.setdefault((record.get("tool", "?"), phase["name"]), []).append(phase)
+    summary = {}
+    for key, phases in sorted(groups.items()):
+        ops = [phase["ops_per_sec"] for phase in phases if "ops_per_sec" in phase]
+        tokens = [phase["tokens_per_sec"] for phase in phases if "tokens_per_sec" in phase]
+        summary[key] = (len(phases), sum(phase["seconds"] for phase in phases),
+                        statistics.median(ops) if ops else None,
+                        statistics.median(tokens) if tokens else None)
+    return summary
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] == "-h":
+        print("Usage: metrics.py file.jsonl...")
+        print("  Sums the inputs of the recorded runs and prints, for each tool")
+        print("  and phase, the runs, total time and median ops/sec and tokens/sec.")
+        sys.exit(0 if args[:1] == ["-h"] else 1)
+    if not all(os.path.exists(f) for f in args):
+        sys.exit(1)
+    
+    records = read_records(args)
+    totals = {}
+    for record in records:
+        for count in ("bytes", "lines", "tokens", "operations", "errors",
+                      "spills", "restores", "remats"):
+            totals[count] = totals.get(count, 0) + record.get(count, 0)
+    print(f"{len(records)} runs: " + ", ".join(f"{value} {name}"
+                                               for name, value in totals.items()))
+    print(f"{'tool':10s} {'phase':16s} {'runs':>5s} {'seconds':>9s} "
+          f"{'ops/sec':>12s} {'tokens/sec':>12s}")
+    for (tool, name), (runs, seconds, ops, tokens) in aggregate(records).items():
+        rates = "".join(f" {rate:12,.0f}" if rate is not None else f" {'-':>12s}"
+                        for rate in (ops, tokens))
+        print(f"{tool:10s} {name:16s} {runs:5d} {seconds:9.3f}{rates}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+profiler.py - Per-Phase Profiling for the Command-Line Tools
+
+Enabled by --profile[=options] on the command line or by the ILOC_PROFILE
+environment variable with the same options, a comma-separated list of:
+  functions  run the tool under cProfile and report the hottest functions
+  memory     trace allocations and report each phase's peak
+  sample[=ms]     sample the Python stack every ms of CPU time (default
+                  10) into a collapsed-stack file for flame graphs
+  stacks=path     names that file, by default <tool>.stacks
+  budget=seconds  stop after seconds of wall-clock time, as on SIGTERM
+  path       anything else names the JSON report, by default
+             <tool>.profile.json in the current directory
+While sampling, SIGTERM, e.g. from timeout, and the budget end the run
+through SystemExit, so both files are written before it exits.
+While disabled, phase() returns a shared null context and nothing is
+timed or traced.
+"""
+
+import os
+import sys
+import json
+import signal
+from contextlib import nullcontext
+from time import perf_counter
+
+ENVIRONMENT = "ILOC_PROFILE"
+HOT = 15   # Functions listed in the report
+SAMPLE_INTERVAL = 0.010   # Seconds of CPU time between samples
+TIMED_OUT = 124           # Exit status on the budget, as timeout's
+
+_null = nullcontext()
+active = None   # The running Profile, if profiling is enabled
+
+
+class Phase:
+    """Context manager timing one phase of the active Profile
+    
+    Phases are recorded in the order they start; depth counts the
+    phases they run inside, as an analysis inside a pass does.
+    """
+    __slots__ = ['profile', 'record', 'start']
+    
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.record = {"name": name, "depth": profile.depth, "seconds": 0.0}
+    
+    def __enter__(self):
+        profile = self.profile
+        profile.phases.append(self.record)
+        profile.depth += 1
+        if profile.memory:
+            # Resetting the peak hides it from the enclosing phase, so
+            # each running phase keeps the highest peak seen so far
+            import tracemalloc
+            peak = tracemalloc.get_traced_memory()[1]
+            profile.peaks = [max(p, peak) for p in profile.peaks] + [0]
+            tracemalloc.reset_peak()
+        self.start = perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.record["seconds"] = perf_counter() - self.start
+        profile = self.profile
+        if profile.memory:
+            import tracemalloc
+            peak = max(profile.peaks.pop(), tracemalloc.get_traced_memory()[1])
+            self.record["peak_bytes"] = peak
+            profile.peaks = [max(p, peak) for p in profile.peaks]
+            tracemalloc.reset_peak()
+        profile.depth -= 1
+        return False
+
+
+class Sampler:
+    """Histogram of Python stacks sampled on SIGPROF
+    
+    Stacks are kept as tuples of code objects, so a sample costs a walk
+    up the frames and a dict update; they are named only when written.
+    """
+    __slots__ = ['path', 'interval', 'counts']
+    
+    def __init__(self, path, interval=SAMPLE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.counts = {}   # (outermost code, ..., innermost code) -> samples
+    
+    def sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        key = tuple(reversed(stack))
+        self.counts[key] = self.counts.get(key, 0) + 1
+    
+    def start(self):
+        signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+    
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_IGN)
+    
+    def write(self):
+        """Write the stacks collapsed, one "frame;frame;... count" per line"""
+        names = {}
+        
+        def name(code):
+            if code not in names:
+                names[code] = (f"{code.co_name} "
+                               f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            return names[code]
+        with open(self.path, "w") as f:
+            for stack, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+                f.write(";".join(name(code) for code in stack) + f" {count}\n")
+
+
+def stop_run(signum, frame):
+    """End the run from a signal, unwinding so the reports are written"""
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    raise SystemExit(TIMED_OUT if signum == signal.SIGALRM else 128 + signum)
+
+
+class Profile:
+    """Phase times, and optionally function and memory profiles, of one run"""
+    __slots__ = ['tool', 'path', 'functions', 'memory', 'phases', 'depth', 'peaks',
+                 'profiler', 'sampler', 'start']
+    
+    def __init__(self, tool, path=None, functions=False, memory=False, sample=None,
+                 stacks=None, budget=None):
+        self.tool = tool
+        self.path = path or f"{tool}.profile.json"
+        self.functions = functions
+        self.memory = memory
+        self.phases = []
+        self.depth = 0
+        self.peaks = []   # Highest peak so far of each running phase
+        self.profiler = None
+        self.start = perf_counter()
+        if memory:
+            import tracemalloc
+            tracemalloc.start()
+        if functions:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.sampler = None
+        if sample or budget:
+            self.sampler = Sampler(stacks or f"{tool}.stacks", sample or SAMPLE_INTERVAL)
+            self.sampler.start()
+            signal.signal(signal.SIGTERM, stop_run)
+            if budget:
+                signal.signal(signal.SIGALRM, stop_run)
+                signal.setitimer(signal.ITIMER_REAL, budget)
+    
+    def hot_functions(self):
+        """Return the functions with the most time of their own"""
+        import pstats
+        stats = pstats.Stats(self.profiler).stats
+        hot = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:HOT]
+        return [{"function": f"{os.path.basename(filename)}:{line}({name})",
+                 "calls": calls, "tottime": tottime, "cumtime": cumtime}
+                for (filename, line, name), (_, calls, tottime, cumtime, _) in hot]
+    
+    def report(self):
+        """Stop profiling and return the report as a dict"""
+        total = perf_counter() - self.start
+        report = {"tool": self.tool, "argv": sys.argv[1:], "seconds": total,
+                  "phases": self.phases}
+        if self.memory:
+            import tracemalloc
+            report["peak_bytes"] = max([phase["peak_bytes"] for phase in self.phases]
+                                       + [tracemalloc.get_traced_memory()[1]])
+            tracemalloc.stop()
+        if self.profiler is not None:
+            self.profiler.disable()
+            report["hot"] = self.hot_functions()
+        if self.sampler is not None:
+            self.sampler.stop()
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            report["samples"] = sum(self.sampler.counts.values())
+            report["stacks"] = self.sampler.path
+        return report
+
+
+def phase(name):
+    """Return a context manager timing a phase, or a null one if disabled"""
+    if active is None:
+        return _null
+    return Phase(active, name)
+
+
+def start(tool, args):
+    """Start profiling if args or the environment ask for it
+    
+    Removes a --profile option from args, which is usually sys.argv.
+    """
+    global active
+    spec = os.environ.get(ENVIRONMENT)
+    for arg in args[1:]:
+        if arg == "--profile" or arg.startswith("--profile="):
+            spec = arg.partition("=")[2]
+            args.remove(arg)
+            break
+    if spec is None or spec == "0":
+        return
+    
+    options = {"functions": False, "memory": False, "path": None}
+    for item in spec.split(","):
+        key, equals, value = item.partition("=")
+        try:
+            if item in ("functions", "memory"):
+                options[item] = True
+            elif key == "sample":
+                options["sample"] = float(value) / 1000 if equals else SAMPLE_INTERVAL
+            elif key == "budget" and equals:
+                options["budget"] = float(value)
+            elif key == "stacks" and equals:
+                options["stacks"] = value
+            elif item and item != "1":
+                options["path"] = item
+        except ValueError:
+            print(f"ERROR: Bad profile option '{item}'", file=sys.stderr)
+            sys.exit(1)
+    active = Profile(tool, **options)
+
+
+def finish():
+    """Write the report of the active profile, if any"""
+    global active
+    if active is None:
+        return
+    profile = active
+    report = profile.report()
+    active = None
+    try:
+        if profile.sampler is not None:
+            profile.sampler.write()
+        with open(profile.path, "w") as f:
+            json.dump(report, f, indent=1)
+            f.write("\n")
+    except IOError as e:
+        print(f"ERROR: Cannot write profile: {e}", file=sys.stderr)
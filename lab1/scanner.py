@@ -29,7 +29,8 @@ class Token:
         self.value = value
 
 class Scanner:
-    __slots__ = ['input', 'length', 'pos', 'line', '_opcodes', '_type_strings']
+    __slots__ = ['input', 'length', 'pos', 'line', 'tokens', 'tail', '_opcodes',
+                 '_type_strings']
     
     def __init__(self, filename):
         try:
@@ -43,6 +44,8 @@ class Scanner:
         self.length = len(self.input)
         self.pos = 0
         self.line = 1
+        self.tokens = 0   # Tokens returned, EOF included
+        self.tail = self.input[-1:]   # Last character read
         
         # Store these as instance variables to avoid class lookup
         self._opcodes = {
@@ -61,6 +64,7 @@ class Scanner:
     
     def next_token(self):
         """Scan next token with minimal overhead"""
+        self.tokens += 1
         pos = self.pos
         input_str = self.input
         length = self.length
@@ -148,6 +152,10 @@ class Scanner:
         self.pos = pos + 1
         return Token(ERROR, ch, self.line)
     
+    def line_count(self):
+        """Lines in the scanned input: one per ENDLINE, and a last line without one"""
+        return self.line - 1 + (self.tail not in ("", "\n", "\r"))
+    
     def get_token_type_string(self, token):
         """Get string for token type"""
         return self._type_strings[token.type] if 0 <= token.type <= 16 else str(token.type)
\ No newline at end of file
@@ -5,18 +5,40 @@
 
 import sys
 import os
+import bisect
+import heapq
 from scanner import Scanner
 from parser import Parser
+from io import StringIO
+from time import perf_counter
+from timing import estimate_code_cycles
+from scheduler import schedule_code, schedule, build_dependence_graph, write_op
+from passes import Analysis, Pass, PassManager
+import profiler
+import metrics
+from profiler import phase
+from optimizer import fold_constant, optimize
+from columns import ColumnBlock
+from fused import FusedBlock
+from cfg import BRANCHES, has_control_flow, build_cfg, compute_liveness, live_registers
+from scheduler import op_registers
+from ir import ILOCOperation, IRList
 
-def rename_registers(ir_list):
-    """Perform register renaming"""
+def rename_registers(ir_list, vr_const=None, next_uses=True):
+    """Perform register renaming
+
+    If vr_const is given, it is filled with every VR known to hold a
+    compile-time constant: loadI results and arithmetic folded from them.
+    Anything not in the map is treated as unknown. Next uses are computed
+    too unless next_uses is false.
+    """
     next_vr = 0
     sr_to_vr = {}
     max_vr = 0
     
     for op in ir_list.iterate_forward():
         # Handle uses first (before definitions)
-        if op.opcode in ["load", "store"]:
+        if op.opcode in ["load", "store", "cbr"]:
             if op.sr1 >= 0:
                 if op.sr1 in sr_to_vr:
                     op.vr1 = sr_to_vr[op.sr1]
@@ -72,8 +94,23 @@ def rename_registers(ir_list):
             sr_to_vr[op.sr3] = next_vr
             max_vr = max(max_vr, next_vr)
             next_vr += 1
+        
+        # Propagate constants; each VR has a single definition in the block
+        if vr_const is not None:
+            if op.opcode == "loadI":
+                vr_const[op.vr3] = op.sr1
+            elif op.vr3 >= 0 and op.vr1 in vr_const and op.vr2 in vr_const:
+                value = fold_constant(op.opcode, vr_const[op.vr1], vr_const[op.vr2])
+                if value is not None:
+                    vr_const[op.vr3] = value
     
-    # Compute next use
+    if next_uses:
+        compute_next_uses(ir_list)
+    return max_vr + 1
+
+
+def compute_next_uses(ir_list):
+    """Set the next use of every operand of a renamed block"""
     vr_next = {}
     for op in ir_list.iterate_backward():
         # Handle definitions - kill live range
@@ -86,7 +123,7 @@ def rename_registers(ir_list):
                 vr_next.pop(op.vr3, None)
         
         # Handle uses - extend live range
-        if op.opcode in ["load", "store"]:
+        if op.opcode in ["load", "store", "cbr"]:
             if op.vr1 >= 0:
                 if op.vr1 in vr_next:
                     op.nu1 = vr_next[op.vr1]
@@ -115,14 +152,15 @@ def rename_registers(ir_list):
                 else:
                     op.nu2 = float('inf')
                 vr_next[op.vr2] = op.line
-    
-    return max_vr + 1
 
 
-def compute_maxlive(ir_list):
-    """Compute MAXLIVE for the block"""
+def compute_pressure(ir_list):
+    """Compute the register pressure profile of the block
+
+    Entry i is the number of values live on entry to the i-th operation.
+    """
     live_vrs = set()
-    max_live = 0
+    pressure = []
     
     for op in ir_list.iterate_backward():
         # Handle definitions - kill live range
@@ -131,7 +169,7 @@ def compute_maxlive(ir_list):
                 live_vrs.discard(op.vr3)
         
         # Handle uses - extend live range
-        if op.opcode in ["load", "store"]:
+        if op.opcode in ["load", "store", "cbr"]:
             if op.vr1 >= 0:
                 live_vrs.add(op.vr1)
             if op.opcode == "store" and op.vr3 >= 0:
@@ -142,16 +180,59 @@ def compute_maxlive(ir_list):
             if op.vr2 >= 0:
                 live_vrs.add(op.vr2)
         
-        max_live = max(max_live, len(live_vrs))
+        pressure.append(len(live_vrs))
     
-    return max_live
+    pressure.reverse()
+    return pressure
+
+
+def compute_maxlive(ir_list):
+    """Compute MAXLIVE for the block"""
+    return max(compute_pressure(ir_list), default=0)
 
 
-def get_pr(pr_to_vr, vr_to_pr, vr_nu, num_regs, used_in_op):
-    """Get a physical register using furthest next use heuristic"""
+def compute_spill_regions(ir_list, pressure, k):
+    """Mark the operations that need a register reserved for spilling
+
+    An operation that defines a value needs one register more than the
+    values live on entry to it, so spills can only occur where that demand
+    exceeds k. Each such region is extended backward to an operation with
+    fewer than k values live on entry, so a free register is guaranteed to
+    exist when the region starts and can be claimed for spill addresses.
+    """
+    reserve = [False] * len(pressure)
+    extending = False
+    i = len(pressure)
+    
+    for op in ir_list.iterate_backward():
+        i -= 1
+        demand = pressure[i]
+        if op.opcode in ["loadI", "load", "add", "sub", "mult", "lshift", "rshift"]:
+            demand += 1
+        
+        if demand > k:
+            extending = True
+        if extending:
+            reserve[i] = True
+            if pressure[i] < k:
+                extending = False
+    
+    return reserve
+
+
+def get_pr(pr_to_vr, vr_to_pr, vr_nu, num_regs, used_in_op, spill_reg=-1,
+           victim="furthest", is_clean=None):
+    """Get a physical register using furthest next use heuristic
+
+    victim picks the rule used when every register is occupied:
+      furthest     furthest next use, lowest register on ties
+      clean-tie    furthest next use, clean values on ties
+      clean-first  clean values before dirty ones, then furthest next use
+    A clean value can be evicted without a store (is_clean(vr) is true).
+    """
     # First, look for a free register not used in current op
     for pr in range(num_regs):
-        if pr_to_vr[pr] is None and pr not in used_in_op:
+        if pr_to_vr[pr] is None and pr not in used_in_op and pr != spill_reg:
             return pr
     
     # No free register, find the one with furthest next use (not used in current op)
@@ -159,74 +240,190 @@ def get_pr(pr_to_vr, vr_to_pr, vr_nu, num_regs, used_in_op):
     best_nu = -1
     
     for pr in range(num_regs):
-        if pr not in used_in_op:
+        if pr not in used_in_op and pr != spill_reg:
             vr = pr_to_vr[pr]
             if vr is not None:
                 nu = vr_nu.get(vr, float('inf'))
-                if nu > best_nu:
+                if victim == "clean-tie":
+                    nu = (nu, is_clean(vr))
+                elif victim == "clean-first":
+                    nu = (is_clean(vr), nu)
+                if best_pr == -1 or nu > best_nu:
                     best_pr = pr
                     best_nu = nu
     
-    return best_pr if best_pr != -1 else 0
+    if best_pr != -1:
+        return best_pr
+    
+    # Every candidate is read by this op; reuse one, never the spill register
+    return 1 if spill_reg == 0 else 0
 
 
-def allocate(ir_list, k):
-    """Perform register allocation with k registers"""
-    # Compute MAXLIVE
-    maxlive = compute_maxlive(ir_list)
-    
-    # Determine if we need to reserve a register for spilling
-    if maxlive > k:
-        spill_reg = k - 1
-        num_regs = k - 1
-    else:
-        spill_reg = -1
-        num_regs = k
+def write_spill(write, addr, pr, addr_reg):
+    """Emit code storing pr to spill address addr"""
+    write(f"loadI {addr} => r{addr_reg}\n")
+    write(f"store r{pr} => r{addr_reg}\n")
+
+
+def write_restore(write, addr, pr):
+    """Emit code reloading pr from spill address addr"""
+    write(f"loadI {addr} => r{pr}\n")
+    write(f"load r{pr} => r{pr}\n")
+
+
+def write_remat(write, value, pr):
+    """Emit code rematerializing a constant into pr"""
+    write(f"loadI {value} => r{pr}\n")
+
+
+def write_allocated(write, op):
+    """Emit an operation using its physical registers"""
+    if op.opcode == "loadI":
+        write(f"loadI {op.sr1} => r{op.pr3}\n")
+    elif op.opcode == "load":
+        write(f"load r{op.pr1} => r{op.pr3}\n")
+    elif op.opcode == "store":
+        write(f"store r{op.pr1} => r{op.pr3}\n")
+    elif op.opcode in ["add", "sub", "mult", "lshift", "rshift"]:
+        write(f"{op.opcode} r{op.pr1}, r{op.pr2} => r{op.pr3}\n")
+    elif op.opcode == "output":
+        write(f"output {op.sr1}\n")
+    elif op.opcode == "nop":
+        write("nop\n")
+    elif op.opcode == "cbr":
+        write(f"cbr r{op.pr1} -> {op.targets[0]}, {op.targets[1]}\n")
+    elif op.opcode == "jumpI":
+        write(f"jumpI -> {op.targets[0]}\n")
+
+
+def allocate(ir_list, k, vr_const=None, out=None, regional=True, victim="furthest",
+             reserve=None, spill_base=32768):
+    """Perform register allocation with k registers
+
+    VRs in vr_const are rematerialized with a loadI instead of spilled.
+    Code is written to out, which defaults to stdout. Returns a dict
+    counting spills, restores, rematerializations and the spills avoided
+    by rematerializing folded constants.
+
+    With regional false, the spill register is reserved for the whole
+    block as soon as any spill can occur. victim is passed to get_pr.
+    reserve gives precomputed spill regions, e.g. from a ColumnBlock.
+    Spill slots start at spill_base.
+    State about a VR is dropped at its last use, so apart from reserve
+    memory use is bounded by the values live at once.
+    """
+    # Reserve a register for spill addresses only where spills can occur
+    if reserve is None:
+        # A fused front end has already computed the pressure profile
+        pressure = getattr(ir_list, "pressure", None)
+        if pressure is None:
+            pressure = compute_pressure(ir_list)
+        reserve = compute_spill_regions(ir_list, pressure, k)
+        if not regional:
+            reserve = [any(reserve)] * len(reserve)
+    spill_reg = -1
+    num_regs = k
     
     pr_to_vr = [None] * num_regs
     vr_to_pr = {}
     vr_nu = {}
     vr_spilled = {}
-    vr_loadI = {}  # Track loadI constants for rematerialization
+    vr_const = vr_const or {}
+    vr_loadI = {}  # Constants of defined VRs, for rematerialization
+    vr_folded = set()  # Constants computed by arithmetic rather than loadI
+    stats = {"spills": 0, "restores": 0, "remats": 0, "avoided": 0}
     
-    next_spill = 32768
+    next_spill = spill_base
+    write = (out or sys.stdout).write
     
-    for op in ir_list.iterate_forward():
+    def is_clean(vr):
+        """Check whether vr can be evicted without a store"""
+        return vr in vr_loadI or vr in vr_spilled
+    
+    def evict(pr):
+        """Free pr, spilling its value unless it can be rematerialized"""
+        nonlocal next_spill
+        old_vr = pr_to_vr[pr]
+        if old_vr in vr_loadI:
+            if old_vr in vr_folded:
+                vr_folded.discard(old_vr)
+                stats["avoided"] += 1
+        elif old_vr not in vr_spilled:
+            vr_spilled[old_vr] = next_spill
+            next_spill += 4
+            stats["spills"] += 1
+            write_spill(write, vr_spilled[old_vr], pr, spill_reg)
+        if old_vr in vr_to_pr:
+            del vr_to_pr[old_vr]
+        pr_to_vr[pr] = None
+    
+    def ensure(vr):
+        """Get vr into a register, restoring or rematerializing it"""
+        if vr not in vr_to_pr:
+            pr = get_pr(pr_to_vr, vr_to_pr, vr_nu, num_regs, used_in_op, spill_reg,
+                        victim, is_clean)
+            if pr_to_vr[pr] is not None:
+                evict(pr)
+            
+            if vr in vr_loadI:
+                stats["remats"] += 1
+                write_remat(write, vr_loadI[vr], pr)
+            elif vr in vr_spilled:
+                stats["restores"] += 1
+                write_restore(write, vr_spilled[vr], pr)
+            
+            vr_to_pr[vr] = pr
+            pr_to_vr[pr] = vr
+        return vr_to_pr[vr]
+    
+    def define(vr, nu):
+        """Assign a register to a newly defined vr"""
+        pr = get_pr(pr_to_vr, vr_to_pr, vr_nu, num_regs, used_in_op, spill_reg,
+                    victim, is_clean)
+        if pr_to_vr[pr] is not None:
+            evict(pr)
+        
+        vr_to_pr[vr] = pr
+        pr_to_vr[pr] = vr
+        vr_nu[vr] = nu
+        return pr
+    
+    def release(vr):
+        """Free the register of a vr with no further uses and forget it"""
+        if vr in vr_to_pr:
+            pr_to_vr[vr_to_pr.pop(vr)] = None
+        vr_nu.pop(vr, None)
+        vr_spilled.pop(vr, None)
+        vr_loadI.pop(vr, None)
+        vr_folded.discard(vr)
+    
+    for i, op in enumerate(ir_list.iterate_forward()):
         used_in_op = set()  # Track PRs used in current operation
         
+        # Claim a free register on entry to a spill region, release it after
+        if reserve[i]:
+            if spill_reg == -1:
+                # A region starts at the first operation or at one with
+                # fewer than k values live on entry, and registers only
+                # hold live values, so one is free
+                assert None in pr_to_vr, "no free register on entry to a spill region"
+                spill_reg = pr_to_vr.index(None)
+        else:
+            spill_reg = -1
+        
         # Handle loadI specially
         if op.opcode == "loadI":
             vr3 = op.vr3 if op.vr3 >= 0 else None
             if vr3 is not None:
                 vr_loadI[vr3] = op.sr1  # Store the constant value
-                vr_nu[vr3] = op.nu3
-                
-                # Allocate a register for the definition
-                pr = get_pr(pr_to_vr, vr_to_pr, vr_nu, num_regs, used_in_op)
-                
-                # Spill if needed
-                if pr_to_vr[pr] is not None:
-                    old_vr = pr_to_vr[pr]
-                    if old_vr not in vr_loadI and old_vr not in vr_spilled:
-                        vr_spilled[old_vr] = next_spill
-                        next_spill += 4
-                        print(f"loadI {vr_spilled[old_vr]} => r{spill_reg}")
-                        print(f"store r{pr} => r{spill_reg}")
-                    if old_vr in vr_to_pr:
-                        del vr_to_pr[old_vr]
-                    pr_to_vr[pr] = None
-                
-                vr_to_pr[vr3] = pr
-                pr_to_vr[pr] = vr3
-                op.pr3 = pr
+                op.pr3 = define(vr3, op.nu3)
                 
                 # Print the loadI operation
-                print(f"loadI {op.sr1} => r{pr}")
+                write_allocated(write, op)
                 
                 # Free if dead immediately
                 if op.nu3 == float('inf'):
-                    del vr_to_pr[vr3]
-                    pr_to_vr[pr] = None
+                    release(vr3)
             continue
         
         # Get virtual registers
@@ -241,152 +438,212 @@ def allocate(ir_list, k):
         else:
             vr3_use = None
         
-        # Process first operand (vr1)
+        # Process uses, restoring or rematerializing as needed
         if vr1 is not None:
-            if vr1 not in vr_to_pr:
-                pr = get_pr(pr_to_vr, vr_to_pr, vr_nu, num_regs, used_in_op)
-                
-                # Spill if needed
-                if pr_to_vr[pr] is not None:
-                    old_vr = pr_to_vr[pr]
-                    if old_vr not in vr_loadI and old_vr not in vr_spilled:
-                        vr_spilled[old_vr] = next_spill
-                        next_spill += 4
-                        print(f"loadI {vr_spilled[old_vr]} => r{spill_reg}")
-                        print(f"store r{pr} => r{spill_reg}")
-                    if old_vr in vr_to_pr:
-                        del vr_to_pr[old_vr]
-                    pr_to_vr[pr] = None
-                
-                # Restore or rematerialize
-                if vr1 in vr_loadI:
-                    print(f"loadI {vr_loadI[vr1]} => r{pr}")
-                elif vr1 in vr_spilled:
-                    print(f"loadI {vr_spilled[vr1]} => r{spill_reg}")
-                    print(f"load r{spill_reg} => r{pr}")
-                
-                vr_to_pr[vr1] = pr
-                pr_to_vr[pr] = vr1
-            
-            op.pr1 = vr_to_pr[vr1]
+            op.pr1 = ensure(vr1)
             vr_nu[vr1] = op.nu1
             used_in_op.add(op.pr1)
         
-        # Process second operand (vr2)
         if vr2 is not None:
-            if vr2 not in vr_to_pr:
-                pr = get_pr(pr_to_vr, vr_to_pr, vr_nu, num_regs, used_in_op)
-                
-                if pr_to_vr[pr] is not None:
-                    old_vr = pr_to_vr[pr]
-                    if old_vr not in vr_loadI and old_vr not in vr_spilled:
-                        vr_spilled[old_vr] = next_spill
-                        next_spill += 4
-                        print(f"loadI {vr_spilled[old_vr]} => r{spill_reg}")
-                        print(f"store r{pr} => r{spill_reg}")
-                    if old_vr in vr_to_pr:
-                        del vr_to_pr[old_vr]
-                    pr_to_vr[pr] = None
-                
-                if vr2 in vr_loadI:
-                    print(f"loadI {vr_loadI[vr2]} => r{pr}")
-                elif vr2 in vr_spilled:
-                    print(f"loadI {vr_spilled[vr2]} => r{spill_reg}")
-                    print(f"load r{spill_reg} => r{pr}")
-                
-                vr_to_pr[vr2] = pr
-                pr_to_vr[pr] = vr2
-            
-            op.pr2 = vr_to_pr[vr2]
+            op.pr2 = ensure(vr2)
             vr_nu[vr2] = op.nu2
             used_in_op.add(op.pr2)
         
-        # Process store's third operand as use
         if vr3_use is not None:
-            if vr3_use not in vr_to_pr:
-                pr = get_pr(pr_to_vr, vr_to_pr, vr_nu, num_regs, used_in_op)
-                
-                if pr_to_vr[pr] is not None:
-                    old_vr = pr_to_vr[pr]
-                    if old_vr not in vr_loadI and old_vr not in vr_spilled:
-                        vr_spilled[old_vr] = next_spill
-                        next_spill += 4
-                        print(f"loadI {vr_spilled[old_vr]} => r{spill_reg}")
-                        print(f"store r{pr} => r{spill_reg}")
-                    if old_vr in vr_to_pr:
-                        del vr_to_pr[old_vr]
-                    pr_to_vr[pr] = None
-                
-                if vr3_use in vr_loadI:
-                    print(f"loadI {vr_loadI[vr3_use]} => r{pr}")
-                elif vr3_use in vr_spilled:
-                    print(f"loadI {vr_spilled[vr3_use]} => r{spill_reg}")
-                    print(f"load r{spill_reg} => r{pr}")
-                
-                vr_to_pr[vr3_use] = pr
-                pr_to_vr[pr] = vr3_use
-            
-            op.pr3 = vr_to_pr[vr3_use]
+            op.pr3 = ensure(vr3_use)
             vr_nu[vr3_use] = op.nu3
             used_in_op.add(op.pr3)
         
         # Free values that are dead after use
         if vr1 is not None and op.nu1 == float('inf'):
-            if vr1 in vr_to_pr:
-                pr = vr_to_pr[vr1]
-                del vr_to_pr[vr1]
-                pr_to_vr[pr] = None
-        
+            release(vr1)
         if vr2 is not None and op.nu2 == float('inf'):
-            if vr2 in vr_to_pr:
-                pr = vr_to_pr[vr2]
-                del vr_to_pr[vr2]
-                pr_to_vr[pr] = None
-        
+            release(vr2)
         if vr3_use is not None and op.nu3 == float('inf'):
-            if vr3_use in vr_to_pr:
-                pr = vr_to_pr[vr3_use]
-                del vr_to_pr[vr3_use]
-                pr_to_vr[pr] = None
+            release(vr3_use)
         
         # Handle definition (not for loadI or store)
         if vr3 is not None:
-            pr = get_pr(pr_to_vr, vr_to_pr, vr_nu, num_regs, used_in_op)
-            
-            if pr_to_vr[pr] is not None:
-                old_vr = pr_to_vr[pr]
-                if old_vr not in vr_loadI and old_vr not in vr_spilled:
-                    vr_spilled[old_vr] = next_spill
-                    next_spill += 4
-                    print(f"loadI {vr_spilled[old_vr]} => r{spill_reg}")
-                    print(f"store r{pr} => r{spill_reg}")
-                if old_vr in vr_to_pr:
-                    del vr_to_pr[old_vr]
-                pr_to_vr[pr] = None
-            
-            vr_to_pr[vr3] = pr
-            pr_to_vr[pr] = vr3
-            op.pr3 = pr
-            vr_nu[vr3] = op.nu3
+            if vr3 in vr_const:
+                vr_loadI[vr3] = vr_const[vr3]
+                vr_folded.add(vr3)
+            op.pr3 = define(vr3, op.nu3)
             
             # Free if dead immediately
             if op.nu3 == float('inf'):
-                del vr_to_pr[vr3]
-                pr_to_vr[pr] = None
+                release(vr3)
         
         # Print the allocated operation
-        if op.opcode == "load":
-            print(f"load r{op.pr1} => r{op.pr3}")
-        elif op.opcode == "store":
-            print(f"store r{op.pr1} => r{op.pr3}")
-        elif op.opcode in ["add", "sub", "mult", "lshift", "rshift"]:
-            print(f"{op.opcode} r{op.pr1}, r{op.pr2} => r{op.pr3}")
-        elif op.opcode == "output":
-            print(f"output {op.sr1}")
-        elif op.opcode == "nop":
-            print("nop")
+        write_allocated(write, op)
+    
+    return stats
 
 
+def compute_intervals(ir_list):
+    """Compute the live interval of every VR
+
+    Operation i reads its operands at position 2i and writes its result
+    at 2i+1, so a result may share a register with an operand whose last
+    use is the same operation. Returns (start, end) dicts keyed by VR.
+    """
+    start = {}
+    end = {}
+    
+    for i, op in enumerate(ir_list.iterate_forward()):
+        pos = 2 * i
+        if op.opcode in ["load", "store", "add", "sub", "mult", "lshift", "rshift"]:
+            for vr in (op.vr1, op.vr2, op.vr3 if op.opcode == "store" else -1):
+                if vr >= 0:
+                    if vr not in start:
+                        start[vr] = pos
+                    end[vr] = pos
+        
+        if op.opcode != "store" and op.vr3 >= 0:
+            start[op.vr3] = pos + 1
+            end[op.vr3] = pos + 1
+    
+    return start, end
+
+
+def linear_scan(start, end, num_regs):
+    """Assign registers to live intervals with linear scan
+
+    Intervals are visited by start; when no register is free, the active
+    interval that ends furthest away is spilled. Returns (location,
+    spill_pos): the register of each VR, and the position from which each
+    spilled VR lives in memory instead.
+    """
+    free = list(range(num_regs))
+    active = []  # (end, vr), sorted by end
+    location = {}
+    spill_pos = {}
+    
+    for vr in sorted(start, key=start.get):
+        pos = start[vr]
+        
+        # Expire intervals that ended before this one starts
+        while active and active[0][0] < pos:
+            heapq.heappush(free, location[active.pop(0)[1]])
+        
+        if free:
+            location[vr] = heapq.heappop(free)
+            bisect.insort(active, (end[vr], vr))
+        elif active[-1][0] > end[vr]:
+            # Hand the register of the furthest-ending interval to this one
+            far = active.pop()[1]
+            location[vr] = location[far]
+            spill_pos[far] = pos
+            bisect.insort(active, (end[vr], vr))
+        else:
+            spill_pos[vr] = pos
+    
+    return location, spill_pos
+
+
+def allocate_linear_scan(ir_list, k, vr_const=None, out=None):
+    """Perform register allocation with k registers using linear scan
+
+    Spilled values are reloaded into one of two scratch registers, which
+    are only reserved when the intervals do not fit in k registers.
+    Takes and returns the same arguments and stats as allocate.
+    """
+    vr_const = vr_const or {}
+    start, end = compute_intervals(ir_list)
+    
+    location, spill_pos = linear_scan(start, end, k)
+    if spill_pos:
+        location, spill_pos = linear_scan(start, end, k - 2)
+    scratch = (k - 2, k - 1)
+    
+    # Values evicted from a register are stored just before the op
+    # that takes the register over
+    evicted = {}
+    for vr, pos in spill_pos.items():
+        if pos != start[vr] and vr not in vr_const:
+            evicted.setdefault(pos // 2, []).append(vr)
+    
+    vr_spilled = {}
+    loadI_vrs = set()
+    stats = {"spills": 0, "restores": 0, "remats": 0, "avoided": 0}
+    next_spill = 32768
+    write = (out or sys.stdout).write
+    
+    for i, op in enumerate(ir_list.iterate_forward()):
+        for vr in evicted.get(i, ()):
+            vr_spilled[vr] = next_spill
+            next_spill += 4
+            stats["spills"] += 1
+            write_spill(write, vr_spilled[vr], location[vr], scratch[1])
+        
+        # Bring spilled operands into the scratch registers
+        pos = 2 * i
+        loaded = {}
+        for field in ("1", "2", "3"):
+            if field == "3" and op.opcode != "store":
+                break
+            vr = getattr(op, "vr" + field)
+            if vr < 0:
+                continue
+            if vr in spill_pos and spill_pos[vr] <= pos:
+                if vr not in loaded:
+                    pr = scratch[len(loaded)]
+                    loaded[vr] = pr
+                    if vr in vr_const:
+                        stats["remats"] += 1
+                        write_remat(write, vr_const[vr], pr)
+                    elif vr in vr_spilled:
+                        stats["restores"] += 1
+                        write_restore(write, vr_spilled[vr], pr)
+                setattr(op, "pr" + field, loaded[vr])
+            else:
+                setattr(op, "pr" + field, location[vr])
+        
+        vr3 = op.vr3 if op.opcode != "store" else -1
+        if vr3 < 0:
+            write_allocated(write, op)
+            continue
+        
+        if op.opcode == "loadI":
+            loadI_vrs.add(vr3)
+        
+        if vr3 not in spill_pos or spill_pos[vr3] != start[vr3]:
+            op.pr3 = location[vr3]
+            write_allocated(write, op)
+        elif vr3 in vr_const:
+            # Spilled for its whole life; every use rematerializes it
+            if vr3 not in loadI_vrs:
+                stats["avoided"] += 1
+        else:
+            op.pr3 = scratch[0]
+            write_allocated(write, op)
+            vr_spilled[vr3] = next_spill
+            next_spill += 4
+            stats["spills"] += 1
+            write_spill(write, vr_spilled[vr3], scratch[0], scratch[1])
+    
+    stats["avoided"] += sum(1 for vr in spill_pos
+                            if vr in vr_const and spill_pos[vr] != start[vr]
+                            and vr not in loadI_vrs)
+    return stats
+
+
+ALLOCATORS = {"local": allocate, "linear": allocate_linear_scan}
+
+
+def allocate_out_of_core(filename, k, out=None):
+    """Allocate a block from memory-mapped columns instead of an IRList
+
+    The block is parsed and renamed in a streaming pass, next uses are
+    computed backward over the column files, and the allocator reads them
+    sequentially while writing code. Memory use depends on k and on the
+    values live at once, not on block length. Returns the allocator stats,
+    or None if the block has syntax errors, labels or branches.
+    """
+    with ColumnBlock() as block:
+        if not block.load(filename):
+            return None
+        block.analyze()
+        return allocate(block, k, block.constants, out, reserve=block.spill_regions(k))
 
 
 def print_renamed(ir_list):
@@ -405,58 +662,701 @@ def print_renamed(ir_list):
         elif op.opcode == "nop":
             print("nop")
 
+def copy_operation(op):
+    """Copy an operation's opcode, line and source fields"""
+    copy = ILOCOperation(op.line, op.opcode)
+    copy.sr1, copy.sr2, copy.sr3 = op.sr1, op.sr2, op.sr3
+    copy.targets = op.targets
+    return copy
+
+
+def lower_block(block, live_in, live_out, homes, temp):
+    """Make a basic block self-contained for the local allocator
+
+    Registers live across blocks are kept in memory at their home address
+    between blocks: a live-in register is loaded before its first use and
+    a live-out one stored after its last definition, using temp for the
+    address. Returns a copy of the block as an IRList, and the numbers
+    of loads and stores inserted.
+    """
+    last_def = {}
+    for i, op in enumerate(block.ops):
+        reg = op_registers(op)[1]
+        if reg in live_out:
+            last_def[reg] = i
+    
+    ir_list = IRList()
+    local = set()  # Registers already loaded or defined in this block
+    loads = stores = 0
+    for i, op in enumerate(block.ops):
+        uses, reg = op_registers(op)
+        for sr in uses:
+            if sr in live_in and sr not in local:
+                local.add(sr)
+                load = ILOCOperation(op.line, "loadI")
+                load.sr1, load.sr3 = homes[sr], temp
+                ir_list.append(load)
+                load = ILOCOperation(op.line, "load")
+                load.sr1, load.sr3 = temp, sr
+                ir_list.append(load)
+                loads += 1
+        
+        ir_list.append(copy_operation(op))
+        if reg >= 0:
+            local.add(reg)
+            if last_def.get(reg) == i:
+                store = ILOCOperation(op.line, "loadI")
+                store.sr1, store.sr3 = homes[reg], temp
+                ir_list.append(store)
+                store = ILOCOperation(op.line, "store")
+                store.sr1, store.sr3 = reg, temp
+                ir_list.append(store)
+                stores += 1
+    
+    return ir_list, loads, stores
+
+
+def allocate_global(ir_list, k, vr_const=None, out=None, cfg=None):
+    """Allocate a program with labels and branches, block by block
+
+    Global liveness decides which registers cross block boundaries; only
+    those get a home address, which precedes the spill slots. Each block
+    is lowered, renamed and allocated on its own. vr_const is unused, as
+    renaming is per block. cfg may give (blocks, registers) with liveness
+    already solved. Returns the summed allocator stats, which count the
+    stores and loads of homes as spills and restores.
+    """
+    if cfg is None:
+        blocks = build_cfg(ir_list)
+        registers, _ = compute_liveness(blocks)
+    else:
+        blocks, registers = cfg
+    
+    global_regs = 0
+    for block in blocks:
+        global_regs |= block.livein
+    homes = {sr: 32768 + 4 * i
+             for i, sr in enumerate(sorted(live_registers(global_regs, registers)))}
+    spill_base = 32768 + 4 * len(homes)
+    temp = max(registers, default=-1) + 1
+    
+    write = (out or sys.stdout).write
+    stats = {"spills": 0, "restores": 0, "remats": 0, "avoided": 0}
+    for block in blocks:
+        live_in = set(live_registers(block.livein, registers))
+        live_out = set(live_registers(block.liveout, registers))
+        block_ir, loads, stores = lower_block(block, live_in, live_out, homes, temp)
+        stats["restores"] += loads
+        stats["spills"] += stores
+        block_const = {}
+        rename_registers(block_ir, block_const)
+        
+        if block.label is not None:
+            write(f"{block.label}: ")
+        block_stats = allocate(block_ir, k, block_const, out, spill_base=spill_base)
+        for key in stats:
+            stats[key] += block_stats[key]
+    
+    return stats
+
+
+def rename_streaming(filename, out=None):
+    """Rename a block in one pass, writing each operation as it is parsed
+
+    VRs are numbered as by rename_registers, but only the SR -> VR map is
+    kept, so memory stays flat however long the block is. Operations
+    before a syntax error are still written. Returns False on errors, and
+    on a label or branch, as renaming across blocks needs the CFG.
+    """
+    sr_to_vr = {}
+    next_vr = 0
+    control_flow = False
+    write = (out or sys.stdout).write
+    
+    def use(sr):
+        nonlocal next_vr
+        vr = sr_to_vr.get(sr)
+        if vr is None:
+            vr = sr_to_vr[sr] = next_vr
+            next_vr += 1
+        return vr
+    
+    def define(sr):
+        nonlocal next_vr
+        vr = sr_to_vr[sr] = next_vr
+        next_vr += 1
+        return vr
+    
+    def rename(op):
+        nonlocal control_flow
+        opcode = op.opcode
+        if control_flow or op.label is not None or opcode in BRANCHES:
+            control_flow = True
+        elif opcode == "loadI":
+            write(f"loadI {op.sr1} => r{define(op.sr3)}\n")
+        elif opcode == "load":
+            vr1 = use(op.sr1)
+            write(f"load r{vr1} => r{define(op.sr3)}\n")
+        elif opcode == "store":
+            vr1 = use(op.sr1)
+            write(f"store r{vr1} => r{use(op.sr3)}\n")
+        elif opcode == "output":
+            write(f"output {op.sr1}\n")
+        elif opcode == "nop":
+            write("nop\n")
+        else:
+            vr1 = use(op.sr1)
+            vr2 = use(op.sr2)
+            write(f"{opcode} r{vr1}, r{vr2} => r{define(op.sr3)}\n")
+    
+    scanner = Scanner(filename, stream=True)
+    parser = Parser(scanner, sink=rename)
+    ok = parser.parse()
+    metrics.scanned(filename, scanner, parser)
+    metrics.add(srs=len(sr_to_vr), vrs=next_vr)
+    return ok and not control_flow
+
+
+def record_metrics(ir_list, stats=None):
+    """Record a block's register counts and allocator stats for --metrics"""
+    if metrics.record is None:
+        return
+    srs, vrs = set(), set()
+    for op in ir_list.iterate_forward():
+        uses, defined = op_registers(op)
+        srs.update(uses)
+        srs.add(defined)
+        if op.opcode == "loadI":
+            vrs.add(op.vr3)
+        elif op.opcode in ("load", "store"):
+            vrs.update((op.vr1, op.vr3))
+        elif op.opcode in ("add", "sub", "mult", "lshift", "rshift"):
+            vrs.update((op.vr1, op.vr2, op.vr3))
+    srs.discard(-1)
+    metrics.add(srs=len(srs))
+    if not has_control_flow(ir_list):
+        maxlive = getattr(ir_list, "maxlive", None)
+        metrics.add(vrs=len(vrs), maxlive=compute_maxlive(ir_list) if maxlive is None
+                    else maxlive)
+    if stats:
+        metrics.add(**{name: stats[name] for name in ("spills", "restores", "remats")
+                       if name in stats})
+
+
+def print_stats(stats, k):
+    """Report allocator statistics on stderr"""
+    print(f"// k = {k}: {stats['spills']} spills, {stats['restores']} restores, "
+          f"{stats['remats']} rematerializations, "
+          f"{stats['avoided']} spills avoided by constant folding", file=sys.stderr)
+
+
+# Block shared with forked batch workers:
+# (ir_list, vr_const, outdir, stem, allocator)
+_batch = None
+
+
+def allocate_to_file(k):
+    """Allocate the shared batch block with k registers into its own file
+
+    Returns (k, stats, cycles), cycles estimated as for --portfolio.
+    """
+    ir_list, vr_const, outdir, stem, allocator = _batch
+    out = StringIO()
+    stats = allocator(ir_list, k, vr_const, out)
+    code = out.getvalue()
+    with open(os.path.join(outdir, f"{stem}_k{k}.i"), "w") as f:
+        f.write(code)
+    return k, stats, estimate_code_cycles(code)
+
+
+def batch_allocate(ir_list, vr_const, ks, outdir, stem, jobs=1, allocator=allocate):
+    """Allocate one renamed block for every k in ks
+
+    With jobs > 1 the values of k are spread over a pool of forked
+    workers, which share the analyzed IR instead of re-parsing it.
+    """
+    global _batch
+    _batch = (ir_list, vr_const, outdir, stem, allocator)
+    
+    if jobs > 1:
+        import multiprocessing
+        with multiprocessing.get_context("fork").Pool(jobs) as pool:
+            return pool.map(allocate_to_file, ks)
+    return [allocate_to_file(k) for k in ks]
+
+
+def print_batch_summary(ir_list, results):
+    """Print a table of spill code and estimated cycles for each k"""
+    base_ops = ir_list.get_operation_count()
+    
+    print("k\tspills\trestores\tremats\tinserted\tops\tcycles")
+    for k, stats, cycles in results:
+        inserted = 2 * stats["spills"] + 2 * stats["restores"] + stats["remats"]
+        print(f"{k}\t{stats['spills']}\t{stats['restores']}\t{stats['remats']}"
+              f"\t{inserted}\t{base_ops + inserted}\t{cycles}")
+
+
+# Allocator variants tried by --portfolio: name -> (allocator, options)
+PORTFOLIO = {
+    "local": (allocate, {}),
+    "local-clean-tie": (allocate, {"victim": "clean-tie"}),
+    "local-clean-first": (allocate, {"victim": "clean-first"}),
+    "local-whole-block": (allocate, {"regional": False}),
+    "linear": (allocate_linear_scan, {}),
+}
+
+# Block shared with forked portfolio workers: (ir_list, vr_const, k)
+_portfolio = None
+
+
+def run_variant(name):
+    """Allocate the shared portfolio block with one variant and score it"""
+    ir_list, vr_const, k = _portfolio
+    allocator, options = PORTFOLIO[name]
+    out = StringIO()
+    start = perf_counter()
+    stats = allocator(ir_list, k, vr_const, out, **options)
+    elapsed = perf_counter() - start
+    code = out.getvalue()
+    return name, code, stats, estimate_code_cycles(code), elapsed
+
+
+def portfolio_allocate(ir_list, vr_const, k, jobs=None):
+    """Run every portfolio variant and return their results, best first
+
+    Variants run in forked workers that share the renamed IR; results are
+    ordered by estimated cycles, ties going to the earlier variant.
+    """
+    global _portfolio
+    _portfolio = (ir_list, vr_const, k)
+    names = list(PORTFOLIO)
+    jobs = min(jobs or os.cpu_count() or 1, len(names))
+    
+    if jobs > 1:
+        import multiprocessing
+        with multiprocessing.get_context("fork").Pool(jobs) as pool:
+            results = pool.map(run_variant, names)
+    else:
+        results = [run_variant(name) for name in names]
+    
+    return sorted(results, key=lambda result: result[3])
+
+
+def print_portfolio_report(results, k):
+    """Report per-variant timing and the chosen winner on stderr"""
+    print(f"// portfolio k = {k}", file=sys.stderr)
+    print(f"// {'variant':20s} {'time':>9s} {'cycles':>9s}", file=sys.stderr)
+    for name, code, stats, cycles, elapsed in results:
+        print(f"// {name:20s} {elapsed:8.3f}s {cycles:9d}", file=sys.stderr)
+    print(f"// winner: {results[0][0]}", file=sys.stderr)
+
+
+def print_optimizer_report(report, ops_before, ops_after, maxlive_before, maxlive_after):
+    """Report what the optimizer removed on stderr"""
+    print(f"// optimizer: {ops_before} -> {ops_after} ops, "
+          f"MAXLIVE {maxlive_before} -> {maxlive_after}", file=sys.stderr)
+    print("// " + ", ".join(f"{count} {name}" for name, count in report.items()),
+          file=sys.stderr)
+
+
+def load_block(filename, optimized=False):
+    """Parse and rename a block, optionally optimizing it first
+
+    Returns (ir_list, vr_const); exits if the block cannot be read.
+    Without optimization the fused front end renames the block, computes
+    next uses and its pressure profile in one sweep, and the returned
+    FusedBlock stands in for the IRList. A program with labels or
+    branches is returned unrenamed, with vr_const None, for
+    allocate_global.
+    """
+    if not os.path.exists(filename):
+        sys.exit(1)
+    
+    block = FusedBlock()
+    with phase("parse"):
+        if not block.load(filename):
+            sys.exit(1)
+    
+    if has_control_flow(block):
+        if optimized:
+            sys.exit(1)
+        return block, None
+    
+    if not optimized:
+        with phase("analyze"):
+            block.analyze()
+        return block, block.vr_const
+    
+    with phase("rename"):
+        ir_list = block.to_ir_list()
+        rename_registers(ir_list)
+    ops_before = ir_list.get_operation_count()
+    maxlive_before = compute_maxlive(ir_list)
+    with phase("optimize"):
+        report = optimize(ir_list)
+    vr_const = {}
+    with phase("rename"):
+        rename_registers(ir_list, vr_const)
+    print_optimizer_report(report, ops_before, ir_list.get_operation_count(),
+                           maxlive_before, compute_maxlive(ir_list))
+    return ir_list, vr_const
+
+
+# Analyses and passes for --passes. The manager's state holds the block
+# ("ir_list"), its constants ("vr_const"), "k", the "allocator", and once
+# a pass has allocated it, the "code" and its "stats".
+
+def analyze_renaming(manager):
+    """Rename the block and collect its constants; next-use sets next uses"""
+    state = manager.state
+    state["vr_const"] = {}
+    return rename_registers(state["ir_list"], state["vr_const"], next_uses=False)
+
+
+def analyze_next_uses(manager):
+    compute_next_uses(manager.state["ir_list"])
+
+
+def analyze_pressure(manager):
+    return compute_pressure(manager.state["ir_list"])
+
+
+def analyze_liveness(manager):
+    """Build the CFG and solve global liveness: (blocks, registers)"""
+    blocks = build_cfg(manager.state["ir_list"])
+    registers, _ = compute_liveness(blocks)
+    return blocks, registers
+
+
+def analyze_dependences(manager):
+    return build_dependence_graph(list(manager.state["ir_list"].iterate_forward()))
+
+
+def run_optimize(manager):
+    """Optimize the block, reporting ops removed and MAXLIVE on stderr
+
+    The pass invalidates everything itself, as its report needs the
+    pressure of the optimized block.
+    """
+    ir_list = manager.state["ir_list"]
+    ops_before = ir_list.get_operation_count()
+    maxlive_before = max(manager.get("pressure"), default=0)
+    report = optimize(ir_list)
+    manager.invalidate("all")
+    print_optimizer_report(report, ops_before, ir_list.get_operation_count(),
+                           maxlive_before, max(manager.get("pressure"), default=0))
+
+
+def run_schedule(manager):
+    """List-schedule the block before allocation
+
+    Operations are renumbered in their new order, as next-use distances
+    are measured in line numbers.
+    """
+    state = manager.state
+    order, _ = schedule(state["ir_list"], manager.get("dependence-graph"))
+    ir_list = IRList()
+    for line, op in enumerate(order, 1):
+        op.line = line
+        op.prev = op.next = None
+        ir_list.append(op)
+    state["ir_list"] = ir_list
+
+
+def run_allocate(manager):
+    """Allocate the block with the selected engine"""
+    state = manager.state
+    ir_list, k = state["ir_list"], state["k"]
+    out = StringIO()
+    if state["allocator"] is allocate:
+        reserve = compute_spill_regions(ir_list, manager.get("pressure"), k)
+        state["stats"] = allocate(ir_list, k, state["vr_const"], out, reserve=reserve)
+    else:
+        state["stats"] = state["allocator"](ir_list, k, state["vr_const"], out)
+    state["code"] = out.getvalue()
+
+
+def run_allocate_global(manager):
+    """Allocate a program with labels and branches"""
+    state = manager.state
+    out = StringIO()
+    state["stats"] = allocate_global(state["ir_list"], state["k"], out=out,
+                                     cfg=manager.get("liveness"))
+    state["code"] = out.getvalue()
+
+
+def run_schedule_code(manager):
+    """List-schedule the allocated code"""
+    state = manager.state
+    if state.get("code") is None:
+        print("412alloc: schedule-code needs allocated code", file=sys.stderr)
+        sys.exit(1)
+    out = StringIO()
+    schedule_code(state["code"], out)
+    state["code"] = out.getvalue()
+
+
+ANALYSES = [
+    Analysis("renaming", analyze_renaming),
+    Analysis("next-use", analyze_next_uses, requires=("renaming",)),
+    Analysis("pressure", analyze_pressure, requires=("renaming",)),
+    Analysis("liveness", analyze_liveness),
+    Analysis("dependence-graph", analyze_dependences),
+]
+
+PASSES = [
+    Pass("optimize", run_optimize, requires=("renaming",)),
+    Pass("schedule", run_schedule, requires=("dependence-graph",), invalidates="all"),
+    Pass("allocate", run_allocate, requires=("renaming", "next-use", "pressure")),
+    Pass("allocate-global", run_allocate_global, requires=("liveness",)),
+    Pass("schedule-code", run_schedule_code),
+]
+
+
+def run_pipeline(filename, k, pipeline, allocator=allocate, time_passes=False,
+                 show_stats=False):
+    """Parse a block and run the named passes over it, then print it
+
+    Prints the allocated code, or the block itself if no pass allocated
+    it. Programs with labels or branches only support allocate-global.
+    """
+    if not os.path.exists(filename):
+        sys.exit(1)
+    
+    state = {"k": k, "allocator": allocator, "vr_const": {}, "code": None}
+    manager = PassManager(ANALYSES, PASSES, state)
+    unknown = manager.unknown(pipeline)
+    if unknown:
+        print(f"412alloc: unknown pass {unknown[0]}; passes are "
+              + ", ".join(p.name for p in PASSES), file=sys.stderr)
+        sys.exit(1)
+    
+    scanner = Scanner(filename)
+    parser = Parser(scanner)
+    ok = manager.time("parse", "phase", parser.parse)
+    metrics.scanned(filename, scanner, parser, parser.get_ir().get_operation_count())
+    if not ok:
+        sys.exit(1)
+    state["ir_list"] = parser.get_ir()
+    if has_control_flow(state["ir_list"]) and set(pipeline) - {"allocate-global"}:
+        sys.exit(1)
+    
+    manager.run(pipeline)
+    
+    if state["code"] is not None:
+        sys.stdout.write(state["code"])
+    else:
+        write = sys.stdout.write
+        for op in state["ir_list"].iterate_forward():
+            write_op(write, op)
+    if show_stats and "stats" in state:
+        print_stats(state["stats"], k)
+    record_metrics(state["ir_list"], state.get("stats"))
+    if time_passes:
+        manager.print_timings()
+
+
+def take_option(args, flag):
+    """Remove a flag and its value from args, returning the value"""
+    if flag not in args:
+        return None
+    idx = args.index(flag)
+    if idx + 1 >= len(args):
+        sys.exit(1)
+    value = args[idx + 1]
+    del args[idx:idx + 2]
+    return value
+
+
 def main():
-    if len(sys.argv) < 2:
+    args = sys.argv[1:]
+    show_stats = "--stats" in args
+    if show_stats:
+        args.remove("--stats")
+    
+    portfolio = "--portfolio" in args
+    if portfolio:
+        args.remove("--portfolio")
+    
+    scheduled = "--schedule" in args
+    if scheduled:
+        args.remove("--schedule")
+    
+    optimized = "--optimize" in args
+    if optimized:
+        args.remove("--optimize")
+    
+    out_of_core = "--out-of-core" in args
+    if out_of_core:
+        args.remove("--out-of-core")
+    
+    time_passes = "--time-passes" in args
+    if time_passes:
+        args.remove("--time-passes")
+    
+    pipeline = None
+    for arg in args:
+        if arg.startswith("--passes="):
+            pipeline = [name for name in arg[len("--passes="):].split(",") if name]
+            args.remove(arg)
+            break
+    
+    engine = take_option(args, "--engine") or "local"
+    if engine not in ALLOCATORS:
+        sys.exit(1)
+    allocator = ALLOCATORS[engine]
+    
+    if len(args) < 1:
         sys.exit(1)
     
-    if sys.argv[1] == "-h":
-        print("Usage: 412alloc k filename")
+    if args[0] == "-h":
+        print("Usage: 412alloc [--stats] [--optimize] [--schedule] [--engine local|linear] k filename")
+        print("       412alloc -k k1,k2,... filename -o outdir [-j jobs]")
+        print("       412alloc --portfolio [-j jobs] k filename")
+        print("       412alloc --out-of-core [--stats] k filename")
+        print("       412alloc --passes=pass,... [--time-passes] [--stats] k filename")
         print("       412alloc -x filename")
         print("       412alloc -h")
+        print("  --stats   report spills, restores and rematerializations on stderr")
+        print("  -k        allocate for every listed k, writing outdir/<block>_k<k>.i")
+        print("            and printing a summary table")
+        print("  -j        number of worker processes for -k (default 1)")
+        print("  --engine  local: bottom-up local allocator (default)")
+        print("            linear: linear scan over live intervals")
+        print("  --portfolio  run several allocator variants in parallel and")
+        print("               print the one with the fewest estimated cycles")
+        print("  --schedule   list-schedule the allocated code before printing it")
+        print("  --optimize   fold constants, remove redundant and dead code before")
+        print("               allocating, reporting the effect on stderr")
+        print("  --out-of-core  keep the renamed block in memory-mapped temporary")
+        print("                 files, for blocks too large to hold in memory")
+        print("  --passes=    run a pipeline of passes: optimize, schedule (before")
+        print("               allocation), allocate, allocate-global, schedule-code")
+        print("               (after allocation); analyses are cached between them")
+        print("  --time-passes  print the time of each pass and analysis on stderr")
+        print("  --profile[=functions,memory,report.json]  write phase times, and")
+        print("               optionally hot functions and peak memory, as JSON to")
+        print("               report.json (default 412alloc.profile.json); the")
+        print("               ILOC_PROFILE environment variable does the same")
+        print("  --profile=sample[=ms],budget=s,stacks=path  also sample the stack")
+        print("               into collapsed stacks for a flame graph, written on exit,")
+        print("               on SIGTERM or after s seconds")
+        print("  --metrics[=fd|file]  append a JSON line of counts and per-phase")
+        print("               rates to fd or file (default stderr); ILOC_METRICS")
+        print("               does the same")
         sys.exit(0)
     
-    elif sys.argv[1] == "-x":
-        if len(sys.argv) != 3:
+    elif args[0] == "-x":
+        if len(args) != 2:
             sys.exit(1)
         
-        filename = sys.argv[2]
+        filename = args[1]
         if not os.path.exists(filename):
             sys.exit(1)
         
-        scanner = Scanner(filename)
-        parser = Parser(scanner)
-        if not parser.parse():
+        with phase("rename"):
+            renamed = rename_streaming(filename)
+        if not renamed:
+            sys.exit(1)
+    
+    elif args[0] == "-k":
+        try:
+            outdir = take_option(args, "-o")
+            jobs = int(take_option(args, "-j") or 1)
+            if outdir is None or len(args) != 3 or jobs < 1:
+                sys.exit(1)
+            
+            ks = [int(k) for k in args[1].split(",")]
+            if any(k < 3 or k > 64 for k in ks):
+                sys.exit(1)
+        except ValueError:
             sys.exit(1)
         
-        ir_list = parser.get_ir()
-        rename_registers(ir_list)
-        print_renamed(ir_list)
+        filename = args[2]
+        ir_list, vr_const = load_block(filename, optimized)
+        if vr_const is None:
+            allocator = allocate_global
+        
+        os.makedirs(outdir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        with phase("allocate"):
+            results = batch_allocate(ir_list, vr_const, ks, outdir, stem, jobs, allocator)
+        record_metrics(ir_list)
+        print_batch_summary(ir_list, results)
+        if show_stats:
+            for k, stats, _ in results:
+                print_stats(stats, k)
     
     else:
         # k filename format
         try:
-            k = int(sys.argv[1])
+            jobs = take_option(args, "-j")
+            jobs = int(jobs) if jobs else None
+            k = int(args[0])
             if k < 3 or k > 64:
                 sys.exit(1)
             
-            if len(sys.argv) != 3:
+            if len(args) != 2:
                 sys.exit(1)
             
-            filename = sys.argv[2]
-            if not os.path.exists(filename):
-                sys.exit(1)
+            filename = args[1]
+            if pipeline is not None or time_passes:
+                if portfolio or out_of_core:
+                    sys.exit(1)
+                if pipeline is None:
+                    pipeline = (["optimize"] if optimized else []) + ["allocate"]
+                    if scheduled:
+                        pipeline.append("schedule-code")
+                run_pipeline(filename, k, pipeline, allocator, time_passes, show_stats)
+                return
             
-            scanner = Scanner(filename)
-            parser = Parser(scanner)
-            if not parser.parse():
-                sys.exit(1)
+            if out_of_core:
+                if optimized or portfolio or scheduled or engine != "local":
+                    sys.exit(1)
+                if not os.path.exists(filename):
+                    sys.exit(1)
+                with phase("allocate"):
+                    stats = allocate_out_of_core(filename, k)
+                if stats is None:
+                    sys.exit(1)
+                metrics.add(**{name: stats[name] for name in ("spills", "restores", "remats")})
+                if show_stats:
+                    print_stats(stats, k)
+                return
             
-            ir_list = parser.get_ir()
-            rename_registers(ir_list)
-            allocate(ir_list, k)
+            ir_list, vr_const = load_block(filename, optimized)
+            if vr_const is None:
+                if portfolio or scheduled or engine != "local":
+                    sys.exit(1)
+                allocator = allocate_global
+            # A profile times printing apart from allocation
+            out = StringIO() if scheduled or profiler.active else sys.stdout
+            with phase("allocate"):
+                if portfolio:
+                    results = portfolio_allocate(ir_list, vr_const, k, jobs)
+                    out.write(results[0][1])
+                    print_portfolio_report(results, k)
+                    stats = results[0][2]
+                else:
+                    stats = allocator(ir_list, k, vr_const, out)
+            if scheduled:
+                with phase("schedule"):
+                    schedule_code(out.getvalue())
+            elif out is not sys.stdout:
+                with phase("print"):
+                    sys.stdout.write(out.getvalue())
+            record_metrics(ir_list, stats)
+            if show_stats:
+                print_stats(stats, k)
             
         except ValueError:
             sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    profiler.start("412alloc", sys.argv)
+    metrics.start("412alloc", sys.argv)
+    try:
+        main()
+    finally:
+        metrics.finish()
+        profiler.finish()
\ No newline at end of file
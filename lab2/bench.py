@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+bench.py - Benchmark Suite with Stored Baselines
+
+Times the front end, the analyses, allocation at several k and each
+output mode of 412alloc on the SLOCs timing blocks and on blocks from
+stressgen.py. Results are saved as JSON under benchmarks/<machine>/
+<commit>.json, and compare flags benchmarks slower than a baseline by
+more than their measured noise.
+"""
+
+import sys
+import os
+import re
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import importlib
+from io import StringIO
+from contextlib import redirect_stdout, redirect_stderr
+from time import perf_counter
+from scanner import Scanner, EOF
+from parser import Parser
+from fused import FusedBlock
+from stressgen import generate, generate_aliasing
+from scheduler import build_dependence_graph
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TIMING_BLOCKS = os.path.join(HERE, "..", "auto1", "auto_time", "timing_blocks")
+BASELINES = os.path.join(HERE, "benchmarks")
+
+REPEATS = 5
+THRESHOLD = 0.10   # Smallest slowdown flagged, whatever the noise
+NOISE_FACTOR = 3   # Slowdowns within this many noise widths are not flagged
+EDGES_PER_OP = 8   # Most dependence edges a block may have per op
+
+DEFAULT_BLOCKS = ("T16k.i", "T128k.i", "stress-64k", "wave-64k", "alias-64k")
+
+# Generated blocks: name -> arguments of stressgen.generate, or of another
+# generator given as generator
+GENERATED = {
+    "stress-64k": dict(ops=65536, pressure="flat:24", seed=1),
+    "wave-64k": dict(ops=65536, pressure="wave:4:48:2000", span=64, shape="bimodal", seed=2),
+    "alias-64k": dict(ops=65536, generator=generate_aliasing),
+}
+
+alloc = importlib.import_module("412alloc")
+
+
+def scan(filename, text):
+    def run():
+        scanner = Scanner(None, text=text)
+        tokens = 0
+        while scanner.next_token().type != EOF:
+            tokens += 1
+        return tokens
+    return run
+
+
+def parse(filename, text):
+    def run():
+        parser = Parser(Scanner(None, text=text))
+        parser.parse()
+        return parser.get_ir().get_operation_count()
+    return run
+
+
+def front_end(filename, text):
+    def run():
+        block = FusedBlock()
+        block.load(None, text)
+        block.analyze()
+        return block.get_operation_count()
+    return run
+
+
+def parsed(text):
+    parser = Parser(Scanner(None, text=text))
+    parser.parse()
+    return parser.get_ir()
+
+
+def rename(filename, text):
+    ir_list = parsed(text)
+    
+    def run():
+        alloc.rename_registers(ir_list)
+        return ir_list.get_operation_count()
+    return run
+
+
+def maxlive(filename, text):
+    ir_list = parsed(text)
+    alloc.rename_registers(ir_list)
+    
+    def run():
+        alloc.compute_maxlive(ir_list)
+        return ir_list.get_operation_count()
+    return run
+
+
+def dependences(filename, text):
+    """Build the scheduler's dependence graph, checking that it stays linear"""
+    ops = list(parsed(text).iterate_forward())
+    edges = sum(len(succs) for succs in build_dependence_graph(ops))
+    if edges > EDGES_PER_OP * max(len(ops), 1):
+        raise ValueError(f"{edges} dependence edges for {len(ops)} ops")
+    
+    def run():
+        build_dependence_graph(ops)
+        return len(ops)
+    return run
+
+
+def allocation(k, allocator="local"):
+    def setup(filename, text):
+        block = FusedBlock()
+        block.load(None, text)
+        block.analyze()
+        
+        def run():
+            alloc.ALLOCATORS[allocator](block, k, block.vr_const, StringIO())
+            return block.get_operation_count()
+        return run
+    return setup
+
+
+def mode(*flags):
+    """Run 412alloc's main with flags and the block, discarding its output"""
+    def setup(filename, text):
+        ops = parsed(text).get_operation_count()
+        
+        def run():
+            saved = sys.argv
+            sys.argv = ["412alloc.py"] + list(flags) + [filename]
+            try:
+                with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+                    alloc.main()
+            except SystemExit:
+                pass
+            finally:
+                sys.argv = saved
+            return ops
+        return run
+    return setup
+
+
+# Benchmarks: name -> (unit of work, setup returning the timed function)
+BENCHMARKS = {
+    "scan": ("tokens", scan),
+    "parse": ("ops", parse),
+    "front-end": ("ops", front_end),
+    "rename": ("ops", rename),
+    "maxlive": ("ops", maxlive),
+    "dependences": ("ops", dependences),
+    "alloc-k3": ("ops", allocation(3)),
+    "alloc-k5": ("ops", allocation(5)),
+    "alloc-k15": ("ops", allocation(15)),
+    "linear-k5": ("ops", allocation(5, "linear")),
+    "mode-x": ("ops", mode("-x")),
+    "mode-k5": ("ops", mode("5")),
+    "mode-optimize": ("ops", mode("--optimize", "5")),
+    "mode-schedule": ("ops", mode("--schedule", "5")),
+}
+
+
+def machine_key():
+    """Name this machine for baseline files"""
+    return re.sub(r"[^\w.-]", "_", f"{platform.node()}-{platform.machine()}")
+
+
+def commit_key():
+    """Name the checked-out commit, marked -dirty if tracked files changed"""
+    def git(*args):
+        return subprocess.run(["git"] + list(args), cwd=HERE, capture_output=True,
+                              text=True).stdout.strip()
+    try:
+        commit = git("rev-parse", "--short", "HEAD")
+        if commit and git("status", "--porcelain", "-uno"):
+            commit += "-dirty"
+    except OSError:
+        commit = ""
+    return commit or "unknown"
+
+
+def resolve_blocks(names, directory):
+    """Return (name, filename) for each block, writing generated ones to directory"""
+    blocks = []
+    for name in names:
+        if name in GENERATED:
+            options = dict(GENERATED[name])
+            generator = options.pop("generator", generate)
+            filename = os.path.join(directory, name + ".i")
+            with open(filename, "w") as f:
+                f.write(generator(options.pop("ops"), **options))
+        elif os.path.exists(name):
+            filename = name
+        elif os.path.exists(os.path.join(TIMING_BLOCKS, name)):
+            filename = os.path.join(TIMING_BLOCKS, name)
+        else:
+            raise ValueError(f"no block '{name}'")
+        blocks.append((os.path.splitext(os.path.basename(name))[0], filename))
+    return blocks
+
+
+def measure(run, repeats):
+    """Time run repeats times after one warm-up; returns (units, samples)"""
+    units = run()
+    samples = []
+    for _ in range(repeats):
+        start = perf_counter()
+        run()
+        samples.append(perf_counter() - start)
+    return units, samples
+
+
+def noise(samples):
+    """Relative spread of repeated timings: how far the median is above the best
+    
+    Unlike the deviation, one slow outlier among a few samples barely moves it.
+    """
+    best = min(samples)
+    return statistics.median(samples) / best - 1.0 if best else 0.0
+
+
+def run_suite(blocks, names=None, repeats=REPEATS, progress=None):
+    """Run the benchmarks on every block; returns {name@block: result}
+    
+    Each result holds the unit of work and the units done, the samples,
+    the best and median time, and the noise of the samples.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as directory:
+        for block, filename in resolve_blocks(blocks, directory):
+            with open(filename) as f:
+                text = f.read()
+            for name in names or BENCHMARKS:
+                unit, setup = BENCHMARKS[name]
+                units, samples = measure(setup(filename, text), repeats)
+                key = f"{name}@{block}"
+                results[key] = {"unit": unit, "units": units, "samples": samples,
+                                "best": min(samples), "median": statistics.median(samples),
+                                "noise": noise(samples)}
+                if progress:
+                    progress(key, results[key])
+    return results
+
+
+def save_baseline(results, repeats, directory=BASELINES):
+    """Write results to directory/<machine>/<commit>.json; returns its path"""
+    machine, commit = machine_key(), commit_key()
+    os.makedirs(os.path.join(directory, machine), exist_ok=True)
+    path = os.path.join(directory, machine, commit + ".json")
+    with open(path, "w") as f:
+        json.dump({"machine": machine, "commit": commit, "python": platform.python_version(),
+                   "repeats": repeats, "results": results}, f, indent=1, sort_keys=True)
+        f.write("\n")
+    return path
+
+
+def load_baseline(name, directory=BASELINES):
+    """Load a baseline by path, or by commit for this machine"""
+    path = name if os.path.exists(name) else os.path.join(directory, machine_key(),
+                                                          name + ".json")
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """Compare best times with a baseline's; returns (rows, regressions)
+    
+    A benchmark regresses if its best time grew by more than threshold and
+    by more than NOISE_FACTOR times the larger noise of the two runs. Rows
+    are (key, baseline best, current best, change, allowed change).
+    """
+    rows, regressions = [], []
+    for key in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[key], current[key]
+        change = after["best"] / before["best"] - 1.0
+        allowed = max(threshold, NOISE_FACTOR * max(before["noise"], after["noise"]))
+        rows.append((key, before["best"], after["best"], change, allowed))
+        if change > allowed:
+            regressions.append(key)
+    return rows, regressions
+
+
+def write_results(key, result):
+    rate = result["units"] / result["best"] if result["best"] else 0.0
+    print(f"{key:28s} {result['best'] * 1000:10.2f} ms {rate:14,.0f} {result['unit']}/s "
+          f"  noise {100 * result['noise']:5.1f}%")
+
+
+def write_comparison(rows, regressions):
+    print(f"{'benchmark':28s} {'baseline':>11s} {'current':>11s} {'change':>8s} {'allowed':>8s}")
+    for key, before, after, change, allowed in rows:
+        flag = "  REGRESSED" if key in regressions else ""
+        print(f"{key:28s} {before * 1000:8.2f} ms {after * 1000:8.2f} ms "
+              f"{100 * change:+7.1f}% {100 * allowed:7.1f}%{flag}")
+    print(f"{len(rows)} benchmarks compared, {len(regressions)} regressed")
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] == "-h" or args[0] not in ("run", "compare", "list"):
+        print("Usage: bench.py run [-r repeats] [-b bench,...] [--no-save] [block...]")
+        print("       bench.py compare [-t threshold] [-r repeats] baseline [current]")
+        print("       bench.py list")
+        print("  run      time the benchmarks and save benchmarks/<machine>/<commit>.json")
+        print("  compare  compare a baseline, given as a file or a commit of this machine,")
+        print("           with another or with a fresh run; exits 1 on a regression")
+        print("  Blocks are files, SLOCs timing blocks such as T128k.i, or generated")
+        print(f"  blocks ({', '.join(GENERATED)}); default {' '.join(DEFAULT_BLOCKS)}.")
+        sys.exit(0 if args[:1] == ["-h"] else 1)
+    
+    command = args.pop(0)
+    if command == "list":
+        for name, (unit, _) in BENCHMARKS.items():
+            print(f"{name:16s} {unit}")
+        return
+    
+    repeats, threshold, names, save = REPEATS, THRESHOLD, None, True
+    try:
+        for flag in ("-r", "-t", "-b"):
+            if flag in args:
+                i = args.index(flag)
+                value = args[i + 1]
+                del args[i:i + 2]
+                if flag == "-r":
+                    repeats = max(2, int(value))
+                elif flag == "-t":
+                    threshold = float(value)
+                else:
+                    names = value.split(",")
+                    if any(name not in BENCHMARKS for name in names):
+                        raise ValueError(value)
+        if "--no-save" in args:
+            args.remove("--no-save")
+            save = False
+    except (IndexError, ValueError):
+        sys.exit(1)
+    
+    if command == "compare":
+        if len(args) not in (1, 2):
+            sys.exit(1)
+        try:
+            baseline = load_baseline(args[0])
+            current = load_baseline(args[1]) if len(args) == 2 else None
+        except (IOError, ValueError) as e:
+            print(f"bench.py: {e}", file=sys.stderr)
+            sys.exit(1)
+        if current is None:
+            # Rerun what the baseline measured, on the same blocks
+            keys = baseline["results"]
+            names = list(dict.fromkeys(key.split("@")[0] for key in keys
+                                       if key.split("@")[0] in BENCHMARKS))
+            blocks = list(dict.fromkeys(key.split("@")[1] for key in keys))
+            blocks = [block if block in GENERATED else block + ".i" for block in blocks]
+            try:
+                results = run_suite(blocks, names, repeats)
+            except ValueError as e:
+                print(f"bench.py: {e}", file=sys.stderr)
+                sys.exit(1)
+        else:
+            results = current["results"]
+        rows, regressions = compare(baseline["results"], results, threshold)
+        write_comparison(rows, regressions)
+        if regressions:
+            sys.exit(1)
+        return
+    
+    try:
+        results = run_suite(args or list(DEFAULT_BLOCKS), names, repeats, write_results)
+    except ValueError as e:
+        print(f"bench.py: {e}", file=sys.stderr)
+        sys.exit(1)
+    if save:
+        print(f"saved {save_baseline(results, repeats)}")
+
+
+if __name__ == "__main__":
+    main()
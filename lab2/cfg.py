@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+cfg.py - Control-Flow Graph and Global Liveness
+"""
+
+import sys
+import os
+import heapq
+import random
+from time import perf_counter
+from scanner import Scanner
+from parser import Parser
+from scheduler import op_registers
+
+BRANCHES = ("jumpI", "cbr")
+
+
+class BasicBlock:
+    """A maximal run of operations entered only at the top
+    
+    uevar, varkill, livein and liveout are bitsets over the registers
+    numbered by compute_liveness, held in Python integers.
+    """
+    __slots__ = ['index', 'label', 'ops', 'succs', 'preds',
+                 'uevar', 'varkill', 'livein', 'liveout']
+    
+    def __init__(self, index, label=None):
+        self.index = index
+        self.label = label
+        self.ops = []
+        self.succs = []
+        self.preds = []
+        self.uevar = 0
+        self.varkill = 0
+        self.livein = 0
+        self.liveout = 0
+
+
+def has_control_flow(ir_list):
+    """Check whether a parsed block contains labels or branches"""
+    for op in ir_list.iterate_forward():
+        if op.label is not None or op.opcode in BRANCHES:
+            return True
+    return False
+
+
+def build_cfg(ir_list):
+    """Split the IR at labels and branches and connect the blocks
+    
+    A block without a branch at its end falls through to the next one.
+    Returns the blocks in program order; the first is the entry.
+    """
+    blocks = []
+    current = None
+    for op in ir_list.iterate_forward():
+        if current is None or op.label is not None:
+            current = BasicBlock(len(blocks), op.label)
+            blocks.append(current)
+        current.ops.append(op)
+        if op.opcode in BRANCHES:
+            current = None
+    
+    by_label = {block.label: block for block in blocks if block.label is not None}
+    for i, block in enumerate(blocks):
+        last = block.ops[-1]
+        if last.opcode in BRANCHES:
+            succs = [by_label[target] for target in last.targets]
+        else:
+            succs = blocks[i + 1:i + 2]
+        for succ in succs:
+            if succ not in block.succs:
+                block.succs.append(succ)
+                succ.preds.append(block)
+    
+    return blocks
+
+
+def postorder(blocks):
+    """Order blocks so each comes after its successors, back edges aside
+    
+    Blocks unreachable from the entry follow in program order.
+    """
+    order = []
+    visited = [False] * len(blocks)
+    for root in blocks:
+        if visited[root.index]:
+            continue
+        visited[root.index] = True
+        stack = [(root, iter(root.succs))]
+        while stack:
+            block, succs = stack[-1]
+            for succ in succs:
+                if not visited[succ.index]:
+                    visited[succ.index] = True
+                    stack.append((succ, iter(succ.succs)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+    return order
+
+
+def compute_liveness(blocks):
+    """Solve global liveness over the CFG with integer bitsets
+    
+    Sets UEVAR, VARKILL, LIVEIN and LIVEOUT of every block. The worklist
+    always takes the pending block earliest in postorder, which is reverse
+    postorder on the reverse CFG, so most blocks see final LIVEOUT sets
+    the first time. Returns (registers, visits): the register for each
+    bit and the number of block evaluations.
+    """
+    bit_of = {}
+    registers = []
+    for block in blocks:
+        uevar = varkill = 0
+        for op in block.ops:
+            uses, reg = op_registers(op)
+            for sr in uses:
+                if sr not in bit_of:
+                    bit_of[sr] = len(registers)
+                    registers.append(sr)
+                bit = 1 << bit_of[sr]
+                if not varkill & bit:
+                    uevar |= bit
+            if reg >= 0:
+                if reg not in bit_of:
+                    bit_of[reg] = len(registers)
+                    registers.append(reg)
+                varkill |= 1 << bit_of[reg]
+        block.uevar = uevar
+        block.varkill = varkill
+        block.livein = uevar
+        block.liveout = 0
+    
+    rank = [0] * len(blocks)
+    for i, block in enumerate(postorder(blocks)):
+        rank[block.index] = i
+    worklist = [(rank[block.index], block.index) for block in blocks]
+    heapq.heapify(worklist)
+    queued = [True] * len(blocks)
+    visits = 0
+    
+    while worklist:
+        block = blocks[heapq.heappop(worklist)[1]]
+        queued[block.index] = False
+        visits += 1
+        
+        liveout = 0
+        for succ in block.succs:
+            liveout |= succ.livein
+        block.liveout = liveout
+        livein = block.uevar | (liveout & ~block.varkill)
+        if livein != block.livein:
+            block.livein = livein
+            for pred in block.preds:
+                if not queued[pred.index]:
+                    queued[pred.index] = True
+                    heapq.heappush(worklist, (rank[pred.index], pred.index))
+    
+    return registers, visits
+
+
+def live_registers(bits, registers):
+    """List the registers in a bitset"""
+    live = []
+    while bits:
+        low = bits & -bits
+        live.append(registers[low.bit_length() - 1])
+        bits ^= low
+    return live
+
+
+def generate_cfg(num_blocks, num_regs=64, block_ops=8, seed=0):
+    """Generate ILOC for a random CFG, for benchmarking
+    
+    Each block computes on a shared pool of registers and ends with a
+    conditional branch, a jump, or a fall-through; a quarter of the
+    branches go backward to form loops.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for i in range(num_blocks):
+        ops = []
+        for _ in range(block_ops):
+            kind = rng.random()
+            r1, r2, r3 = (rng.randrange(num_regs) for _ in range(3))
+            if kind < 0.2:
+                ops.append(f"loadI {rng.randrange(1024)} => r{r3}")
+            elif kind < 0.3:
+                ops.append(f"load r{r1} => r{r3}")
+            elif kind < 0.4:
+                ops.append(f"store r{r1} => r{r2}")
+            else:
+                opcode = rng.choice(("add", "sub", "mult"))
+                ops.append(f"{opcode} r{r1}, r{r2} => r{r3}")
+        
+        kind = rng.random()
+        if i + 1 < num_blocks and kind < 0.6:
+            if rng.random() < 0.25:
+                target = rng.randrange(i + 1)
+            else:
+                target = rng.randrange(i + 1, num_blocks)
+            ops.append(f"cbr r{rng.randrange(num_regs)} -> L{target}, L{i + 1}")
+        elif i + 1 < num_blocks and kind < 0.8:
+            ops.append(f"jumpI -> L{rng.randrange(num_blocks)}")
+        
+        lines.append(f"L{i}: {ops[0]}")
+        lines.extend(ops[1:])
+    return "\n".join(lines) + "\n"
+
+
+def benchmark(sizes):
+    """Time CFG construction and liveness on generated CFGs"""
+    print(f"{'blocks':>8s} {'ops':>8s} {'regs':>6s} {'parse':>9s} {'cfg':>9s} "
+          f"{'liveness':>9s} {'visits':>8s}")
+    for num_blocks in sizes:
+        num_regs = max(64, num_blocks // 8)
+        text = generate_cfg(num_blocks, num_regs)
+        
+        start = perf_counter()
+        parser = Parser(Scanner(None, text=text))
+        parser.parse()
+        ir_list = parser.get_ir()
+        parsed = perf_counter()
+        blocks = build_cfg(ir_list)
+        built = perf_counter()
+        registers, visits = compute_liveness(blocks)
+        solved = perf_counter()
+        
+        print(f"{num_blocks:8d} {ir_list.get_operation_count():8d} {len(registers):6d} "
+              f"{parsed - start:8.3f}s {built - parsed:8.3f}s {solved - built:8.3f}s "
+              f"{visits:8d}")
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] == "-h":
+        print("Usage: cfg.py filename")
+        print("       cfg.py --bench [blocks...]")
+        sys.exit(0 if len(sys.argv) == 2 else 1)
+    
+    if sys.argv[1] == "--bench":
+        try:
+            sizes = [int(n) for n in sys.argv[2:]] or [1000, 4000, 16000]
+        except ValueError:
+            sys.exit(1)
+        benchmark(sizes)
+        return
+    
+    filename = sys.argv[1]
+    if not os.path.exists(filename):
+        sys.exit(1)
+    
+    parser = Parser(Scanner(filename))
+    if not parser.parse():
+        sys.exit(1)
+    
+    blocks = build_cfg(parser.get_ir())
+    registers, visits = compute_liveness(blocks)
+    for block in blocks:
+        name = block.label or f"<{block.index}>"
+        succs = " ".join(succ.label or f"<{succ.index}>" for succ in block.succs)
+        livein = " ".join(f"r{sr}" for sr in sorted(live_registers(block.livein, registers)))
+        liveout = " ".join(f"r{sr}" for sr in sorted(live_registers(block.liveout, registers)))
+        print(f"{name}: {len(block.ops)} ops -> {succs or '(exit)'}")
+        print(f"    LIVEIN:  {livein}")
+        print(f"    LIVEOUT: {liveout}")
+
+
+if __name__ == "__main__":
+    main()
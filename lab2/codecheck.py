@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+codecheck.py - Parallel Offline Code Check over Blocks and Values of k
+
+Runs the checks of CodeCheck1 (-x) and CodeCheck2 (k = 5, 7) on a
+process pool, one job per block and k, each in its own temporary
+directory. Uses the local simulator unless --sim names another one.
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import subprocess
+from io import StringIO
+from time import perf_counter
+from simulator import read_sim_input, simulate
+
+KS = ("x", 5, 7)   # CodeCheck1 runs -x, CodeCheck2 runs k = 5 and 7
+
+
+def run_simulator(sim, code_file, args, flags):
+    """Simulate ILOC in a file, returning the simulator's report as text
+    
+    sim is the path of a simulator taking the course simulator's
+    arguments and the code on stdin, or None for the local one.
+    """
+    if sim is None:
+        out = StringIO()
+        renamed = "-x" in flags
+        k = int(flags[flags.index("-r") + 1]) if "-r" in flags else None
+        simulate(code_file, args, renamed, k, out=out)
+        return out.getvalue()
+    with open(code_file) as code:
+        result = subprocess.run([sim] + flags + args, stdin=code,
+                                capture_output=True, text=True)
+    return result.stdout
+
+
+def read_report(text, renamed=False):
+    """Split a simulator report into (output lines, cycles)
+    
+    Follows CodeCheck's check_output: blank lines are skipped, as is the
+    header -x prints. cycles is None if the report does not end in the
+    cycle count, e.g. when a check failed.
+    """
+    lines = [line.strip("\r ") for line in text.splitlines() if line.strip("\r ")]
+    if renamed:
+        lines = lines[1:]
+    if not lines or "cycle" not in lines[-1]:
+        return lines, None
+    return lines[:-1], int(lines[-1].rsplit(" ", 1)[0].rsplit(" ", 1)[1])
+
+
+def reference(job):
+    """Simulate an unallocated block once, for every k to compare against
+    
+    Returns the block's output lines, or None if it cannot be simulated.
+    """
+    filename, sim = job
+    outputs, cycles = read_report(run_simulator(sim, filename, read_sim_input(filename), []))
+    return filename, outputs if cycles is not None else None
+
+
+def check(job):
+    """Allocate a block for one k and check it; returns (file, k, cycles, error)
+    
+    cycles is None on failure, with error saying why.
+    """
+    executable, filename, k, expected, sim = job
+    if expected is None:
+        return filename, k, None, "the block itself does not simulate"
+    directory = tempfile.mkdtemp(prefix="codecheck-")
+    try:
+        result_file = os.path.join(directory, "alloc.i")
+        flags = ["-x"] if k == "x" else [str(k)]
+        with open(result_file, "w") as out:
+            # As CodeCheck does, run the allocator from its own directory
+            status = subprocess.run([executable] + flags + [filename], stdout=out,
+                                    stderr=subprocess.DEVNULL,
+                                    cwd=os.path.dirname(executable)).returncode
+        if status != 0:
+            return filename, k, None, f"allocator exited with {status}"
+        
+        sim_flags = ["-x"] if k == "x" else ["-r", str(k)]
+        report = run_simulator(sim, result_file, read_sim_input(filename), sim_flags)
+        outputs, cycles = read_report(report, renamed=k == "x")
+        if any("failed" in line for line in outputs):
+            return filename, k, None, next(line for line in outputs if "failed" in line)
+        if outputs != expected or cycles is None:
+            return filename, k, None, "wrong output"
+        return filename, k, cycles, None
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def run_checks(executable, filenames, ks=KS, jobs=1, sim=None):
+    """Check every block for every k; returns {(file, k): (cycles, error)}"""
+    map_jobs = map
+    pool = None
+    if jobs > 1:
+        import multiprocessing
+        pool = multiprocessing.get_context("fork").Pool(jobs)
+        map_jobs = pool.imap_unordered
+    try:
+        expected = dict(map_jobs(reference, [(f, sim) for f in filenames]))
+        work = [(executable, f, k, expected[f], sim) for f in filenames for k in ks]
+        return {(f, k): (cycles, error) for f, k, cycles, error in map_jobs(check, work)}
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def write_table(results, filenames, ks, out=None):
+    """Write cycles, or FAIL, for each block and k; returns the failure count"""
+    write = (out or sys.stdout).write
+    names = [os.path.basename(f) for f in filenames]
+    width = max([len(name) for name in names] + [5])
+    write(f"{'block':{width}s}" + "".join(f" {'k=' + str(k):>8s}" for k in ks) + "\n")
+    failures = []
+    for filename, name in zip(filenames, names):
+        cells = []
+        for k in ks:
+            cycles, error = results[filename, k]
+            cells.append(f" {'FAIL' if cycles is None else cycles:>8}")
+            if cycles is None:
+                failures.append(f"{name}, k = {k}: {error}")
+        write(f"{name:{width}s}" + "".join(cells) + "\n")
+    for failure in failures:
+        write(f"  {failure}\n")
+    return len(failures)
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] == "-h":
+        print("Usage: codecheck.py [-k k1,k2,...] [-j jobs] [--sim simulator] executable")
+        print("                    block.i... | directory")
+        print("  -k     values of k to check; x runs -x (default x,5,7)")
+        print("  -j     number of worker processes (default: all cores)")
+        print("  --sim  simulator to run instead of the local one")
+        sys.exit(0 if args[:1] == ["-h"] else 1)
+    
+    ks, jobs, sim = KS, os.cpu_count() or 1, None
+    try:
+        for flag in ("-k", "-j", "--sim"):
+            if flag in args:
+                i = args.index(flag)
+                value = args[i + 1]
+                del args[i:i + 2]
+                if flag == "-k":
+                    ks = tuple(k if k == "x" else int(k) for k in value.split(","))
+                elif flag == "-j":
+                    jobs = max(1, int(value))
+                else:
+                    sim = value
+    except (IndexError, ValueError):
+        sys.exit(1)
+    
+    executable = args[0]
+    if not os.access(executable, os.X_OK):
+        print(f"codecheck.py: '{executable}' is not executable", file=sys.stderr)
+        sys.exit(1)
+    executable = os.path.abspath(executable)
+    
+    filenames = []
+    for path in args[1:]:
+        if os.path.isdir(path):
+            filenames.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                             if name.endswith(".i"))
+        elif os.path.exists(path):
+            filenames.append(path)
+        else:
+            sys.exit(1)
+    filenames = [os.path.abspath(f) for f in filenames]
+    
+    start = perf_counter()
+    results = run_checks(executable, filenames, ks, jobs, sim)
+    failed = write_table(results, filenames, ks)
+    print(f"{len(results)} checks, {failed} failed, {perf_counter() - start:.2f}s "
+          f"with {jobs} job{'s' if jobs > 1 else ''}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+columns.py - Memory-Mapped Operand Columns for Out-of-Core Allocation
+"""
+
+import os
+import mmap
+import shutil
+import tempfile
+from array import array
+from collections.abc import Mapping
+from scanner import Scanner, LOAD, LOADI, STORE, ADD, RSHIFT, OUTPUT
+from parser import Parser
+from ir import ILOCOperation
+from optimizer import fold_constant
+from cfg import BRANCHES
+import metrics
+
+# Opcode names indexed by their scanner token type
+OPCODES = ("load", "loadI", "store", "add", "sub", "mult",
+           "lshift", "rshift", "output", "nop")
+OPCODE_TYPES = {name: i for i, name in enumerate(OPCODES)}
+
+INF = 2147483647   # Next use of a value that is never used again
+FLUSH = 65536      # Entries buffered per column before writing to disk
+
+# Written while parsing, in operation order
+FORWARD_COLUMNS = ("opcode", "arg", "vr1", "vr2", "vr3", "line")
+# Written by the backward pass
+BACKWARD_COLUMNS = ("nu1", "nu2", "nu3", "pressure")
+
+
+class VRConstants(Mapping):
+    """Read-only VR -> constant map backed by a column indexed by VR"""
+    __slots__ = ['column']
+    
+    def __init__(self, column):
+        self.column = column
+    
+    def __getitem__(self, vr):
+        if vr in self:
+            return self.column[vr]
+        raise KeyError(vr)
+    
+    def __contains__(self, vr):
+        return 0 <= vr < len(self.column) and self.column[vr] >= 0
+    
+    def __len__(self):
+        return len(self.column)
+    
+    def __iter__(self):
+        return (vr for vr in range(len(self.column)) if self.column[vr] >= 0)
+
+
+class ColumnBlock:
+    """A renamed block stored as int32 column files in a temporary directory
+    
+    Only the maps needed by the current pass are held in memory: SR -> VR
+    and constant maps while parsing, and the live values while computing
+    next uses. Use load(), then analyze(), then iterate_forward().
+    """
+    __slots__ = ['directory', 'count', 'num_vrs', 'columns', 'constants', '_maps']
+    
+    def __init__(self, directory=None):
+        self.directory = tempfile.mkdtemp(prefix="412alloc-", dir=directory)
+        self.count = 0
+        self.num_vrs = 0
+        self.columns = {}
+        self.constants = None
+        self._maps = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+    
+    def _map(self, name, writable=False, typecode="i"):
+        """Map a column file and return it as a memoryview"""
+        with open(self._path(name), "r+b" if writable else "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(array(typecode))
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            mm = mmap.mmap(f.fileno(), 0, access=access)
+        raw = memoryview(mm)
+        view = raw.cast(typecode)
+        self._maps.append((mm, raw, view))
+        return view
+    
+    def _create(self, name, typecode="i"):
+        """Create a zero-filled column with one entry per operation"""
+        with open(self._path(name), "wb") as f:
+            f.truncate(self.count * array(typecode).itemsize)
+        return self._map(name, True, typecode)
+    
+    def load(self, filename):
+        """Stream-parse and rename a block, writing its columns to disk
+        
+        Renaming matches rename_registers, including the constant lattice,
+        which is tracked per SR so it only holds the current values.
+        Returns False if the block has syntax errors, labels or branches.
+        """
+        buffers = {name: array("i") for name in FORWARD_COLUMNS + ("const",)}
+        files = {name: open(self._path(name), "wb") for name in buffers}
+        opcodes, args = buffers["opcode"], buffers["arg"]
+        vr1s, vr2s, vr3s = buffers["vr1"], buffers["vr2"], buffers["vr3"]
+        lines, const = buffers["line"], buffers["const"]
+        
+        sr_to_vr = {}
+        sr_const = {}  # SR -> constant held by its current VR
+        next_vr = 0
+        control_flow = False
+        
+        def flush():
+            for name, buf in buffers.items():
+                buf.tofile(files[name])
+                del buf[:]
+        
+        def use(sr):
+            nonlocal next_vr
+            vr = sr_to_vr.get(sr)
+            if vr is None:
+                vr = sr_to_vr[sr] = next_vr
+                next_vr += 1
+                const.append(-1)
+            return vr
+        
+        def add(op):
+            nonlocal next_vr, control_flow
+            if op.label is not None or op.opcode in BRANCHES:
+                control_flow = True
+                return
+            ttype = OPCODE_TYPES[op.opcode]
+            vr1 = vr2 = vr3 = -1
+            arg = -1
+            value = None
+            
+            if ttype == LOADI:
+                arg = value = op.sr1
+            elif ttype == OUTPUT:
+                arg = op.sr1
+            elif ttype == LOAD or ttype == STORE:
+                vr1 = use(op.sr1)
+                if ttype == STORE:
+                    vr3 = use(op.sr3)
+            elif ADD <= ttype <= RSHIFT:
+                vr1 = use(op.sr1)
+                vr2 = use(op.sr2)
+                if op.sr1 in sr_const and op.sr2 in sr_const:
+                    value = fold_constant(op.opcode, sr_const[op.sr1], sr_const[op.sr2])
+            
+            # Handle definitions
+            if ttype == LOADI or ttype == LOAD or ADD <= ttype <= RSHIFT:
+                vr3 = sr_to_vr[op.sr3] = next_vr
+                next_vr += 1
+                if value is None:
+                    sr_const.pop(op.sr3, None)
+                    const.append(-1)
+                else:
+                    sr_const[op.sr3] = value
+                    const.append(value)
+            
+            opcodes.append(ttype)
+            args.append(arg)
+            vr1s.append(vr1)
+            vr2s.append(vr2)
+            vr3s.append(vr3)
+            lines.append(op.line)
+            if len(opcodes) >= FLUSH:
+                self.count += len(opcodes)
+                flush()
+        
+        scanner = Scanner(filename, stream=True)
+        parser = Parser(scanner, sink=add)
+        ok = parser.parse()
+        self.count += len(opcodes)
+        flush()
+        metrics.scanned(filename, scanner, parser, self.count)
+        for f in files.values():
+            f.close()
+        
+        self.num_vrs = next_vr
+        for name in FORWARD_COLUMNS:
+            self.columns[name] = self._map(name)
+        self.constants = VRConstants(self._map("const"))
+        return ok and not control_flow
+    
+    def analyze(self):
+        """Backward pass: next use of every operand and the pressure profile
+        
+        Next uses match rename_registers, with INF for a value that is
+        never used again; pressure matches compute_pressure.
+        """
+        opcodes, lines = self.columns["opcode"], self.columns["line"]
+        vr1s, vr2s, vr3s = self.columns["vr1"], self.columns["vr2"], self.columns["vr3"]
+        nu1s, nu2s, nu3s, pressure = (self._create(name) for name in BACKWARD_COLUMNS)
+        vr_next = {}  # Live VR -> line of its next use
+        
+        for i in range(self.count - 1, -1, -1):
+            ttype = opcodes[i]
+            line = lines[i]
+            
+            # Handle definitions - kill live range
+            if ttype == LOADI or ttype == LOAD or ADD <= ttype <= RSHIFT:
+                nu3s[i] = vr_next.pop(vr3s[i], INF)
+            
+            # Handle uses - extend live range
+            if ttype == LOAD or ttype == STORE or ADD <= ttype <= RSHIFT:
+                vr = vr1s[i]
+                nu1s[i] = vr_next.get(vr, INF)
+                vr_next[vr] = line
+                if ttype == STORE:
+                    vr = vr3s[i]
+                    nu3s[i] = vr_next.get(vr, INF)
+                    vr_next[vr] = line
+                elif ttype != LOAD:
+                    vr = vr2s[i]
+                    nu2s[i] = vr_next.get(vr, INF)
+                    vr_next[vr] = line
+            
+            pressure[i] = len(vr_next)
+        
+        self.columns.update(nu1=nu1s, nu2=nu2s, nu3=nu3s, pressure=pressure)
+    
+    def spill_regions(self, k):
+        """Return a byte column marking spill regions, as compute_spill_regions"""
+        opcodes, pressure = self.columns["opcode"], self.columns["pressure"]
+        reserve = self._create(f"reserve{k}", "B")
+        extending = False
+        
+        for i in range(self.count - 1, -1, -1):
+            ttype = opcodes[i]
+            demand = pressure[i]
+            if ttype == LOADI or ttype == LOAD or ADD <= ttype <= RSHIFT:
+                demand += 1
+            
+            if demand > k:
+                extending = True
+            if extending:
+                reserve[i] = 1
+                if pressure[i] < k:
+                    extending = False
+        
+        return reserve
+    
+    def iterate_forward(self):
+        """Yield each operation as an ILOCOperation rebuilt from the columns"""
+        columns = self.columns
+        opcodes, args, lines = columns["opcode"], columns["arg"], columns["line"]
+        vr1s, vr2s, vr3s = columns["vr1"], columns["vr2"], columns["vr3"]
+        nu1s, nu2s, nu3s = columns["nu1"], columns["nu2"], columns["nu3"]
+        inf = float('inf')
+        
+        for i in range(self.count):
+            op = ILOCOperation(lines[i], OPCODES[opcodes[i]])
+            op.sr1 = args[i]
+            op.vr1 = vr1 = vr1s[i]
+            op.vr2 = vr2 = vr2s[i]
+            op.vr3 = vr3 = vr3s[i]
+            if vr1 >= 0:
+                nu = nu1s[i]
+                op.nu1 = inf if nu == INF else nu
+            if vr2 >= 0:
+                nu = nu2s[i]
+                op.nu2 = inf if nu == INF else nu
+            if vr3 >= 0:
+                nu = nu3s[i]
+                op.nu3 = inf if nu == INF else nu
+            yield op
+    
+    def get_operation_count(self):
+        return self.count
+    
+    def close(self):
+        """Unmap the columns and delete their files"""
+        for mm, raw, view in self._maps:
+            view.release()
+            raw.release()
+            mm.close()
+        self._maps = []
+        self.columns = {}
+        self.constants = None
+        shutil.rmtree(self.directory, ignore_errors=True)
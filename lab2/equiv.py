@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+equiv.py - Static Equivalence Checker for Allocated Code
+"""
+
+import sys
+import os
+from scanner import Scanner
+from parser import Parser
+
+SPILL_BASE = 32768   # Stores to constant addresses from here on are spills
+
+COMMUTATIVE = ("add", "mult")
+ARITH_OPS = ("add", "sub", "mult", "lshift", "rshift")
+
+# Cases run by --cases: name -> (original, allocated, whether equivalent)
+DEAD_STORE = ("loadI 0 => r0\nloadI 7 => r1\nstore r1 => r0\nloadI 4 => r2\n"
+              "load r2 => r3\nstore r1 => r3\nstore r2 => r0\noutput 1040\n")
+CASES = {
+    # --optimize drops the first store to 0, overwritten before any read
+    "dead-store": (DEAD_STORE, DEAD_STORE.replace("store r1 => r0\n", ""), True),
+    "live-store": (DEAD_STORE, DEAD_STORE.replace("store r2 => r0\n", ""), False),
+}
+
+
+def wrap(value):
+    """Wrap an integer to 32 bits, as the simulator does"""
+    return ((value + (1 << 31)) & 0xFFFFFFFF) - (1 << 31)
+
+
+def evaluate(opcode, a, b):
+    """Evaluate an arithmetic op on two constants"""
+    if opcode == "add":
+        return wrap(a + b)
+    if opcode == "sub":
+        return wrap(a - b)
+    if opcode == "mult":
+        return wrap(a * b)
+    if opcode == "lshift":
+        return wrap(a << (b & 31))
+    return a >> (b & 31)
+
+
+class ValueTable:
+    """Hash-consed value numbers shared by the two programs
+    
+    Equal value numbers denote values that are equal on every initial
+    memory. Constants are folded and a few identities applied, so code
+    that rematerializes or folds constants still matches.
+    """
+    __slots__ = ['numbers', 'constants']
+    
+    def __init__(self):
+        self.numbers = {}    # term -> value number
+        self.constants = {}  # value number -> constant
+    
+    def number(self, term):
+        vn = self.numbers.get(term)
+        if vn is None:
+            vn = self.numbers[term] = len(self.numbers)
+        return vn
+    
+    def constant(self, value):
+        vn = self.number(("const", value))
+        self.constants[vn] = value
+        return vn
+    
+    def arithmetic(self, opcode, x, y):
+        """Value number of an arithmetic op on value numbers x and y"""
+        constants = self.constants
+        cx, cy = constants.get(x), constants.get(y)
+        if cx is not None and cy is not None:
+            return self.constant(evaluate(opcode, cx, cy))
+        if opcode in COMMUTATIVE and (cx is not None or (cy is None and x > y)):
+            x, y, cx, cy = y, x, cy, cx
+        if cy == 0 and opcode != "mult":
+            return x
+        if opcode == "mult" and cy is not None and cy in (0, 1):
+            return y if cy == 0 else x
+        if cx == 0 and opcode in ("lshift", "rshift"):
+            return x
+        if x == y and opcode == "sub":
+            return self.constant(0)
+        return self.number((opcode, x, y))
+
+
+def dead_stores(ops, addresses, forwarded=(), spill_base=None):
+    """Find the stores to constant addresses overwritten before any read
+    
+    addresses maps each load and store to its constant address, or None.
+    An output reads its address and a live load its own, or any address
+    if unknown. A load whose value is never used reads nothing, as
+    removing it changes nothing, and neither do the forwarded loads, given
+    the value last stored. Returns the indices of the dead stores, which
+    leave memory as it would be without them.
+    """
+    def is_spill(address):
+        return spill_base is not None and address is not None and address >= spill_base
+    
+    dead = set()
+    live = set()          # registers read later by ops that are not dead
+    restored = set()      # spill slots read later by loads that are not dead
+    overwritten = set()   # addresses stored to later, before any read
+    for i in range(len(ops) - 1, -1, -1):
+        op = ops[i]
+        opcode = op.opcode
+        if opcode == "output":
+            overwritten.discard(op.sr1)
+        elif opcode == "store":
+            address = addresses[i]
+            if is_spill(address):
+                # A spill keeps its value live only if it is restored
+                if address not in restored:
+                    continue
+                restored.discard(address)
+            elif address in overwritten:
+                dead.add(i)
+                continue
+            elif address is not None:
+                overwritten.add(address)
+            live.update((op.sr1, op.sr3))
+        elif opcode in ("loadI", "load") + ARITH_OPS and op.sr3 in live:
+            live.discard(op.sr3)
+            if i in forwarded:
+                continue
+            if opcode == "load":
+                address = addresses[i]
+                if address is None:
+                    overwritten.clear()
+                elif is_spill(address):
+                    restored.add(address)
+                else:
+                    overwritten.discard(address)
+                live.add(op.sr1)
+            elif opcode != "loadI":
+                live.update((op.sr1, op.sr2))
+    return dead
+
+
+class Trace:
+    """What a block does to the outside, in value numbers
+    
+    outputs lists (line, vn) for every output. Memory is a base value
+    number overlaid by stored, address vn -> vn of the words written
+    since; barriers lists (line, base) each time a store that may alias
+    others folds the overlay into a new base.
+    """
+    __slots__ = ['outputs', 'barriers', 'base', 'stored', 'lines', 'addresses',
+                 'forwarded']
+    
+    def __init__(self, base):
+        self.outputs = []
+        self.barriers = []
+        self.base = base
+        self.stored = {}
+        self.lines = {}       # address vn -> line of its last store
+        self.addresses = {}   # index of a load or store -> constant address or None
+        self.forwarded = set()   # indices of loads given the value last stored
+
+
+def execute(ir_list, table, spill_base=None):
+    """Execute a block symbolically, returning its Trace
+    
+    Stores to constant addresses never alias each other, so they may be
+    reordered; a store to any other address folds memory into a new base
+    first. A load reads the value stored to its address when that is
+    known, or else a value numbered by its address and the memory it may
+    see. With spill_base, stores to constant addresses from spill_base on
+    are spills: their slots act as registers and are not memory. Registers
+    never written read as 0. Raises ValueError on branches.
+    
+    Dead stores are left out of memory, so removing them does not change
+    the trace, though loads are still given the values they stored.
+    Leaving some out can forward constant addresses to later stores, which
+    may show more dead, so the block is executed until none are found.
+    """
+    ops = list(ir_list.iterate_forward())
+    dead = set()
+    while True:
+        trace = execute_pass(ops, table, spill_base, dead)
+        found = dead_stores(ops, trace.addresses, trace.forwarded, spill_base)
+        if found <= dead:
+            return trace
+        dead |= found
+
+
+def execute_pass(ops, table, spill_base, dead):
+    """Execute ops once, leaving the stores indexed in dead out of memory"""
+    constants = table.constants
+    zero = table.constant(0)
+    trace = Trace(table.number(("memory",)))
+    stored, lines = trace.stored, trace.lines
+    regs = {}
+    spills = {}      # spill slot -> vn
+    aliased = False  # whether stored holds an address that is not a constant
+    current = None   # value number of memory, until the next store
+    addresses = trace.addresses
+    forward = {}     # address vn -> vn of a dead store not overwritten since
+    
+    def memory():
+        nonlocal current
+        if current is None:
+            current = trace.base
+            if stored:
+                current = table.number(("memory", trace.base, frozenset(stored.items())))
+        return current
+    
+    def load(address):
+        value = stored.get(address)
+        if value is None:
+            seen = trace.base if address in constants and not aliased else memory()
+            value = table.number(("load", address, seen))
+        return value
+    
+    for i, op in enumerate(ops):
+        opcode = op.opcode
+        if opcode == "loadI":
+            regs[op.sr3] = table.constant(op.sr1)
+        elif opcode == "load":
+            address = regs.get(op.sr1, zero)
+            slot = addresses[i] = constants.get(address)
+            if spill_base is not None and slot is not None and slot >= spill_base:
+                regs[op.sr3] = spills[slot] if slot in spills else load(address)
+            elif address in forward or address in stored:
+                trace.forwarded.add(i)
+                regs[op.sr3] = forward.get(address, stored.get(address))
+            else:
+                regs[op.sr3] = load(address)
+        elif opcode == "store":
+            address = regs.get(op.sr3, zero)
+            value = regs.get(op.sr1, zero)
+            slot = addresses[i] = constants.get(address)
+            if spill_base is not None and slot is not None and slot >= spill_base:
+                spills[slot] = value
+                continue
+            if i in dead:
+                forward[address] = value
+                continue
+            if slot is None:
+                forward.clear()
+            else:
+                forward.pop(address, None)
+            if stored and (aliased or slot is None):
+                trace.base = memory()
+                trace.barriers.append((op.line, trace.base))
+                stored.clear()
+                lines.clear()
+            aliased = slot is None
+            current = None
+            stored[address] = value
+            lines[address] = op.line
+        elif opcode == "output":
+            trace.outputs.append((op.line, load(table.constant(op.sr1))))
+        elif opcode in ("jumpI", "cbr"):
+            raise ValueError(f"line {op.line}: branches are not supported")
+        elif opcode != "nop":
+            regs[op.sr3] = table.arithmetic(opcode, regs.get(op.sr1, zero),
+                                            regs.get(op.sr2, zero))
+    return trace
+
+
+def check_equivalence(original, allocated, spill_base=SPILL_BASE):
+    """Check that allocated code prints and stores what the original does
+    
+    original and allocated are parsed blocks. Returns None if they print
+    the same values and leave memory outside the spill area the same on
+    every initial memory, or else the first divergence as (original line,
+    allocated line, reason), either line being None if unknown.
+    Equivalence is proved by value numbering, so a divergence may also be
+    code the checker cannot see through.
+    """
+    table = ValueTable()
+    expected = execute(original, table)
+    got = execute(allocated, table, spill_base)
+    
+    for (line, value), (alloc_line, alloc_value) in zip(expected.outputs, got.outputs):
+        if value != alloc_value:
+            return line, alloc_line, "output prints a different value"
+    if len(expected.outputs) > len(got.outputs):
+        return expected.outputs[len(got.outputs)][0], None, "missing output"
+    if len(got.outputs) > len(expected.outputs):
+        return None, got.outputs[len(expected.outputs)][0], "extra output"
+    
+    for (line, base), (alloc_line, alloc_base) in zip(expected.barriers, got.barriers):
+        if base != alloc_base:
+            return line, alloc_line, "memory differs before this store"
+    if len(expected.barriers) != len(got.barriers):
+        return None, None, "stores to unknown addresses differ"
+    for address in expected.stored.keys() | got.stored.keys():
+        if expected.stored.get(address) != got.stored.get(address):
+            return (expected.lines.get(address), got.lines.get(address),
+                    "store leaves a different value")
+    if expected.base != got.base:
+        return None, None, "final memory differs"
+    return None
+
+
+def parse_block(filename, text=None):
+    parser = Parser(Scanner(filename, text=text))
+    if not parser.parse():
+        return None
+    return parser.get_ir()
+
+
+def run_cases():
+    """Check every case in CASES; returns the number that failed"""
+    failed = 0
+    for name, (original, allocated, equivalent) in CASES.items():
+        divergence = check_equivalence(parse_block(None, original),
+                                       parse_block(None, allocated))
+        ok = (divergence is None) == equivalent
+        failed += not ok
+        print(f"{name}: {'ok' if ok else 'FAILED'}")
+    return failed
+
+
+def main():
+    args = sys.argv[1:]
+    if args == ["--cases"]:
+        sys.exit(1 if run_cases() else 0)
+    if len(args) < 2 or args[0] == "-h":
+        print("Usage: equiv.py [--spill-base address] original allocated")
+        print("       equiv.py --cases")
+        print("  Proves that allocated code prints the values and leaves the memory")
+        print("  of the original, or reports the first operation where they differ.")
+        print("  --cases checks the built-in cases the checker must get right.")
+        sys.exit(0 if args[:1] == ["-h"] else 1)
+    
+    spill_base = SPILL_BASE
+    if "--spill-base" in args:
+        i = args.index("--spill-base")
+        try:
+            spill_base = int(args[i + 1])
+        except (IndexError, ValueError):
+            sys.exit(1)
+        del args[i:i + 2]
+    if len(args) != 2 or not all(os.path.exists(f) for f in args):
+        sys.exit(1)
+    
+    original, allocated = (parse_block(f) for f in args)
+    if original is None or allocated is None:
+        sys.exit(1)
+    try:
+        divergence = check_equivalence(original, allocated, spill_base)
+    except ValueError as e:
+        print(f"equiv.py: {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    if divergence is None:
+        print("equivalent")
+        return
+    line, alloc_line, reason = divergence
+    where = " and ".join(f"{name} line {n}" for name, n
+                         in (("original", line), ("allocated", alloc_line))
+                         if n is not None)
+    print(f"differs at {where}: {reason}" if where else f"differs: {reason}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+fused.py - Fused Parse-and-Analyze Front End for the Allocator
+"""
+
+import sys
+import os
+import importlib
+from io import StringIO
+from time import perf_counter
+from scanner import Scanner
+from parser import Parser
+from ir import IRList
+from optimizer import fold_constant
+import metrics
+
+# Operand shapes: which source registers an operation uses and defines
+NO_REGS, DEF, USE_DEF, USE_USE, USE_USE_DEF, USE = 0, 1, 2, 3, 4, 5
+SHAPES = {
+    "loadI": DEF, "load": USE_DEF, "store": USE_USE,
+    "add": USE_USE_DEF, "sub": USE_USE_DEF, "mult": USE_USE_DEF,
+    "lshift": USE_USE_DEF, "rshift": USE_USE_DEF,
+    "output": NO_REGS, "nop": NO_REGS, "cbr": USE, "jumpI": NO_REGS
+}
+
+
+class FusedBlock:
+    """A block recorded as per-operation lists while it is parsed
+    
+    The parser's sink records each operation's shape, used and defined
+    source registers, and the constant it defines, folding constants
+    forward on the fly. analyze() then renames, computes next uses and
+    the pressure profile in one backward sweep over those lists, writing
+    VRs and next uses into the operations. The block can be passed to
+    allocate in place of an IRList.
+    """
+    __slots__ = ['ops', 'shapes', 'use1', 'use2', 'defs', 'consts',
+                 'vr_const', 'pressure', 'maxlive', 'num_vrs']
+    
+    def __init__(self):
+        self.ops = []
+        self.shapes = []
+        self.use1 = []
+        self.use2 = []
+        self.defs = []
+        self.consts = []
+        self.vr_const = {}
+        self.pressure = None
+        self.maxlive = 0
+        self.num_vrs = 0
+    
+    def load(self, filename, text=None):
+        """Parse a block, recording its operands; False on syntax errors"""
+        append_op = self.ops.append
+        append_shape = self.shapes.append
+        append_use1 = self.use1.append
+        append_use2 = self.use2.append
+        append_def = self.defs.append
+        append_const = self.consts.append
+        sr_const = {}  # SR -> constant it currently holds
+        
+        def record(op):
+            shape = SHAPES[op.opcode]
+            append_op(op)
+            append_shape(shape)
+            
+            if shape == DEF:
+                append_use1(-1)
+                append_use2(-1)
+                append_def(op.sr3)
+                append_const(op.sr1)
+                sr_const[op.sr3] = op.sr1
+            elif shape == USE_USE_DEF:
+                a, b = sr_const.get(op.sr1), sr_const.get(op.sr2)
+                value = None
+                if a is not None and b is not None:
+                    value = fold_constant(op.opcode, a, b)
+                append_use1(op.sr1)
+                append_use2(op.sr2)
+                append_def(op.sr3)
+                append_const(value)
+                if value is None:
+                    sr_const.pop(op.sr3, None)
+                else:
+                    sr_const[op.sr3] = value
+            elif shape == USE_DEF:
+                append_use1(op.sr1)
+                append_use2(-1)
+                append_def(op.sr3)
+                append_const(None)
+                sr_const.pop(op.sr3, None)
+            else:
+                append_use1(op.sr1 if shape != NO_REGS else -1)
+                append_use2(op.sr3 if shape == USE_USE else -1)
+                append_def(-1)
+                append_const(None)
+        
+        scanner = Scanner(filename, text=text)
+        parser = Parser(scanner, sink=record)
+        ok = parser.parse()
+        metrics.scanned(filename, scanner, parser, len(self.ops))
+        return ok
+    
+    def analyze(self):
+        """Rename, compute next uses and pressure in one backward sweep
+        
+        Renaming walks up from the bottom: a definition ends its SR's
+        current VR and a use before any later definition starts a new
+        one, so each SR has one entry while its value is live and the
+        live count falls out of the map. Returns MAXLIVE.
+        """
+        ops, shapes = self.ops, self.shapes
+        use1, use2, defs, consts = self.use1, self.use2, self.defs, self.consts
+        n = len(ops)
+        pressure = [0] * n
+        vr_const = {}
+        sr_to_vr = {}   # SR -> VR of its live value
+        next_use = {}   # SR -> line of the next use of that value
+        next_vr = 0
+        live = 0
+        maxlive = 0
+        inf = float('inf')
+        
+        for i in range(n - 1, -1, -1):
+            op = ops[i]
+            shape = shapes[i]
+            
+            # Handle definitions - kill live range
+            if shape == DEF or shape == USE_DEF or shape == USE_USE_DEF:
+                sr = defs[i]
+                vr = sr_to_vr.pop(sr, None)
+                if vr is None:
+                    vr = next_vr
+                    next_vr += 1
+                    op.nu3 = inf
+                else:
+                    op.nu3 = next_use.pop(sr)
+                    live -= 1
+                op.vr3 = vr
+                if consts[i] is not None:
+                    vr_const[vr] = consts[i]
+            
+            # Handle uses - extend live range
+            if shape >= USE_DEF:
+                line = op.line
+                sr = use1[i]
+                vr = sr_to_vr.get(sr)
+                if vr is None:
+                    vr = sr_to_vr[sr] = next_vr
+                    next_vr += 1
+                    live += 1
+                    op.nu1 = inf
+                else:
+                    op.nu1 = next_use[sr]
+                op.vr1 = vr
+                next_use[sr] = line
+                
+                sr = use2[i]
+                if sr >= 0:
+                    vr = sr_to_vr.get(sr)
+                    if vr is None:
+                        vr = sr_to_vr[sr] = next_vr
+                        next_vr += 1
+                        live += 1
+                        nu = inf
+                    else:
+                        nu = next_use[sr]
+                    next_use[sr] = line
+                    if shape == USE_USE:
+                        op.vr3, op.nu3 = vr, nu
+                    else:
+                        op.vr2, op.nu2 = vr, nu
+            
+            pressure[i] = live
+            if live > maxlive:
+                maxlive = live
+        
+        self.vr_const = vr_const
+        self.pressure = pressure
+        self.maxlive = maxlive
+        self.num_vrs = next_vr
+        return maxlive
+    
+    def iterate_forward(self):
+        return iter(self.ops)
+    
+    def iterate_backward(self):
+        return reversed(self.ops)
+    
+    def get_operation_count(self):
+        return len(self.ops)
+    
+    def to_ir_list(self):
+        """Link the operations into an IRList"""
+        ir_list = IRList()
+        for op in self.ops:
+            ir_list.append(op)
+        return ir_list
+
+
+def phase_breakdown(alloc, filename, k):
+    """Time the IRList pipeline and the fused one on a block
+    
+    alloc is the 412alloc module. Returns two lists of (phase, seconds)
+    and whether both pipelines wrote the same code.
+    """
+    classic = []
+    start = perf_counter()
+    parser = Parser(Scanner(filename))
+    parser.parse()
+    ir_list = parser.get_ir()
+    classic.append(("parse", perf_counter() - start))
+    
+    start = perf_counter()
+    vr_const = {}
+    alloc.rename_registers(ir_list, vr_const)
+    renamed = perf_counter() - start
+    start = perf_counter()
+    alloc.compute_next_uses(ir_list)
+    next_uses = perf_counter() - start
+    classic.append(("rename (forward)", renamed - next_uses))
+    classic.append(("next use (backward)", next_uses))
+    
+    start = perf_counter()
+    pressure = alloc.compute_pressure(ir_list)
+    classic.append(("pressure (backward)", perf_counter() - start))
+    
+    out = StringIO()
+    start = perf_counter()
+    reserve = alloc.compute_spill_regions(ir_list, pressure, k)
+    alloc.allocate(ir_list, k, vr_const, out, reserve=reserve)
+    classic.append(("allocate", perf_counter() - start))
+    
+    fused = []
+    start = perf_counter()
+    block = FusedBlock()
+    block.load(filename)
+    fused.append(("parse + record", perf_counter() - start))
+    
+    start = perf_counter()
+    block.analyze()
+    fused.append(("sweep", perf_counter() - start))
+    
+    fused_out = StringIO()
+    start = perf_counter()
+    reserve = alloc.compute_spill_regions(block, block.pressure, k)
+    alloc.allocate(block, k, block.vr_const, fused_out, reserve=reserve)
+    fused.append(("allocate", perf_counter() - start))
+    
+    return classic, fused, out.getvalue() == fused_out.getvalue()
+
+
+def main():
+    """Print the phase breakdown of both pipelines"""
+    if len(sys.argv) < 3 or sys.argv[1] == "-h":
+        print("Usage: fused.py k filename...")
+        sys.exit(0 if len(sys.argv) == 2 else 1)
+    
+    try:
+        k = int(sys.argv[1])
+    except ValueError:
+        sys.exit(1)
+    
+    alloc = importlib.import_module("412alloc")
+    for filename in sys.argv[2:]:
+        if not os.path.exists(filename):
+            sys.exit(1)
+        classic, fused, same = phase_breakdown(alloc, filename, k)
+        print(f"{os.path.basename(filename)}, k = {k}: "
+              f"{'same code' if same else 'CODE DIFFERS'}")
+        for title, phases in (("IRList", classic), ("fused", fused)):
+            for phase, seconds in phases:
+                print(f"  {title:7s} {phase:22s} {seconds:8.3f}s")
+            print(f"  {title:7s} {'total':22s} {sum(s for _, s in phases):8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ class ILOCOperation:
     """Single ILOC operation"""
     __slots__ = ['line', 'opcode', 'sr1', 'vr1', 'pr1', 'nu1',
                  'sr2', 'vr2', 'pr2', 'nu2', 'sr3', 'vr3', 'pr3', 'nu3',
-                 'next', 'prev']
+                 'label', 'targets', 'next', 'prev']
     
     def __init__(self, line=0, opcode=''):
         self.line = line
@@ -23,6 +23,8 @@ class ILOCOperation:
         self.vr3 = -1
         self.pr3 = -1
         self.nu3 = -1
+        self.label = None    # Label marking this operation
+        self.targets = ()    # Labels a jumpI or cbr may branch to
         self.next = None
         self.prev = None
     
@@ -41,6 +43,10 @@ class ILOCOperation:
             print(f"[ {'output':8s} | val: {s1:6d} |        -       |        -       | ]")
         elif op == "nop":
             print(f"[ {'nop':8s} |        -       |        -       |        -       | ]")
+        elif op == "jumpI":
+            print(f"[ {'jumpI':8s} |        -       |        -       | {self.targets[0]:>7s} | ]")
+        elif op == "cbr":
+            print(f"[ {'cbr':8s} | r{s1:6d} | {self.targets[0]:>7s} | {self.targets[1]:>7s} | ]")
 
 
 class IRList:
@@ -63,6 +69,20 @@ class IRList:
             self.tail = operation
         self.count += 1
     
+    def remove(self, operation):
+        """Unlink operation from the list"""
+        if operation.prev:
+            operation.prev.next = operation.next
+        else:
+            self.head = operation.next
+        if operation.next:
+            operation.next.prev = operation.prev
+        else:
+            self.tail = operation.prev
+        operation.next = None
+        operation.prev = None
+        self.count -= 1
+    
     def print_ir(self):
         """Print entire IR"""
         current = self.head
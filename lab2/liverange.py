@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+liverange.py - Vectorized Live-Range Engine for Next Uses and MAXLIVE
+
+Requires NumPy, which is optional: available is False without it and
+the allocator keeps using its scalar passes.
+"""
+
+import sys
+import os
+import importlib
+from time import perf_counter
+from scanner import Scanner, LOAD, LOADI, STORE, ADD, RSHIFT
+from parser import Parser
+from columns import OPCODE_TYPES, INF
+
+try:
+    import numpy as np
+    available = True
+except ImportError:
+    np = None
+    available = False
+
+
+def ir_columns(ir_list):
+    """Gather the opcode, VR and line columns of a renamed block as arrays"""
+    n = ir_list.get_operation_count()
+    types = OPCODE_TYPES
+    fields = [(types[op.opcode], op.vr1, op.vr2, op.vr3, op.line)
+              for op in ir_list.iterate_forward()]
+    table = np.array(fields, dtype=np.int64).reshape(n, 5)
+    return tuple(table[:, c] for c in range(5))
+
+
+def _slots(opcode):
+    """Masks of operations defining vr3, using vr1, using vr2, using vr3"""
+    arith = (opcode >= ADD) & (opcode <= RSHIFT)
+    defines = arith | (opcode == LOADI) | (opcode == LOAD)
+    uses1 = arith | (opcode == LOAD) | (opcode == STORE)
+    return defines, uses1, arith, opcode == STORE
+
+
+def next_uses(opcode, vr1, vr2, vr3, line):
+    """Compute the next use of every operand slot
+    
+    Every occurrence of a VR gets a position; sorting them by VR, then
+    position, puts each occurrence just before the next one of the same
+    VR, so a shift gives its next use. Within an operation the second use
+    comes before vr1 and the definition comes last, which mirrors the
+    backward pass of rename_registers. Returns (nu1, nu2, nu3) with INF
+    where a value is never used again and -1 for unused slots.
+    """
+    n = len(opcode)
+    index = np.arange(n, dtype=np.int64)
+    defines, uses1, uses2, uses3 = _slots(opcode)
+    
+    # (slot, mask, vr column, position within the operation)
+    slots = ((1, uses1, vr1, 1), (2, uses2, vr2, 0), (3, uses3, vr3, 0), (3, defines, vr3, 2))
+    ops = [index[mask] for _, mask, _, _ in slots]
+    ev_vr = np.concatenate([column[mask] for _, mask, column, _ in slots])
+    ev_pos = np.concatenate([3 * op + offset for op, (_, _, _, offset) in zip(ops, slots)])
+    ev_op = np.concatenate(ops)
+    
+    # Positions are below 3n, so one integer key sorts by VR, then position
+    order = np.argsort(ev_vr * (3 * n) + ev_pos)
+    sorted_vr = ev_vr[order]
+    following = np.full(len(order), INF, dtype=np.int64)
+    same = sorted_vr[1:] == sorted_vr[:-1]
+    following[:-1] = np.where(same, line[ev_op[order[1:]]], INF)
+    
+    ev_nu = np.empty_like(following)
+    ev_nu[order] = following
+    
+    result = {1: np.full(n, -1, dtype=np.int64), 2: np.full(n, -1, dtype=np.int64),
+              3: np.full(n, -1, dtype=np.int64)}
+    start = 0
+    for (slot, _, _, _), op in zip(slots, ops):
+        result[slot][op] = ev_nu[start:start + len(op)]
+        start += len(op)
+    return result[1], result[2], result[3]
+
+
+def live_intervals(opcode, vr1, vr2, vr3):
+    """Compute the operations each VR is live on entry to
+    
+    Returns (start, end) indexed by VR: a VR is live on entry to
+    operations start through end, which is empty when end < start.
+    start follows the definition, or is 0 for a VR used before any.
+    """
+    n = len(opcode)
+    index = np.arange(n, dtype=np.int64)
+    defines, uses1, uses2, uses3 = _slots(opcode)
+    num_vrs = int(max(vr1.max(initial=-1), vr2.max(initial=-1), vr3.max(initial=-1))) + 1
+    
+    start = np.zeros(num_vrs, dtype=np.int64)
+    start[vr3[defines]] = index[defines] + 1
+    
+    # Operations are in order, so the largest index is the last use
+    end = np.full(num_vrs, -1, dtype=np.int64)
+    for mask, column in ((uses1, vr1), (uses2, vr2), (uses3, vr3)):
+        np.maximum.at(end, column[mask], index[mask])
+    return start, end
+
+
+def pressure_profile(start, end, n):
+    """Count the values live on entry to each of n operations
+    
+    Prefix sums over interval starts and ends; matches compute_pressure.
+    """
+    live = start <= end
+    delta = (np.bincount(start[live], minlength=n + 1)
+             - np.bincount(end[live] + 1, minlength=n + 1))
+    return np.cumsum(delta)[:n]
+
+
+def compute_maxlive(ir_list):
+    """Compute MAXLIVE of a renamed block"""
+    if ir_list.get_operation_count() == 0:
+        return 0
+    opcode, vr1, vr2, vr3, line = ir_columns(ir_list)
+    start, end = live_intervals(opcode, vr1, vr2, vr3)
+    return int(pressure_profile(start, end, len(opcode)).max())
+
+
+def annotate_next_uses(ir_list):
+    """Set the nu fields of a renamed block, as rename_registers does"""
+    if ir_list.get_operation_count() == 0:
+        return
+    columns = ir_columns(ir_list)
+    inf = float('inf')
+    nus = [nu.tolist() for nu in next_uses(*columns)]
+    for op, nu1, nu2, nu3 in zip(ir_list.iterate_forward(), *nus):
+        if nu1 >= 0:
+            op.nu1 = inf if nu1 == INF else nu1
+        if nu2 >= 0:
+            op.nu2 = inf if nu2 == INF else nu2
+        if nu3 >= 0:
+            op.nu3 = inf if nu3 == INF else nu3
+
+
+def main():
+    """Check the engine against the scalar passes and time both"""
+    if len(sys.argv) < 2 or sys.argv[1] == "-h":
+        print("Usage: liverange.py filename...")
+        sys.exit(0 if len(sys.argv) == 2 else 1)
+    if not available:
+        print("liverange.py: NumPy is not installed", file=sys.stderr)
+        sys.exit(1)
+    
+    alloc = importlib.import_module("412alloc")
+    print(f"{'block':12s} {'ops':>8s} {'scalar':>9s} {'gather':>9s} {'arrays':>9s} "
+          f"{'speedup':>8s}  match")
+    for filename in sys.argv[1:]:
+        if not os.path.exists(filename):
+            sys.exit(1)
+        parser = Parser(Scanner(filename))
+        if not parser.parse():
+            sys.exit(1)
+        ir_list = parser.get_ir()
+        alloc.rename_registers(ir_list)
+        
+        # Scalar: next uses are computed by rename_registers' backward pass
+        expected = [(op.nu1, op.nu2, op.nu3) for op in ir_list.iterate_forward()]
+        start_time = perf_counter()
+        alloc.compute_next_uses(ir_list)
+        pressure = alloc.compute_pressure(ir_list)
+        scalar = perf_counter() - start_time
+        
+        # The engine itself works on columns; gathering them is timed apart
+        start_time = perf_counter()
+        columns = ir_columns(ir_list)
+        gather = perf_counter() - start_time
+        start_time = perf_counter()
+        nu1, nu2, nu3 = next_uses(*columns)
+        start, end = live_intervals(*columns[:4])
+        profile = pressure_profile(start, end, len(columns[0]))
+        vectorized = perf_counter() - start_time
+        
+        def slot(nu):
+            return float('inf') if nu == INF else nu
+        got = [(slot(a), slot(b), slot(c))
+               for a, b, c in zip(nu1.tolist(), nu2.tolist(), nu3.tolist())]
+        match = got == expected and profile.tolist() == pressure
+        name = os.path.basename(filename)
+        print(f"{name:12s} {len(expected):8d} {scalar:8.3f}s {gather:8.3f}s "
+              f"{vectorized:8.3f}s {scalar / vectorized:7.1f}x  {'yes' if match else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+optimizer.py - Local Optimizer for Renamed ILOC
+"""
+
+MAX_CONSTANT = 2147483647
+
+COMMUTATIVE = ("add", "mult")
+
+
+def fold_constant(opcode, a, b):
+    """Evaluate an arithmetic op on two constants
+    
+    Returns None when the result cannot be rematerialized by a single
+    loadI: it is negative, too large, or the shift amount is out of range.
+    """
+    if opcode == "add":
+        value = a + b
+    elif opcode == "sub":
+        value = a - b
+    elif opcode == "mult":
+        value = a * b
+    elif opcode == "lshift":
+        value = a << b if b < 32 else None
+    elif opcode == "rshift":
+        value = a >> b if b < 32 else None
+    else:
+        value = None
+    
+    if value is None or value < 0 or value > MAX_CONSTANT:
+        return None
+    return value
+
+
+def simplify(opcode, a, b, ca, cb):
+    """Apply an algebraic identity to an arithmetic op
+    
+    ca and cb are the constant values of operands a and b, or None.
+    Returns ("copy", vr) when the result equals an operand, ("const", c)
+    when it is a known constant, or None.
+    """
+    if cb == 0 and opcode in ("add", "sub", "lshift", "rshift"):
+        return "copy", a
+    if ca == 0 and opcode == "add":
+        return "copy", b
+    if opcode == "mult":
+        if cb == 1:
+            return "copy", a
+        if ca == 1:
+            return "copy", b
+        if ca == 0 or cb == 0:
+            return "const", 0
+    if ca == 0 and opcode in ("lshift", "rshift"):
+        return "const", 0
+    if a == b and opcode == "sub":
+        return "const", 0
+    return None
+
+
+def value_number(ir_list, report):
+    """Forward pass: constant folding, value numbering, load forwarding
+    
+    Works on VRs, each of which has a single definition in the block.
+    A redundant op is removed and its result replaced by an earlier VR.
+    """
+    replace = {}     # VR -> earlier VR holding the same value
+    const = {}       # VR -> constant value
+    exprs = {}       # (opcode, vr, vr) -> VR computing it
+    mem = {}         # known address -> VR holding its contents
+    mem_by_vr = {}   # address VR -> VR holding its contents
+    redundant = []
+    
+    for op in ir_list.iterate_forward():
+        opcode = op.opcode
+        
+        # Rewrite uses to their surviving value
+        if op.vr1 in replace:
+            op.vr1 = replace[op.vr1]
+        if op.vr2 in replace:
+            op.vr2 = replace[op.vr2]
+        if opcode == "store" and op.vr3 in replace:
+            op.vr3 = replace[op.vr3]
+        
+        if opcode == "loadI":
+            const[op.vr3] = op.sr1
+        
+        elif opcode in ("add", "sub", "mult", "lshift", "rshift"):
+            a, b = op.vr1, op.vr2
+            ca, cb = const.get(a), const.get(b)
+            value = None
+            if ca is not None and cb is not None:
+                value = fold_constant(opcode, ca, cb)
+            
+            rule = simplify(opcode, a, b, ca, cb) if value is None else None
+            if rule and rule[0] == "copy":
+                replace[op.vr3] = rule[1]
+                redundant.append(op)
+                report["simplified"] += 1
+                continue
+            if rule:
+                value = rule[1]
+            
+            if value is not None:
+                # Turn the op into a loadI of the folded value
+                op.opcode = "loadI"
+                op.sr1 = value
+                op.vr1 = op.vr2 = -1
+                const[op.vr3] = value
+                report["folded"] += 1
+                continue
+            
+            if opcode in COMMUTATIVE and b < a:
+                a, b = b, a
+            key = (opcode, a, b)
+            if key in exprs:
+                replace[op.vr3] = exprs[key]
+                redundant.append(op)
+                report["redundant"] += 1
+            else:
+                exprs[key] = op.vr3
+        
+        elif opcode == "load":
+            addr = const.get(op.vr1)
+            known = mem.get(addr) if addr is not None else mem_by_vr.get(op.vr1)
+            if known is not None:
+                replace[op.vr3] = known
+                redundant.append(op)
+                report["forwarded"] += 1
+            elif addr is not None:
+                mem[addr] = op.vr3
+            else:
+                mem_by_vr[op.vr1] = op.vr3
+        
+        elif opcode == "store":
+            addr = const.get(op.vr3)
+            if addr is None:
+                # An unknown address may overwrite anything
+                mem.clear()
+            mem_by_vr.clear()
+            mem_by_vr[op.vr3] = op.vr1
+            if addr is not None:
+                mem[addr] = op.vr1
+    
+    for op in redundant:
+        ir_list.remove(op)
+    return const
+
+
+def eliminate_dead_code(ir_list, const, report):
+    """Backward pass: remove unused values, nops and overwritten stores"""
+    needed = set()
+    overwritten = set()  # known addresses stored to later with no read between
+    dead = []
+    
+    for op in ir_list.iterate_backward():
+        opcode = op.opcode
+        
+        if opcode == "nop":
+            dead.append(op)
+            report["dead"] += 1
+            continue
+        
+        if opcode == "output":
+            overwritten.discard(op.sr1)
+            continue
+        
+        if opcode == "store":
+            addr = const.get(op.vr3)
+            if addr is not None and addr in overwritten:
+                dead.append(op)
+                report["dead stores"] += 1
+                continue
+            if addr is not None:
+                overwritten.add(addr)
+            needed.add(op.vr1)
+            needed.add(op.vr3)
+            continue
+        
+        # Everything else defines a value and has no other effect
+        if op.vr3 not in needed:
+            dead.append(op)
+            report["dead"] += 1
+            continue
+        
+        if opcode == "load":
+            addr = const.get(op.vr1)
+            if addr is not None:
+                overwritten.discard(addr)
+            else:
+                overwritten.clear()
+            needed.add(op.vr1)
+        elif opcode != "loadI":
+            needed.add(op.vr1)
+            needed.add(op.vr2)
+    
+    for op in dead:
+        ir_list.remove(op)
+
+
+def optimize(ir_list):
+    """Optimize a renamed block in place
+    
+    Runs constant folding, local value numbering and store-to-load
+    forwarding, then dead-code elimination. Afterwards each op's source
+    registers are set to its VRs, so the block can be renamed again to
+    recompute next uses. Returns a dict counting what each step did.
+    """
+    report = {"folded": 0, "simplified": 0, "redundant": 0, "forwarded": 0,
+              "dead": 0, "dead stores": 0}
+    const = value_number(ir_list, report)
+    eliminate_dead_code(ir_list, const, report)
+    
+    for op in ir_list.iterate_forward():
+        if op.opcode != "loadI" and op.opcode != "output":
+            op.sr1 = op.vr1
+        op.sr2 = op.vr2
+        op.sr3 = op.vr3
+    return report
@@ -2,18 +2,20 @@
 parser.py - ILOC Parser Module
 """
 
-from scanner import Scanner, LOAD, LOADI, STORE, ADD, SUB, MULT, LSHIFT, RSHIFT, OUTPUT, NOP, REGISTER, CONSTANT, COMMA, ARROW, ENDLINE, EOF, ERROR
+from scanner import Scanner, LOAD, LOADI, STORE, ADD, SUB, MULT, LSHIFT, RSHIFT, OUTPUT, NOP, REGISTER, CONSTANT, COMMA, ARROW, ENDLINE, EOF, ERROR, JUMPI, CBR, LABEL, COLON, JUMPTO
 from ir import ILOCOperation, IRList
 
 class Parser:
     """Simple ILOC Parser"""
-    __slots__ = ['scanner', 'current_token', 'errors', 'ir_list']
+    __slots__ = ['scanner', 'current_token', 'errors', 'ir_list', 'sink']
     
-    def __init__(self, scanner):
+    def __init__(self, scanner, sink=None):
+        """sink, if given, receives each operation instead of the IR list"""
         self.scanner = scanner
         self.current_token = None
         self.errors = []
         self.ir_list = IRList()
+        self.sink = sink
     
     def parse(self):
         """Parse input file"""
@@ -23,7 +25,10 @@ class Parser:
         # Cache methods for speed
         next_token = self.scanner.next_token
         append_error = self.errors.append
-        append_op = self.ir_list.append
+        append_op = self.sink or self.ir_list.append
+        label = None      # Label waiting for the next operation
+        labels = set()
+        targets = []      # (line, label) of every branch target
         
         # Main loop
         while self.current_token.type != EOF:
@@ -37,6 +42,25 @@ class Parser:
             
             line = token.line
             
+            # label: marks the next operation, on this line or a later one
+            if ttype == LABEL:
+                self.current_token = next_token()
+                if self.current_token.type != COLON:
+                    append_error(f"ERROR {line}: Invalid opcode: {token.lexeme}")
+                    self._skip_line()
+                    continue
+                if token.lexeme in labels:
+                    append_error(f"ERROR {line}: Duplicate label: {token.lexeme}")
+                labels.add(token.lexeme)
+                if label is not None:
+                    # Two labels in a row mark an empty operation
+                    op = ILOCOperation(line, "nop")
+                    op.label = label
+                    append_op(op)
+                label = token.lexeme
+                self.current_token = next_token()
+                continue
+            
             # Process operation based on type
             if ttype == LOADI:
                 # loadI constant => register
@@ -142,7 +166,46 @@ class Parser:
                 
             elif ttype == NOP:
                 # nop
-                append_op(ILOCOperation(line, "nop"))
+                op = ILOCOperation(line, "nop")
+                append_op(op)
+                
+            elif ttype == JUMPI or ttype == CBR:
+                # jumpI -> label, cbr register -> label, label
+                opcode = token.lexeme
+                op = ILOCOperation(line, opcode)
+                
+                if ttype == CBR:
+                    self.current_token = next_token()
+                    if self.current_token.type != REGISTER:
+                        append_error(f"ERROR {line}: Expected register after cbr")
+                        self._skip_line()
+                        continue
+                    op.sr1 = self.current_token.value
+                
+                self.current_token = next_token()
+                if self.current_token.type != JUMPTO:
+                    append_error(f"ERROR {line}: Expected '->' in {opcode}")
+                    self._skip_line()
+                    continue
+                
+                names = []
+                for _ in range(1 if ttype == JUMPI else 2):
+                    if names:
+                        self.current_token = next_token()
+                        if self.current_token.type != COMMA:
+                            append_error(f"ERROR {line}: Expected ',' after first label")
+                            break
+                    self.current_token = next_token()
+                    if self.current_token.type != LABEL:
+                        append_error(f"ERROR {line}: Expected label in {opcode}")
+                        break
+                    names.append(self.current_token.lexeme)
+                    targets.append((line, self.current_token.lexeme))
+                if len(names) < (1 if ttype == JUMPI else 2):
+                    self._skip_line()
+                    continue
+                op.targets = tuple(names)
+                append_op(op)
                 
             else:
                 # Invalid opcode
@@ -150,12 +213,24 @@ class Parser:
                 self._skip_line()
                 continue
             
+            if label is not None:
+                op.label = label
+                label = None
+            
             # Move to next token
             self.current_token = next_token()
             if self.current_token.type not in (ENDLINE, EOF):
                 append_error(f"ERROR {line}: Unexpected token after operation: {self.current_token.lexeme}")
                 self._skip_line()
         
+        if label is not None:
+            op = ILOCOperation(self.current_token.line, "nop")
+            op.label = label
+            append_op(op)
+        for line, target in targets:
+            if target not in labels:
+                append_error(f"ERROR {line}: Undefined label: {target}")
+        
         return len(self.errors) == 0
     
     def _skip_line(self):
@@ -0,0 +1,101 @@
+"""
+passes.py - Pass Manager with Cached Analyses and Per-Pass Timing
+"""
+
+import sys
+from time import perf_counter
+from profiler import phase
+
+
+class Analysis:
+    """A cached fact about the IR, computed on demand
+    
+    run(manager) returns the result; requires names the analyses it
+    reads, which are computed first. provides names further analyses the
+    same run leaves valid, e.g. renaming also sets next uses.
+    """
+    __slots__ = ['name', 'run', 'requires', 'provides']
+    
+    def __init__(self, name, run, requires=(), provides=()):
+        self.name = name
+        self.run = run
+        self.requires = requires
+        self.provides = provides
+
+
+class Pass:
+    """A step of the pipeline
+    
+    run(manager) works on manager.state. The analyses in requires are
+    available through manager.get when it starts; those in invalidates,
+    or all of them for "all", are dropped after it finishes.
+    """
+    __slots__ = ['name', 'run', 'requires', 'invalidates']
+    
+    def __init__(self, name, run, requires=(), invalidates=()):
+        self.name = name
+        self.run = run
+        self.requires = requires
+        self.invalidates = invalidates
+
+
+class PassManager:
+    """Run a pipeline of passes over shared state, caching analyses"""
+    __slots__ = ['analyses', 'passes', 'state', 'results', 'timings']
+    
+    def __init__(self, analyses, passes, state):
+        self.analyses = {analysis.name: analysis for analysis in analyses}
+        self.passes = {p.name: p for p in passes}
+        self.state = state
+        self.results = {}   # Analysis name -> cached result
+        self.timings = []   # (name, kind, seconds) in run order
+    
+    def time(self, name, kind, function, *args):
+        """Call function(*args), recording how long it took"""
+        with phase(name):
+            start = perf_counter()
+            result = function(*args)
+        self.timings.append((name, kind, perf_counter() - start))
+        return result
+    
+    def get(self, name):
+        """Return an analysis result, computing it if it is not cached"""
+        if name not in self.results:
+            analysis = self.analyses[name]
+            for required in analysis.requires:
+                self.get(required)
+            result = self.time(name, "analysis", analysis.run, self)
+            self.results[name] = result
+            for provided in analysis.provides:
+                self.results[provided] = result
+        return self.results[name]
+    
+    def invalidate(self, names):
+        """Drop cached analyses; names may be "all" """
+        if names == "all":
+            self.results.clear()
+        else:
+            for name in names:
+                self.results.pop(name, None)
+    
+    def unknown(self, pipeline):
+        """Return the pass names in pipeline that are not registered"""
+        return [name for name in pipeline if name not in self.passes]
+    
+    def run(self, pipeline):
+        """Run the named passes in order"""
+        for name in pipeline:
+            p = self.passes[name]
+            for required in p.requires:
+                self.get(required)
+            self.time(name, "pass", p.run, self)
+            self.invalidate(p.invalidates)
+    
+    def print_timings(self, out=None):
+        """Print a table of pass and analysis times on stderr"""
+        write = (out or sys.stderr).write
+        write(f"// {'name':20s} {'kind':9s} {'seconds':>9s}\n")
+        for name, kind, seconds in self.timings:
+            write(f"// {name:20s} {kind:9s} {seconds:9.4f}\n")
+        total = sum(seconds for _, _, seconds in self.timings)
+        write(f"// {'total':20s} {'':9s} {total:9.4f}\n")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+refcompare.py - Compare Our Allocations with Reference Allocations
+
+Pairs reference outputs such as ref_cc2_k5.txt with our outputs for the
+same block and k, such as cc2_k5.i written by 412alloc -k, and reports
+the extra loads, stores, loadIs, operations and estimated cycles.
+"""
+
+import sys
+import os
+import re
+from scanner import Scanner
+from parser import Parser
+from timing import estimate_cycles
+
+WORST = 5   # Blocks listed in the ranking
+
+HEADER_K = re.compile(r"\bk\s*=\s*(\d+)")
+NAME_K = re.compile(r"_k(\d+)$")
+
+
+def split_name(filename):
+    """Return (block, k) from a file name such as ref_cc2_k5.txt
+    
+    k is None if the name has none. Prefixes ref_ and my_ and suffixes
+    _out and _output are dropped from the block name.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    for prefix in ("ref_", "my_"):
+        if stem.startswith(prefix):
+            stem = stem[len(prefix):]
+    for suffix in ("_output", "_out"):
+        if stem.endswith(suffix):
+            stem = stem[:-len(suffix)]
+    match = NAME_K.search(stem)
+    if match:
+        return stem[:match.start()], int(match.group(1))
+    return stem, None
+
+
+def block_metrics(filename):
+    """Count the operations of an allocated block and estimate its cycles
+    
+    Returns a dict with ops, load, store, loadI, cycles, the number of
+    registers used and the k named in a header comment, if any; or None
+    if the file does not parse.
+    """
+    with open(filename) as f:
+        text = f.read()
+    parser = Parser(Scanner(None, text=text))
+    if not parser.parse():
+        return None
+    ir_list = parser.get_ir()
+    
+    metrics = {"ops": 0, "load": 0, "store": 0, "loadI": 0, "registers": 0}
+    for op in ir_list.iterate_forward():
+        metrics["ops"] += 1
+        if op.opcode in ("load", "store", "loadI"):
+            metrics[op.opcode] += 1
+        for sr in (op.sr3,) if op.opcode == "loadI" else (op.sr1, op.sr2, op.sr3):
+            if op.opcode != "output" and sr + 1 > metrics["registers"]:
+                metrics["registers"] = sr + 1
+    metrics["cycles"] = estimate_cycles(ir_list)
+    
+    first = text.split("\n", 1)[0]
+    match = HEADER_K.search(first) if first.startswith("//") else None
+    metrics["k"] = int(match.group(1)) if match else None
+    return metrics
+
+
+def list_files(path):
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith((".i", ".txt"))]
+    return [path]
+
+
+def pair_files(refs, ours, warn):
+    """Match each reference with our output for the same block and k
+    
+    A reference's k comes from its header comment, which the reference
+    allocator writes, or else from its name. Our outputs without k in
+    their name are matched by the registers they use: the smallest
+    reference k that they fit. Returns (block, k, reference, ours,
+    reference metrics, our metrics) for every pair.
+    """
+    references = {}
+    for filename in refs:
+        metrics = block_metrics(filename)
+        block, k = split_name(filename)
+        if metrics is None:
+            warn(f"{filename}: does not parse")
+            continue
+        if metrics["k"] is not None:
+            if k is not None and k != metrics["k"]:
+                warn(f"{os.path.basename(filename)}: named k = {k} but allocated "
+                     f"for k = {metrics['k']}")
+            k = metrics["k"]
+        if k is None:
+            warn(f"{filename}: no k in its name or header")
+            continue
+        if (block, k) in references:
+            warn(f"{os.path.basename(filename)}: duplicates "
+                 f"{os.path.basename(references[block, k][0])}")
+            continue
+        references[block, k] = (filename, metrics)
+    
+    pairs = []
+    for filename in ours:
+        metrics = block_metrics(filename)
+        block, k = split_name(filename)
+        if metrics is None:
+            warn(f"{filename}: does not parse")
+            continue
+        if k is None:
+            fits = sorted(rk for rb, rk in references
+                          if rb == block and rk >= metrics["registers"])
+            k = fits[0] if fits else None
+        if (block, k) not in references:
+            warn(f"{os.path.basename(filename)}: no reference for {block}"
+                 + (f", k = {k}" if k is not None else ""))
+            continue
+        ref_file, ref_metrics = references[block, k]
+        pairs.append((block, k, ref_file, filename, ref_metrics, metrics))
+    return sorted(pairs, key=lambda pair: (pair[0], pair[1]))
+
+
+def write_report(pairs, out=None, worst=WORST):
+    """Write the per-block deltas, ours minus the reference, and the worst blocks"""
+    write = (out or sys.stdout).write
+    write(f"{'block':10s} {'k':>3s} {'ops':>11s} {'load':>6s} {'store':>6s} "
+          f"{'loadI':>6s} {'cycles':>15s} {'delta':>8s}\n")
+    for block, k, _, _, ref, ours in pairs:
+        delta = ours["cycles"] - ref["cycles"]
+        percent = 100.0 * delta / ref["cycles"] if ref["cycles"] else 0.0
+        write(f"{block:10s} {k:3d} {ours['ops']:5d}/{ref['ops']:<5d} "
+              f"{ours['load'] - ref['load']:+6d} {ours['store'] - ref['store']:+6d} "
+              f"{ours['loadI'] - ref['loadI']:+6d} "
+              f"{ours['cycles']:7d}/{ref['cycles']:<7d} {percent:+7.1f}%\n")
+    
+    ranked = sorted(pairs, key=lambda pair: pair[5]["cycles"] - pair[4]["cycles"],
+                    reverse=True)
+    ranked = [pair for pair in ranked if pair[5]["cycles"] > pair[4]["cycles"]]
+    if ranked:
+        write("Worst blocks, by extra cycles:\n")
+        for block, k, _, filename, ref, ours in ranked[:worst]:
+            write(f"  {block}, k = {k}: {ours['cycles'] - ref['cycles']:+d} cycles "
+                  f"({os.path.basename(filename)})\n")
+    else:
+        write("No block takes more cycles than its reference.\n")
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) != 2 or args[0] == "-h":
+        print("Usage: refcompare.py references ours")
+        print("  references and ours are files or directories of allocated blocks.")
+        print("  Columns give ours/reference for ops and cycles, and ours minus")
+        print("  the reference for loads, stores and loadIs.")
+        sys.exit(0 if args[:1] == ["-h"] else 1)
+    if not all(os.path.exists(path) for path in args):
+        sys.exit(1)
+    
+    refs, ours = list_files(args[0]), list_files(args[1])
+    if os.path.isdir(args[0]) and os.path.samefile(args[0], args[1]):
+        # One directory holding both sides, as lab2 does
+        refs = [f for f in refs if os.path.basename(f).startswith("ref_")]
+        ours = [f for f in ours if not os.path.basename(f).startswith("ref_")]
+    
+    def warn(message):
+        print(f"refcompare.py: {message}", file=sys.stderr)
+    
+    pairs = pair_files(refs, ours, warn)
+    if not pairs:
+        warn("no block has both a reference and our output")
+        sys.exit(1)
+    write_report(pairs)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,10 @@ LOAD, LOADI, STORE, ADD, SUB, MULT = 0, 1, 2, 3, 4, 5
 LSHIFT, RSHIFT, OUTPUT, NOP = 6, 7, 8, 9
 REGISTER, CONSTANT, COMMA, ARROW = 10, 11, 12, 13
 ENDLINE, EOF, ERROR = 14, 15, 16
+JUMPI, CBR, LABEL, COLON, JUMPTO = 17, 18, 19, 20, 21
+
+# Characters of whole lines read at a time when streaming
+STREAM_CHUNK = 1 << 16
 
 class TokenType:
     LOAD, LOADI, STORE = LOAD, LOADI, STORE
@@ -18,6 +22,8 @@ class TokenType:
     REGISTER, CONSTANT = REGISTER, CONSTANT
     COMMA, ARROW = COMMA, ARROW
     ENDLINE, EOF, ERROR = ENDLINE, EOF, ERROR
+    JUMPI, CBR, LABEL = JUMPI, CBR, LABEL
+    COLON, JUMPTO = COLON, JUMPTO
 
 class Token:
     __slots__ = ['type', 'lexeme', 'line', 'value']
@@ -29,38 +35,71 @@ class Token:
         self.value = value
 
 class Scanner:
-    __slots__ = ['input', 'length', 'pos', 'line', '_opcodes', '_type_strings']
+    __slots__ = ['input', 'length', 'pos', 'line', 'tokens', 'tail', 'stream', '_opcodes',
+                 '_type_strings']
     
-    def __init__(self, filename):
-        try:
-            # Read file in chunks to avoid memory spikes
-            with open(filename, 'r', buffering=8192) as f:
-                self.input = f.read()
-        except IOError:
-            print(f"ERROR: Cannot read file '{filename}'", file=sys.stderr)
-            sys.exit(1)
+    def __init__(self, filename, text=None, stream=False):
+        self.stream = None
+        if text is not None:
+            # Scan ILOC already in memory, e.g. allocator output
+            self.input = text
+        elif stream:
+            # Keep only a chunk of whole lines in memory; no token spans lines
+            try:
+                self.stream = open(filename, 'r', buffering=STREAM_CHUNK)
+            except IOError:
+                print(f"ERROR: Cannot read file '{filename}'", file=sys.stderr)
+                sys.exit(1)
+            self.input = ''
+        else:
+            try:
+                # Read file in chunks to avoid memory spikes
+                with open(filename, 'r', buffering=8192) as f:
+                    self.input = f.read()
+            except IOError:
+                print(f"ERROR: Cannot read file '{filename}'", file=sys.stderr)
+                sys.exit(1)
         
         self.length = len(self.input)
         self.pos = 0
         self.line = 1
+        self.tokens = 0   # Tokens returned, EOF included
+        self.tail = self.input[-1:]   # Last character read
         
         # Store these as instance variables to avoid class lookup
         self._opcodes = {
             'load': LOAD, 'loadI': LOADI, 'store': STORE,
             'add': ADD, 'sub': SUB, 'mult': MULT,
             'lshift': LSHIFT, 'rshift': RSHIFT,
-            'output': OUTPUT, 'nop': NOP
+            'output': OUTPUT, 'nop': NOP,
+            'jumpI': JUMPI, 'cbr': CBR
         }
         
         self._type_strings = [
             "MEMOP", "LOADI", "MEMOP", "ARITHOP", "ARITHOP",
             "ARITHOP", "ARITHOP", "ARITHOP", "OUTPUT", "NOP",
             "REGISTER", "CONSTANT", "COMMA", "INTO", "ENDLINE",
-            "EOF", "ERROR"
+            "EOF", "ERROR", "BRANCH", "BRANCH", "LABEL", "COLON",
+            "JUMPTO"
         ]
     
+    def _refill(self):
+        """Read the next chunk of lines, closing the file at its end"""
+        self.input = ''.join(self.stream.readlines(STREAM_CHUNK))
+        self.length = len(self.input)
+        self.pos = 0
+        if self.input:
+            self.tail = self.input[-1]
+        else:
+            self.stream.close()
+            self.stream = None
+    
     def next_token(self):
         """Scan next token with minimal overhead"""
+        self.tokens += 1
+        if self.pos >= self.length and self.stream is not None:
+            self._refill()
+        
         pos = self.pos
         input_str = self.input
         length = self.length
@@ -112,6 +151,15 @@ class Scanner:
                 self.pos = pos + 2
                 return Token(ARROW, '=>', self.line)
         
+        if ch == '-':
+            if pos + 1 < length and input_str[pos + 1] == '>':
+                self.pos = pos + 2
+                return Token(JUMPTO, '->', self.line)
+        
+        if ch == ':':
+            self.pos = pos + 1
+            return Token(COLON, ':', self.line)
+        
         # Numbers
         if '0' <= ch <= '9':
             start = pos
@@ -140,14 +188,18 @@ class Scanner:
             if lexeme[0] == 'r' and len(lexeme) > 1 and lexeme[1:].isdigit():
                 return Token(REGISTER, lexeme, self.line, int(lexeme[1:]))
             
-            # Check opcode
-            token_type = self._opcodes.get(lexeme, ERROR)
+            # Check opcode; any other word names a label
+            token_type = self._opcodes.get(lexeme, LABEL)
             return Token(token_type, lexeme, self.line)
         
         # Unknown character
         self.pos = pos + 1
         return Token(ERROR, ch, self.line)
     
+    def line_count(self):
+        """Lines in the scanned input: one per ENDLINE, and a last line without one"""
+        return self.line - 1 + (self.tail not in ("", "\n", "\r"))
+    
     def get_token_type_string(self, token):
         """Get string for token type"""
-        return self._type_strings[token.type] if 0 <= token.type <= 16 else str(token.type)
\ No newline at end of file
+        return self._type_strings[token.type] if 0 <= token.type <= 21 else str(token.type)
\ No newline at end of file
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+scheduler.py - ILOC List Scheduler
+"""
+
+import sys
+import os
+import heapq
+from scanner import Scanner
+from parser import Parser
+from timing import LATENCY
+
+ARITH_OPS = ["add", "sub", "mult", "lshift", "rshift"]
+
+
+def op_registers(op):
+    """Return (uses, defined register) of an op, using its source names"""
+    if op.opcode == "loadI":
+        return (), op.sr3
+    if op.opcode == "load":
+        return (op.sr1,), op.sr3
+    if op.opcode == "store":
+        return (op.sr1, op.sr3), -1
+    if op.opcode in ARITH_OPS:
+        return (op.sr1, op.sr2), op.sr3
+    if op.opcode == "cbr":
+        return (op.sr1,), -1
+    return (), -1
+
+
+def build_dependence_graph(ops):
+    """Build the dependence graph of a straight-line block
+    
+    Register edges cover true, anti and output dependences. Memory edges
+    order loads, stores and outputs that may touch the same address; an
+    address is known when its register was last set by a loadI, and an
+    unknown address may alias anything. Outputs also stay in order.
+    
+    Returns succs, where succs[i] lists (j, latency) edges from op i.
+    """
+    n = len(ops)
+    succs = [[] for _ in range(n)]
+    
+    last_def = {}      # register -> op that last defined it
+    uses_since = {}    # register -> ops reading it since that definition
+    known = {}         # register -> constant loaded by loadI
+    
+    last_store = {}            # address -> last store to it
+    reads_since = {}           # address -> loads/outputs since that store
+    last_unknown_store = -1
+    stores_since_unknown = []  # known-address stores since last_unknown_store
+    reads_since_unknown = []   # loads/outputs since last_unknown_store
+    unknown_reads = []         # unknown-address loads since last_unknown_store
+    # An op consuming stores_since_unknown or unknown_reads is ordered
+    # after every op in it, so it stands in for the list from then on,
+    # which keeps the number of edges linear in the block's length. Its
+    # own latency is already waited for, so edges from it have latency 0
+    last_output = -1
+    store_lat = LATENCY["store"]
+    
+    for i, op in enumerate(ops):
+        opcode = op.opcode
+        uses, reg = op_registers(op)
+        
+        # Register dependences
+        for r in uses:
+            if r in last_def:
+                d = last_def[r]
+                succs[d].append((i, LATENCY[ops[d].opcode]))
+            uses_since.setdefault(r, []).append(i)
+        
+        if reg >= 0:
+            for u in uses_since.pop(reg, ()):
+                if u != i:
+                    succs[u].append((i, 0))
+            if reg in last_def:
+                succs[last_def[reg]].append((i, LATENCY[ops[last_def[reg]].opcode]))
+        
+        # Memory dependences
+        if opcode == "load" or opcode == "output":
+            addr = known.get(op.sr1) if opcode == "load" else op.sr1
+            if last_unknown_store >= 0:
+                succs[last_unknown_store].append((i, store_lat))
+            if addr is None:
+                for s in stores_since_unknown:
+                    succs[s].append((i, 0 if ops[s].opcode == "load" else store_lat))
+                stores_since_unknown = [i]
+                unknown_reads.append(i)
+            else:
+                if addr in last_store:
+                    succs[last_store[addr]].append((i, store_lat))
+                reads_since.setdefault(addr, []).append(i)
+            reads_since_unknown.append(i)
+            
+            if opcode == "output":
+                if last_output >= 0:
+                    succs[last_output].append((i, 1))
+                last_output = i
+        
+        elif opcode == "store":
+            addr = known.get(op.sr3)
+            if last_unknown_store >= 0:
+                succs[last_unknown_store].append((i, 1))
+            if addr is None:
+                for s in stores_since_unknown:
+                    succs[s].append((i, 1))
+                for r in reads_since_unknown:
+                    succs[r].append((i, 1))
+                last_unknown_store = i
+                stores_since_unknown = []
+                reads_since_unknown = []
+                unknown_reads = []
+                last_store.clear()
+                reads_since.clear()
+            else:
+                if addr in last_store:
+                    succs[last_store[addr]].append((i, 1))
+                for r in reads_since.pop(addr, ()):
+                    succs[r].append((i, 1))
+                for r in unknown_reads:
+                    succs[r].append((i, 0 if ops[r].opcode == "store" else 1))
+                unknown_reads = [i]
+                last_store[addr] = i
+                stores_since_unknown.append(i)
+        
+        # Track registers holding loadI constants, for memory addresses
+        if reg >= 0:
+            last_def[reg] = i
+            if opcode == "loadI":
+                known[reg] = op.sr1
+            else:
+                known.pop(reg, None)
+    
+    return succs
+
+
+def compute_priorities(ops, succs):
+    """Compute the latency-weighted critical path length from each op"""
+    priority = [0] * len(ops)
+    for i in range(len(ops) - 1, -1, -1):
+        best = 0
+        for j, _ in succs[i]:
+            if priority[j] > best:
+                best = priority[j]
+        priority[i] = LATENCY[ops[i].opcode] + best
+    return priority
+
+
+def schedule(ir_list, succs=None):
+    """List-schedule a block for a single-issue, interlocked machine
+    
+    succs may give the block's dependence graph if it is already built.
+    Returns (ops, cycles): the ops in issue order and the cycle in which
+    the last one completes.
+    """
+    ops = list(ir_list.iterate_forward())
+    n = len(ops)
+    if succs is None:
+        succs = build_dependence_graph(ops)
+    priority = compute_priorities(ops, succs)
+    
+    npreds = [0] * n
+    for edges in succs:
+        for j, _ in edges:
+            npreds[j] += 1
+    earliest = [1] * n
+    
+    ready = []    # (-priority, index) of ops that may issue now
+    waiting = []  # (earliest cycle, index) of ops whose operands are pending
+    for i in range(n):
+        if npreds[i] == 0:
+            heapq.heappush(ready, (-priority[i], i))
+    
+    order = []
+    cycle = 1
+    finish = 0
+    while len(order) < n:
+        while waiting and waiting[0][0] <= cycle:
+            i = heapq.heappop(waiting)[1]
+            heapq.heappush(ready, (-priority[i], i))
+        
+        if not ready:
+            cycle = waiting[0][0]
+            continue
+        
+        i = heapq.heappop(ready)[1]
+        order.append(ops[i])
+        finish = max(finish, cycle + LATENCY[ops[i].opcode] - 1)
+        for j, lat in succs[i]:
+            if cycle + lat > earliest[j]:
+                earliest[j] = cycle + lat
+            npreds[j] -= 1
+            if npreds[j] == 0:
+                heapq.heappush(waiting, (max(earliest[j], cycle + 1), j))
+        cycle += 1
+    
+    return order, finish
+
+
+def write_op(write, op):
+    """Emit an operation using its source register names"""
+    if op.opcode == "loadI":
+        write(f"loadI {op.sr1} => r{op.sr3}\n")
+    elif op.opcode in ("load", "store"):
+        write(f"{op.opcode} r{op.sr1} => r{op.sr3}\n")
+    elif op.opcode in ARITH_OPS:
+        write(f"{op.opcode} r{op.sr1}, r{op.sr2} => r{op.sr3}\n")
+    elif op.opcode == "output":
+        write(f"output {op.sr1}\n")
+    elif op.opcode == "nop":
+        write("nop\n")
+    elif op.opcode == "cbr":
+        write(f"cbr r{op.sr1} -> {op.targets[0]}, {op.targets[1]}\n")
+    elif op.opcode == "jumpI":
+        write(f"jumpI -> {op.targets[0]}\n")
+
+
+def schedule_code(code, out=None):
+    """Parse ILOC text, e.g. allocator output, and write it scheduled"""
+    parser = Parser(Scanner(None, text=code))
+    if not parser.parse():
+        return None
+    order, cycles = schedule(parser.get_ir())
+    write = (out or sys.stdout).write
+    for op in order:
+        write_op(write, op)
+    return cycles
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] == "-h":
+        print("Usage: scheduler.py filename")
+        sys.exit(0 if len(sys.argv) == 2 else 1)
+    
+    filename = sys.argv[1]
+    if not os.path.exists(filename):
+        sys.exit(1)
+    
+    parser = Parser(Scanner(filename))
+    if not parser.parse():
+        sys.exit(1)
+    
+    order, cycles = schedule(parser.get_ir())
+    write = sys.stdout.write
+    for op in order:
+        write_op(write, op)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+simulator.py - Local ILOC Simulator
+
+A stand-in for the course simulator, so allocator output can be checked
+without it. Prints the values written by output, one per line, then the
+line "Executed N instructions and N operations in C cycles." that the
+CodeCheck scripts read.
+"""
+
+import sys
+import os
+from scanner import Scanner
+from parser import Parser
+from timing import LATENCY
+
+# Operation kinds of compiled code, most frequent first
+ADD, SUB, MULT, LSHIFT, RSHIFT = 0, 1, 2, 3, 4
+LOADI, LOAD, STORE, OUTPUT, NOP, JUMPI, CBR = 5, 6, 7, 8, 9, 10, 11
+KINDS = {
+    "add": ADD, "sub": SUB, "mult": MULT, "lshift": LSHIFT, "rshift": RSHIFT,
+    "loadI": LOADI, "load": LOAD, "store": STORE, "output": OUTPUT,
+    "nop": NOP, "jumpI": JUMPI, "cbr": CBR
+}
+
+STEP_LIMIT = 100000000   # Operations executed before a program is stopped
+
+
+class SimulationError(Exception):
+    """Raised when a program cannot be run to completion"""
+
+
+class Program:
+    """ILOC compiled into a flat list of (kind, a, b, c) tuples
+    
+    Registers are renumbered densely, so the register file is a list;
+    a and b are the sources and c the destination, a constant for loadI
+    and output, or the index branched to for jumpI and cbr (b and c).
+    latency holds the latency of each operation.
+    """
+    __slots__ = ['code', 'registers', 'latency']
+    
+    def __init__(self, code, registers, latency):
+        self.code = code
+        self.registers = registers
+        self.latency = latency
+
+
+def compile_program(ir_list):
+    """Compile a parsed block or program for run()"""
+    index = {}  # SR -> register file slot
+    
+    def reg(sr):
+        slot = index.get(sr)
+        if slot is None:
+            slot = index[sr] = len(index)
+        return slot
+    
+    ops = list(ir_list.iterate_forward())
+    at = {op.label: i for i, op in enumerate(ops) if op.label is not None}
+    code = []
+    latency = []
+    for op in ops:
+        kind = KINDS[op.opcode]
+        if kind <= RSHIFT:
+            code.append((kind, reg(op.sr1), reg(op.sr2), reg(op.sr3)))
+        elif kind == LOADI:
+            code.append((kind, op.sr1, -1, reg(op.sr3)))
+        elif kind == LOAD or kind == STORE:
+            code.append((kind, reg(op.sr1), -1, reg(op.sr3)))
+        elif kind == OUTPUT:
+            code.append((kind, op.sr1, -1, -1))
+        elif kind == NOP:
+            code.append((kind, -1, -1, -1))
+        elif kind == JUMPI:
+            code.append((kind, -1, at[op.targets[0]], -1))
+        else:
+            code.append((kind, reg(op.sr1), at[op.targets[0]], at[op.targets[1]]))
+        latency.append(LATENCY[op.opcode])
+    
+    return Program(code, list(index), latency)
+
+
+def parse_memory(args):
+    """Build the initial memory from simulator arguments "-i addr v1 v2 ..." """
+    memory = {}
+    if len(args) >= 2 and args[0] == "-i":
+        address = int(args[1])
+        for value in args[2:]:
+            memory[address] = int(value)
+            address += 4
+    return memory
+
+
+def read_sim_input(filename):
+    """Return the arguments on a block's //SIM INPUT: line, as CodeCheck reads them"""
+    with open(filename) as f:
+        for line in f:
+            line = line.strip()
+            if line == "":
+                break
+            if '//SIM INPUT:' in line:
+                return line.split(':')[1].split()
+    return []
+
+
+def run(program, memory=None, limit=STEP_LIMIT):
+    """Execute a compiled program, counting cycles as the simulator does
+    
+    Arithmetic wraps to 32 bits as on the course simulator, and
+    registers and memory not yet written read as 0. memory maps
+    addresses to words and is updated in place. Timing follows
+    timing.estimate_cycles, with the actual addresses: an operation
+    stalls until its registers are ready and a load or output until the
+    last store to its address has completed. Returns (outputs,
+    operations, cycles). Raises SimulationError if more than limit
+    operations execute.
+    """
+    if memory is None:
+        memory = {}
+    regs = [0] * len(program.registers)
+    ready = [0] * len(program.registers)  # Cycle each register is available
+    stored = {}                           # Address -> cycle its store completes
+    code, latency = program.code, program.latency
+    outputs = []
+    emit = outputs.append
+    read = memory.get
+    low, high = -(1 << 31), (1 << 31) - 1
+    store_latency = LATENCY["store"]
+    
+    pc = 0
+    n = len(code)
+    steps = 0
+    cycle = 0
+    finish = 0
+    while pc < n:
+        steps += 1
+        if steps > limit:
+            raise SimulationError(f"stopped after {limit} operations")
+        kind, a, b, c = code[pc]
+        lat = latency[pc]
+        issue = cycle + 1
+        
+        if kind <= RSHIFT:
+            if ready[a] > issue:
+                issue = ready[a]
+            if ready[b] > issue:
+                issue = ready[b]
+            x, y = regs[a], regs[b]
+            if kind == ADD:
+                value = x + y
+            elif kind == SUB:
+                value = x - y
+            elif kind == MULT:
+                value = x * y
+            elif kind == LSHIFT:
+                value = x << (y & 31)
+            else:
+                value = x >> (y & 31)
+            if value < low or value > high:
+                value = ((value + (1 << 31)) & 0xFFFFFFFF) - (1 << 31)
+            regs[c] = value
+            ready[c] = issue + lat
+        elif kind == LOADI:
+            regs[c] = a
+            ready[c] = issue + 1
+        elif kind == LOAD:
+            if ready[a] > issue:
+                issue = ready[a]
+            address = regs[a]
+            if stored.get(address, 0) > issue:
+                issue = stored[address]
+            regs[c] = read(address, 0)
+            ready[c] = issue + lat
+        elif kind == STORE:
+            if ready[a] > issue:
+                issue = ready[a]
+            if ready[c] > issue:
+                issue = ready[c]
+            memory[regs[c]] = regs[a]
+            stored[regs[c]] = issue + store_latency
+        elif kind == OUTPUT:
+            if stored.get(a, 0) > issue:
+                issue = stored[a]
+            emit(read(a, 0))
+        elif kind == JUMPI:
+            pc = b - 1
+        elif kind == CBR:
+            if ready[a] > issue:
+                issue = ready[a]
+            pc = (b if regs[a] else c) - 1
+        
+        if issue + lat - 1 > finish:
+            finish = issue + lat - 1
+        cycle = issue
+        pc += 1
+    return outputs, steps, finish
+
+
+def reused_register(ir_list):
+    """Return a register defined more than once, or None if code is renamed"""
+    defined = set()
+    for op in ir_list.iterate_forward():
+        if op.opcode in ("loadI", "load") or KINDS[op.opcode] <= RSHIFT:
+            if op.sr3 in defined:
+                return op.sr3
+            defined.add(op.sr3)
+    return None
+
+
+def register_over(ir_list, k):
+    """Return a register numbered k or above, or None if code fits in k"""
+    for op in ir_list.iterate_forward():
+        kind = KINDS[op.opcode]
+        regs = []
+        if kind <= RSHIFT:
+            regs = (op.sr1, op.sr2, op.sr3)
+        elif kind == LOAD or kind == STORE:
+            regs = (op.sr1, op.sr3)
+        elif kind == LOADI:
+            regs = (op.sr3,)
+        elif kind == CBR:
+            regs = (op.sr1,)
+        for sr in regs:
+            if sr >= k:
+                return sr
+    return None
+
+
+def simulate(filename, args, renamed=False, k=None, text=None, out=None):
+    """Run a block as the course simulator would, writing its report
+    
+    args are the simulator's input arguments, e.g. from read_sim_input.
+    renamed checks that no register is defined twice, as -x does; k
+    checks that only registers r0 to r(k-1) are used, as -r does.
+    Returns False if the block cannot be simulated.
+    """
+    write = (out or sys.stdout).write
+    parser = Parser(Scanner(filename, text=text))
+    if not parser.parse():
+        write("Simulation failed: the code has syntax errors\n")
+        return False
+    ir_list = parser.get_ir()
+    
+    if renamed:
+        write("COMP 412, Lab 2, Code Check: renamed code\n")
+        sr = reused_register(ir_list)
+        if sr is not None:
+            write(f"Renaming check failed: r{sr} is defined more than once\n")
+            return False
+    if k is not None:
+        sr = register_over(ir_list, k)
+        if sr is not None:
+            write(f"Register check failed: r{sr} is not available with k = {k}\n")
+            return False
+    
+    try:
+        outputs, operations, cycles = run(compile_program(ir_list), parse_memory(args))
+    except SimulationError as e:
+        write(f"Simulation failed: {e}\n")
+        return False
+    write("".join(f"{value}\n" for value in outputs))
+    write(f"Executed {operations} instructions and {operations} operations "
+          f"in {cycles} cycles.\n")
+    return True
+
+
+def main():
+    """Command line compatible with the course simulator, reading stdin by default"""
+    args = sys.argv[1:]
+    if args and args[0] == "-h":
+        print("Usage: simulator.py [-x] [-r k] [-i address value...] [filename]")
+        print("  -x   check that no register is defined twice (renamed code)")
+        print("  -r   check that only registers r0 to r(k-1) are used")
+        print("  -i   store the values in consecutive words from address")
+        print("  Reads the code from standard input if no filename is given.")
+        sys.exit(0)
+    
+    renamed = "-x" in args
+    if renamed:
+        args.remove("-x")
+    k = None
+    if "-r" in args:
+        i = args.index("-r")
+        try:
+            k = int(args[i + 1])
+        except (IndexError, ValueError):
+            sys.exit(1)
+        del args[i:i + 2]
+    
+    filename = None
+    text = None
+    if args and not args[-1].lstrip("-").isdigit() and args[-1] != "-i":
+        filename = args.pop()
+        if not os.path.exists(filename):
+            sys.exit(1)
+    else:
+        text = sys.stdin.read()
+    try:
+        parse_memory(args)
+    except ValueError:
+        sys.exit(1)
+    
+    if not simulate(filename, args, renamed, k, text):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+stressgen.py - Allocator Stress Block Generator
+
+Writes straight-line ILOC blocks whose register pressure follows a
+chosen profile, with the //SIM INPUT: and //OUTPUT: header lines the
+course blocks carry.
+"""
+
+import sys
+import heapq
+import random
+from itertools import count as counter
+
+INPUT_BASE = 1024    # Words given by //SIM INPUT:
+OUTPUT_BASE = 8192   # Words stored to and printed at the end
+OUTPUT_WORDS = 64
+ARITHMETIC = ("add", "sub", "mult")
+
+
+def wrap(value):
+    """Wrap an integer to 32 bits, as the simulator does"""
+    return ((value + (1 << 31)) & 0xFFFFFFFF) - (1 << 31)
+
+
+def parse_profile(spec):
+    """Turn a pressure spec into a function from op index to target MAXLIVE
+    
+    flat:N keeps N values live, ramp:A:B goes from A to B over the block,
+    and wave:A:B:P rises from A to B and back every P ops.
+    """
+    kind, *numbers = spec.split(":")
+    numbers = [int(x) for x in numbers]
+    if kind == "flat" and len(numbers) == 1:
+        return lambda i, n: numbers[0]
+    if kind == "ramp" and len(numbers) == 2:
+        low, high = numbers
+        return lambda i, n: low + (high - low) * i // max(n, 1)
+    if kind == "wave" and len(numbers) == 3:
+        low, high, period = numbers
+        half = max(period // 2, 1)
+        return lambda i, n: low + (high - low) * (half - abs(i % (2 * half) - half)) // half
+    raise ValueError(f"bad pressure profile '{spec}'")
+
+
+def span_sampler(rng, mean, shape):
+    """Return a function drawing live-range lengths, in ops
+    
+    exp draws from an exponential distribution, uniform from 1 to twice
+    the mean, and bimodal mixes short ranges with a tenth that span
+    ten times the mean.
+    """
+    if shape == "exp":
+        return lambda: 1 + int(rng.expovariate(1.0 / mean))
+    if shape == "uniform":
+        return lambda: rng.randint(1, 2 * mean)
+    if shape == "bimodal":
+        return lambda: rng.randint(1, mean) if rng.random() < 0.9 else rng.randint(1, 20 * mean)
+    raise ValueError(f"bad live-range shape '{shape}'")
+
+
+def generate(ops, pressure="flat:16", constants=0.2, loads=0.2, stores=0.3,
+             span=32, shape="exp", inputs=16, seed=0):
+    """Generate a stress block of about ops operations; returns its text
+    
+    pressure is a profile for parse_profile. Of the values defined to
+    raise pressure, constants are loadIs and loads are loads from the
+    input words or words already stored; the rest combine live values.
+    stores is the share of values that die by being stored rather than
+    combined. Each value
+    lives for a length drawn by span_sampler, and a value past its
+    length, or any value while pressure is above target, is killed.
+    The block is evaluated while it is written, so the header gives
+    its expected output.
+    """
+    rng = random.Random(seed)
+    target = parse_profile(pressure)
+    draw_span = span_sampler(rng, span, shape)
+    input_values = [rng.randint(0, 1000) for _ in range(inputs)]
+    memory = {INPUT_BASE + 4 * i: v for i, v in enumerate(input_values)}
+    
+    lines = []
+    emit = lines.append
+    values = {}      # live register -> its value
+    live = []        # live registers, for random picks
+    where = {}       # live register -> index in live
+    deaths = []      # heap of (op index the value dies, serial, register)
+    serials = {}     # live register -> serial of its value
+    serial = counter()
+    free = []        # registers not holding live values
+    next_reg = 0
+    maxlive = 0
+    count = 0
+    
+    def new_register():
+        nonlocal next_reg
+        if free:
+            return free.pop()
+        next_reg += 1
+        return next_reg - 1
+    
+    def define(value):
+        reg = new_register()
+        values[reg] = value
+        where[reg] = len(live)
+        live.append(reg)
+        serials[reg] = number = next(serial)
+        heapq.heappush(deaths, (count + draw_span(), number, reg))
+        return reg
+    
+    def kill(reg):
+        i = where.pop(reg)
+        last = live.pop()
+        if last != reg:
+            live[i] = last
+            where[last] = i
+        del values[reg]
+        del serials[reg]
+        free.append(reg)
+    
+    def next_death():
+        # Drop entries for values already killed
+        while deaths and serials.get(deaths[0][2]) != deaths[0][1]:
+            heapq.heappop(deaths)
+        return deaths[0][0] if deaths else ops
+    
+    def earliest():
+        next_death()
+        return heapq.heappop(deaths)[2]
+    
+    def address(word):
+        reg = new_register()
+        emit(f"loadI {word} => r{reg}")
+        free.append(reg)
+        return reg
+    
+    def combine(reg, other):
+        a, b = values[reg], values[other]
+        opcode = rng.choice(ARITHMETIC)
+        if 0 <= b < 8 and rng.random() < 0.5:
+            opcode = rng.choice(("lshift", "rshift"))
+            value = wrap(a << b) if opcode == "lshift" else a >> b
+        elif opcode == "add":
+            value = wrap(a + b)
+        elif opcode == "sub":
+            value = wrap(a - b)
+        else:
+            value = wrap(a * b)
+        return opcode, value
+    
+    while count < ops:
+        goal = target(count, ops)
+        expired = next_death() <= count
+        
+        if live and (len(live) > goal or expired):
+            # Kill the value dying first, by a store or a combining op
+            reg = earliest()
+            if len(live) == 1 or rng.random() < stores:
+                word = OUTPUT_BASE + 4 * rng.randrange(OUTPUT_WORDS)
+                memory[word] = values[reg]
+                emit(f"store r{reg} => r{address(word)}")
+                count += 2
+                kill(reg)
+            else:
+                other = live[rng.randrange(len(live))]
+                while other == reg:
+                    other = live[rng.randrange(len(live))]
+                opcode, value = combine(reg, other)
+                kill(reg)
+                if len(live) > goal:
+                    kill(other)
+                result = define(value)
+                emit(f"{opcode} r{reg}, r{other} => r{result}")
+                count += 1
+        elif len(live) < goal or len(live) < 2:
+            # Raise pressure with a constant, a load, or a new combination
+            choice = rng.random()
+            if choice < constants or not live:
+                value = rng.randint(0, 1000)
+                emit(f"loadI {value} => r{define(value)}")
+                count += 1
+            elif choice < constants + loads:
+                # Half the loads read back a word the block has stored
+                word = INPUT_BASE + 4 * rng.randrange(inputs)
+                if rng.random() < 0.5:
+                    word = OUTPUT_BASE + 4 * rng.randrange(OUTPUT_WORDS)
+                base = address(word)
+                result = define(memory.get(word, 0))
+                emit(f"load r{base} => r{result}")
+                count += 2
+            else:
+                reg = live[rng.randrange(len(live))]
+                other = live[rng.randrange(len(live))]
+                opcode, value = combine(reg, other)
+                emit(f"{opcode} r{reg}, r{other} => r{define(value)}")
+                count += 1
+        else:
+            # Hold pressure: replace the value dying first
+            reg = earliest()
+            other = live[rng.randrange(len(live))]
+            opcode, value = combine(reg, other)
+            kill(reg)
+            result = define(value)
+            emit(f"{opcode} r{reg}, r{other} => r{result}")
+            count += 1
+        maxlive = max(maxlive, len(live))
+    
+    words = sorted(word for word in memory if word >= OUTPUT_BASE)
+    for word in words:
+        emit(f"output {word}")
+    
+    header = [
+        f"//NAME: stressgen {pressure} seed {seed}",
+        "//SIM INPUT: -i " + " ".join([str(INPUT_BASE)] + [str(v) for v in input_values]),
+        "//OUTPUT: " + " ".join(str(memory[word]) for word in words),
+        f"// {count + len(words)} ops, MAXLIVE about {maxlive}, {next_reg} registers, "
+        f"constants {constants}, loads {loads}, stores {stores}, span {span} {shape}",
+    ]
+    return "\n".join(header + lines) + "\n"
+
+
+def generate_aliasing(ops):
+    """Generate a block of about ops operations that defeats alias analysis
+    
+    Each step loads an address from a known word, loads through it, and
+    stores the result to a known word, so every load has an unknown
+    address and every store a known one. A scheduler that orders each
+    such load after every store before it builds a quadratic graph.
+    """
+    lines = [f"loadI {INPUT_BASE} => r1", f"loadI {OUTPUT_BASE} => r2"]
+    for _ in range(max(ops - 3, 3) // 3):
+        lines += ["load r1 => r3", "load r3 => r4", "store r4 => r2"]
+    lines.append(f"output {OUTPUT_BASE}")
+    header = ["//NAME: stressgen aliasing",
+              f"//SIM INPUT: -i {INPUT_BASE} {INPUT_BASE + 4} 7",
+              "//OUTPUT: 7"]
+    return "\n".join(header + lines) + "\n"
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == "-h":
+        print("Usage: stressgen.py [-n ops] [--pressure flat:N|ramp:A:B|wave:A:B:P]")
+        print("                    [--constants f] [--loads f] [--stores f]")
+        print("                    [--span mean[:exp|uniform|bimodal]] [--seed s] [-o file]")
+        print("  Writes a straight-line block of about n ops (default 10000) whose")
+        print("  register pressure follows the profile (default flat:16).")
+        sys.exit(0)
+    
+    options = {}
+    outfile = None
+    flags = {"-n": "ops", "--pressure": "pressure", "--constants": "constants",
+             "--loads": "loads", "--stores": "stores", "--span": "span",
+             "--seed": "seed", "-o": None}
+    try:
+        while args:
+            flag = args.pop(0)
+            if flag not in flags:
+                raise ValueError(flag)
+            value = args.pop(0)
+            name = flags[flag]
+            if name is None:
+                outfile = value
+            elif name == "pressure":
+                parse_profile(value)
+                options[name] = value
+            elif name == "span":
+                mean, _, shape = value.partition(":")
+                options["span"] = max(1, int(mean))
+                options["shape"] = shape or "exp"
+            elif name in ("ops", "seed"):
+                options[name] = int(value)
+            else:
+                options[name] = float(value)
+    except (IndexError, ValueError):
+        sys.exit(1)
+    
+    try:
+        text = generate(options.pop("ops", 10000), **options)
+    except ValueError as e:
+        print(f"stressgen.py: {e}", file=sys.stderr)
+        sys.exit(1)
+    if outfile:
+        with open(outfile, "w") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == "__main__":
+    main()
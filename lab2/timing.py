@@ -0,0 +1,84 @@
+"""
+timing.py - ILOC Timing Model
+"""
+
+from scanner import Scanner
+from parser import Parser
+
+# Cycles taken by each opcode in the Lab 2 simulator
+LATENCY = {
+    "load": 3, "loadI": 1, "store": 3,
+    "add": 1, "sub": 1, "mult": 3,
+    "lshift": 1, "rshift": 1,
+    "output": 1, "nop": 1,
+    "jumpI": 1, "cbr": 1
+}
+
+ARITHMETIC = ("add", "sub", "mult", "lshift", "rshift")
+
+
+def estimate_cycles(ir_list):
+    """Count the cycles a straight-line block takes on the simulator
+    
+    Operations issue in order, one per cycle, on an interlocked pipeline:
+    an operation stalls until the registers it reads are ready, LATENCY
+    cycles after the operation defining them issued, and a load or output
+    stalls until the last store to its address has completed. An address
+    is known when its register was last set by loadI; a load from an
+    unknown address waits for every store so far, and any load or output
+    for stores to unknown addresses, so the estimate is an upper bound.
+    Returns the cycle in which the last operation completes.
+    """
+    ready = {}      # register -> cycle its value is available
+    known = {}      # register -> constant loaded by loadI
+    stored = {}     # address -> cycle its last store completes
+    any_store = 0   # cycle the last store completes
+    unknown = 0     # cycle the last store to an unknown address completes
+    cycle = 0
+    finish = 0
+    store_latency = LATENCY["store"]
+    
+    for op in ir_list.iterate_forward():
+        opcode = op.opcode
+        issue = cycle + 1
+        if opcode in ARITHMETIC:
+            issue = max(issue, ready.get(op.sr1, 0), ready.get(op.sr2, 0))
+        elif opcode == "load":
+            address = known.get(op.sr1)
+            if address is None:
+                wait = any_store
+            else:
+                wait = max(stored.get(address, 0), unknown)
+            issue = max(issue, ready.get(op.sr1, 0), wait)
+        elif opcode == "store":
+            issue = max(issue, ready.get(op.sr1, 0), ready.get(op.sr3, 0))
+            address = known.get(op.sr3)
+            if address is None:
+                unknown = issue + store_latency
+            else:
+                stored[address] = issue + store_latency
+            any_store = issue + store_latency
+        elif opcode == "output":
+            issue = max(issue, stored.get(op.sr1, 0), unknown)
+        elif opcode == "cbr":
+            issue = max(issue, ready.get(op.sr1, 0))
+        
+        latency = LATENCY[opcode]
+        if opcode in ARITHMETIC or opcode == "load" or opcode == "loadI":
+            ready[op.sr3] = issue + latency
+            if opcode == "loadI":
+                known[op.sr3] = op.sr1
+            else:
+                known.pop(op.sr3, None)
+        cycle = issue
+        if issue + latency - 1 > finish:
+            finish = issue + latency - 1
+    
+    return finish
+
+
+def estimate_code_cycles(code):
+    """Count the cycles ILOC text takes on the simulator, as estimate_cycles"""
+    parser = Parser(Scanner(None, text=code))
+    parser.parse()
+    return estimate_cycles(parser.get_ir())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+vecsim.py - Batched Simulation of a Block over Many Input Memories
+
+Requires NumPy, which is optional: available is False without it.
+"""
+
+import sys
+import os
+from scanner import Scanner
+from parser import Parser
+from simulator import (compile_program, parse_memory, read_sim_input,
+                       ADD, SUB, MULT, LSHIFT, RSHIFT, LOADI, LOAD, STORE,
+                       OUTPUT, JUMPI, CBR)
+
+try:
+    import numpy as np
+    available = True
+except ImportError:
+    np = None
+    available = False
+
+VECTORS = 1000   # Input memories tried by default
+SPREAD = 1000    # Random words are drawn from -SPREAD to SPREAD
+
+
+def compile_block(filename, text=None):
+    """Parse and compile a straight-line block; None if it cannot be run"""
+    parser = Parser(Scanner(filename, text=text))
+    if not parser.parse():
+        return None
+    program = compile_program(parser.get_ir())
+    if any(kind == JUMPI or kind == CBR for kind, _, _, _ in program.code):
+        return None
+    return program
+
+
+def read_addresses(program):
+    """Return the addresses a block loads or outputs through loadI constants
+    
+    These are the words whose initial contents can change its results.
+    """
+    known = {}  # register slot -> constant loaded by loadI
+    addresses = set()
+    for kind, a, b, c in program.code:
+        if kind == LOADI:
+            known[c] = a
+        elif kind == OUTPUT:
+            addresses.add(a)
+        elif kind == LOAD:
+            if a in known:
+                addresses.add(known[a])
+            known.pop(c, None)
+        elif kind <= RSHIFT:
+            known.pop(c, None)
+    return sorted(addresses)
+
+
+def random_memories(program, args, n, seed=0):
+    """Build n initial memories for a block as (addresses, values)
+    
+    values[:, j] is memory j. Memory 0 is the block's own SIM INPUT;
+    the others fill the same words, and every word the block reads,
+    with random values.
+    """
+    given = parse_memory(args)
+    addresses = sorted(set(given) | set(read_addresses(program)))
+    rng = np.random.default_rng(seed)
+    values = rng.integers(-SPREAD, SPREAD + 1, size=(len(addresses), n), dtype=np.int32)
+    values[:, 0] = [given.get(address, 0) for address in addresses]
+    return addresses, values
+
+
+def run_batch(program, addresses, values):
+    """Execute a straight-line block on every memory at once
+    
+    Registers and memory words are int32 arrays with one entry per
+    memory, so arithmetic wraps as on the simulator. Loads and stores
+    through addresses that differ between memories are split by
+    address. Returns the outputs as an array with one row per output.
+    """
+    n = values.shape[1]
+    zero = np.zeros(n, dtype=np.int32)
+    regs = [zero] * len(program.registers)
+    memory = {address: values[i] for i, address in enumerate(addresses)}
+    outputs = []
+    
+    for kind, a, b, c in program.code:
+        if kind == ADD:
+            regs[c] = regs[a] + regs[b]
+        elif kind == SUB:
+            regs[c] = regs[a] - regs[b]
+        elif kind == MULT:
+            regs[c] = regs[a] * regs[b]
+        elif kind == LSHIFT:
+            regs[c] = np.left_shift(regs[a], regs[b] & 31)
+        elif kind == RSHIFT:
+            regs[c] = np.right_shift(regs[a], regs[b] & 31)
+        elif kind == LOADI:
+            regs[c] = np.full(n, a, dtype=np.int32)
+        elif kind == LOAD:
+            address = regs[a]
+            first = int(address[0])
+            if (address == first).all():
+                regs[c] = memory.get(first, zero)
+            else:
+                result = np.zeros(n, dtype=np.int32)
+                for word in np.unique(address).tolist():
+                    if word in memory:
+                        mask = address == word
+                        result[mask] = memory[word][mask]
+                regs[c] = result
+        elif kind == STORE:
+            address, value = regs[c], regs[a]
+            first = int(address[0])
+            if (address == first).all():
+                memory[first] = value
+            else:
+                for word in np.unique(address).tolist():
+                    memory[word] = np.where(address == word, value, memory.get(word, zero))
+        elif kind == OUTPUT:
+            outputs.append(memory.get(a, zero))
+    
+    return np.array(outputs, dtype=np.int32).reshape(len(outputs), n)
+
+
+def mismatches(reference, candidate, addresses, values):
+    """Return the memories on which two blocks print different outputs"""
+    expected = run_batch(reference, addresses, values)
+    got = run_batch(candidate, addresses, values)
+    if expected.shape != got.shape:
+        return list(range(values.shape[1]))
+    return np.nonzero((expected != got).any(axis=0))[0].tolist()
+
+
+def main():
+    """Compare an allocated block with the original over random memories"""
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] == "-h":
+        print("Usage: vecsim.py [-n vectors] [-s seed] original allocated")
+        print("  Runs both blocks on the original's SIM INPUT and on vectors - 1")
+        print("  random memories, and lists the memories whose outputs differ.")
+        sys.exit(0 if args[:1] == ["-h"] else 1)
+    if not available:
+        print("vecsim.py: NumPy is not installed", file=sys.stderr)
+        sys.exit(1)
+    
+    n, seed = VECTORS, 0
+    try:
+        for flag in ("-n", "-s"):
+            if flag in args:
+                i = args.index(flag)
+                value = int(args[i + 1])
+                del args[i:i + 2]
+                if flag == "-n":
+                    n = max(1, value)
+                else:
+                    seed = value
+    except (IndexError, ValueError):
+        sys.exit(1)
+    if len(args) != 2 or not all(os.path.exists(f) for f in args):
+        sys.exit(1)
+    
+    reference, candidate = (compile_block(f) for f in args)
+    if reference is None or candidate is None:
+        print("vecsim.py: blocks must parse and have no branches", file=sys.stderr)
+        sys.exit(1)
+    
+    addresses, values = random_memories(reference, read_sim_input(args[0]), n, seed)
+    bad = mismatches(reference, candidate, addresses, values)
+    print(f"{n} memories, {len(addresses)} words each: {len(bad)} differ")
+    for j in bad[:5]:
+        words = " ".join(f"{address}={value}" for address, value
+                         in zip(addresses, values[:, j].tolist()))
+        print(f"  memory {j}: {words}")
+    if bad:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()